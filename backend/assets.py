@@ -0,0 +1,301 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+from compression import COMPRESS_MIN_SIZE, compress
+
+# Pillow es opcional: sin él no se generan miniaturas y se usa la imagen original
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Carpeta del frontend (index.html, pages/, css/, java/, img/)
+FRONTEND_DIR = os.path.abspath(os.environ.get(
+    'CUERAR_FRONTEND_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+))
+# Carpetas con archivos estáticos que se sirven con URL con hash
+ASSET_DIRS = ('css', 'java', 'img')
+# Páginas HTML del sitio
+PAGE_DIRS = ('', 'pages')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Miniaturas: anchos permitidos, ancho usado en el catálogo y caché en disco
+THUMBNAIL_WIDTHS = (160, 320, 640)
+CATALOG_THUMBNAIL_WIDTH = 320
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_CACHE_DIR = os.environ.get(
+    'CUERAR_THUMBNAIL_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'cuerar-thumbnails')
+)
+THUMBNAIL_CACHE_BYTES = int(os.environ.get('CUERAR_THUMBNAIL_CACHE_BYTES', str(100 * 1024 * 1024)))
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+# Archivos de texto que se sirven comprimidos (las imágenes ya lo están)
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg')
+
+# Referencias a archivos estáticos en el HTML: ./img/x.jpg, ../css/style.css, etc.
+_ASSET_REFERENCE = re.compile(r'''(["'(])(?:\.{1,2}/)+((?:%s)/[^"')?#]+)''' % '|'.join(ASSET_DIRS))
+
+
+def _file_hash(path):
+    digest = hashlib.blake2b(digest_size=5)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _hashed_name(logical, file_hash):
+    stem, ext = os.path.splitext(logical)
+    return f'{stem}.{file_hash}{ext}'
+
+
+def _rewrite(text, hashed):
+    """Cambiar las referencias a css/, java/ e img/ por sus URL con hash"""
+
+    def replace(match):
+        target = hashed.get(match.group(2))
+        return f'{match.group(1)}/assets/{target}' if target else match.group(0)
+
+    return _ASSET_REFERENCE.sub(replace, text)
+
+
+class AssetManifest:
+    """Archivos estáticos del frontend con el hash de su contenido en el nombre"""
+
+    def __init__(self, root=FRONTEND_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._hashed = None
+        self._logical = None
+        self._bodies = None
+        # (archivo, codificación) -> contenido comprimido
+        self._encoded = {}
+
+    def _scan(self):
+        hashed = {}
+        stylesheets = []
+        for directory in ASSET_DIRS:
+            base = os.path.join(self.root, directory)
+            for dirpath, _, filenames in os.walk(base):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    logical = os.path.relpath(path, self.root).replace(os.sep, '/')
+                    if logical.endswith('.css'):
+                        stylesheets.append((logical, path))
+                    else:
+                        hashed[logical] = _hashed_name(logical, _file_hash(path))
+        # Las hojas de estilo apuntan a imágenes: se reescriben y el hash es el del
+        # resultado, así cambiar una imagen también cambia la URL del CSS
+        bodies = {}
+        for logical, path in stylesheets:
+            with open(path, encoding='utf-8') as f:
+                body = _rewrite(f.read(), hashed).encode()
+            hashed[logical] = _hashed_name(logical, hashlib.blake2b(body, digest_size=5).hexdigest())
+            bodies[logical] = body
+        return hashed, bodies
+
+    def _load(self):
+        if self._hashed is None:
+            with self._lock:
+                if self._hashed is None:
+                    hashed, self._bodies = self._scan()
+                    self._logical = {value: key for key, value in hashed.items()}
+                    self._hashed = hashed
+        return self._hashed
+
+    def refresh(self):
+        """Volver a calcular los hashes (si cambiaron archivos sin reiniciar)"""
+        with self._lock:
+            self._hashed = None
+            self._logical = None
+            self._bodies = None
+            self._encoded = {}
+
+    def url(self, logical):
+        """URL inmutable de un archivo (img/x.jpg -> /assets/img/x.<hash>.jpg), o None"""
+        hashed = self._load().get(logical)
+        return f'/assets/{hashed}' if hashed else None
+
+    def resolve(self, hashed):
+        """(ruta en disco, contenido reescrito o None) de una URL con hash.
+
+        None si no existe o el hash no es el actual.
+        """
+        self._load()
+        logical = self._logical.get(hashed)
+        if not logical:
+            return None
+        return os.path.join(self.root, logical), self._bodies.get(logical)
+
+    def encoded(self, hashed, encoding):
+        """(contenido, codificación aplicada o None) de un archivo de texto con hash.
+
+        Como el nombre con hash identifica el contenido, cada variante se comprime
+        una sola vez y se guarda en memoria. None si no existe o el hash no es el actual.
+        """
+        resolved = self.resolve(hashed)
+        if resolved is None:
+            return None
+        path, body = resolved
+        if body is None:
+            with open(path, 'rb') as f:
+                body = f.read()
+        if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+            return body, None
+        key = (hashed, encoding)
+        compressed = self._encoded.get(key)
+        if compressed is None:
+            compressed = self._encoded[key] = compress(body, encoding)
+        return compressed, encoding
+
+    def thumbnail_url(self, logical, width=CATALOG_THUMBNAIL_WIDTH):
+        """URL de la miniatura WebP de una imagen (la original si no hay Pillow)"""
+        hashed = self._load().get(logical)
+        if not hashed:
+            return None
+        if Image is None or not logical.lower().endswith(IMAGE_EXTENSIONS):
+            return f'/assets/{hashed}'
+        return f'/assets/thumbs/{width}/{os.path.splitext(hashed)[0]}.webp'
+
+    def resolve_thumbnail(self, name):
+        """Imagen original de una miniatura (img/x.<hash>.webp), o None"""
+        stem, ext = os.path.splitext(name)
+        if ext != '.webp':
+            return None
+        self._load()
+        for ext in IMAGE_EXTENSIONS:
+            logical = self._logical.get(stem + ext)
+            if logical:
+                return os.path.join(self.root, logical)
+        return None
+
+    def rewrite_html(self, html):
+        """Cambiar las referencias a css/, java/ e img/ del HTML por sus URL con hash"""
+        return _rewrite(html, self._load())
+
+
+def image_logical_path(image_url):
+    """Ruta dentro del frontend de un image_url de producto ('../img/x.jpg' -> 'img/x.jpg')"""
+    if not image_url:
+        return None
+    path = image_url
+    while path.startswith(('./', '../')):
+        path = path.split('/', 1)[1]
+    return path.lstrip('/')
+
+
+def resolve_page(path):
+    """Ruta en disco de un archivo del sitio, o None si está fuera de las carpetas permitidas"""
+    path = path or 'index.html'
+    full = os.path.realpath(os.path.join(FRONTEND_DIR, path))
+    relative = os.path.relpath(full, FRONTEND_DIR).replace(os.sep, '/')
+    if relative.startswith('..'):
+        return None
+    directory = relative.rsplit('/', 1)[0] if '/' in relative else ''
+    top = relative.split('/', 1)[0] if '/' in relative else ''
+    if (relative.endswith('.html') and directory in PAGE_DIRS) or top in ASSET_DIRS:
+        return full if os.path.isfile(full) else None
+    return None
+
+
+class ThumbnailCache:
+    """Miniaturas WebP generadas a pedido, guardadas en disco con tamaño máximo (LRU)"""
+
+    def __init__(self, directory=THUMBNAIL_CACHE_DIR, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Miniatura que se está generando -> lock propio: los pedidos de otras
+        # miniaturas (y los aciertos) no esperan a que Pillow termine
+        self._generating = {}
+        self._size = None
+        self._stats = {'hits': 0, 'generated': 0, 'evictions': 0}
+
+    def _files(self):
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.webp'):
+                yield entry
+
+    def _ensure_dir(self):
+        if self._size is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._size = sum(entry.stat().st_size for entry in self._files())
+
+    def get(self, source, key, width):
+        """Ruta de la miniatura de source con el ancho pedido; la genera si no está.
+
+        key identifica la versión de la imagen (su nombre con hash).
+        """
+        name = f"{key.replace('/', '_')}.{width}.webp"
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            self._ensure_dir()
+            if self._hit(path):
+                return path
+            guard = self._generating.setdefault(name, threading.Lock())
+        with guard:
+            with self._lock:
+                # Otro pedido pudo generarla mientras se esperaba
+                if self._hit(path):
+                    return path
+            try:
+                size = self._generate(source, width, path)
+            except BaseException:
+                with self._lock:
+                    self._generating.pop(name, None)
+                raise
+            with self._lock:
+                self._generating.pop(name, None)
+                self._size += size
+                self._stats['generated'] += 1
+                self._evict(keep=path)
+        return path
+
+    def _hit(self, path):
+        if not os.path.exists(path):
+            return False
+        # La fecha de modificación marca el último uso (para la LRU)
+        os.utime(path)
+        self._stats['hits'] += 1
+        return True
+
+    def _generate(self, source, width, path):
+        with Image.open(source) as image:
+            image.thumbnail((width, width * 4))
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            os.close(fd)
+            try:
+                image.save(tmp, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+                os.replace(tmp, path)
+            except Exception:
+                os.unlink(tmp)
+                raise
+        return os.path.getsize(path)
+
+    def _evict(self, keep):
+        """Borrar las miniaturas usadas hace más tiempo hasta volver al tamaño máximo"""
+        if self._size <= self.max_bytes:
+            return
+        for entry in sorted(self._files(), key=lambda entry: entry.stat().st_mtime):
+            if self._size <= self.max_bytes:
+                break
+            if entry.path == keep:
+                continue
+            self._size -= entry.stat().st_size
+            os.unlink(entry.path)
+            self._stats['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {'bytes': self._size or 0, 'max_bytes': self.max_bytes, **self._stats}
+
+
+asset_manifest = AssetManifest()
+thumbnail_cache = ThumbnailCache()
@@ -0,0 +1,188 @@
+import asyncio
+import contextvars
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from database import DB_PATH, POOL_SIZE, configure_connection, pool
+from metrics import connection_factory
+from profiling import call
+
+# Tiempo máximo (segundos) que el escritor espera para juntar escrituras en un mismo COMMIT
+GROUP_COMMIT_WINDOW = float(os.environ.get('CUERAR_GROUP_COMMIT_WINDOW', '0.002'))
+# Máximo de escrituras por transacción
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get('CUERAR_GROUP_COMMIT_MAX_BATCH', '256'))
+# Con varios procesos, los escritores de cada worker compiten por el lock de escritura
+# de la base. Cada BEGIN IMMEDIATE ya espera hasta busy_timeout; si aun así la base
+# sigue ocupada, se reintenta con espera creciente antes de fallar el lote.
+BUSY_RETRIES = int(os.environ.get('CUERAR_DB_BUSY_RETRIES', '3'))
+BUSY_RETRY_BACKOFF = 0.05
+
+
+def is_busy(error):
+    """¿El error es de base ocupada por otra conexión? (SQLITE_BUSY)"""
+    # sqlite_errorcode solo existe desde Python 3.11: se mira el mensaje
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+class DatabaseWriter:
+    """Hilo único de escritura: agrupa escrituras concurrentes en una sola transacción"""
+
+    def __init__(self, path=None, window=GROUP_COMMIT_WINDOW, max_batch=GROUP_COMMIT_MAX_BATCH,
+                 busy_retries=BUSY_RETRIES):
+        self.path = path or DB_PATH
+        self.window = window
+        self.max_batch = max_batch
+        self.busy_retries = busy_retries
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {'jobs': 0, 'batches': 0, 'failed_jobs': 0, 'failed_batches': 0, 'max_batch': 0,
+                       'busy_retries': 0}
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+    def submit(self, fn, *args):
+        """Encolar fn(conn, *args); devuelve un Future con su resultado tras el COMMIT"""
+        self.start()
+        future = Future()
+        # fn corre con el contexto de quien la encoló (para atribuir el SQL a su ruta)
+        self._queue.put((fn, args, future, contextvars.copy_context()))
+        return future
+
+    def _collect(self, first):
+        """Juntar las escrituras que llegan dentro de la ventana de group commit"""
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                # Señal de parada: se procesa el lote actual y se vuelve a encolar
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        # Conexión propia en modo autocommit: BEGIN/SAVEPOINT/COMMIT se manejan a mano
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                               factory=connection_factory)
+        conn.row_factory = sqlite3.Row
+        configure_connection(conn)
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    break
+                self._write_batch(conn, self._collect(first))
+        finally:
+            conn.close()
+
+    def _begin(self, conn):
+        """BEGIN IMMEDIATE, reintentando si otro proceso retiene el lock de escritura.
+
+        Todavía no corrió ninguna escritura del lote: reintentar es seguro.
+        """
+        for attempt in range(self.busy_retries + 1):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                if attempt == self.busy_retries or not is_busy(e):
+                    raise
+                self._bump('busy_retries')
+                time.sleep(BUSY_RETRY_BACKOFF * 2 ** attempt)
+
+    def _write_batch(self, conn, batch):
+        results = []
+        try:
+            self._begin(conn)
+            for fn, args, future, context in batch:
+                # Cada escritura en su savepoint: si falla, no arrastra al resto del lote
+                conn.execute('SAVEPOINT job')
+                try:
+                    results.append((future, context.run(call, fn, conn, *args), None))
+                    conn.execute('RELEASE job')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO job')
+                    conn.execute('RELEASE job')
+                    results.append((future, None, e))
+            conn.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            self._bump('failed_batches')
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['jobs'] += len(batch)
+            self._stats['max_batch'] = max(self._stats['max_batch'], len(batch))
+        for future, result, error in results:
+            if error is not None:
+                self._bump('failed_jobs')
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            return {'queued': self._queue.qsize(), **self._stats}
+
+
+class AsyncDatabase:
+    """Acceso a la base para rutas async: lecturas en el pool, escrituras en el hilo escritor"""
+
+    def __init__(self, writer, readers=POOL_SIZE):
+        self.writer = writer
+        self._executor = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='db-reader')
+
+    def _read(self, fn, args):
+        with pool.connection() as conn:
+            return call(fn, conn, *args)
+
+    async def read(self, fn, *args):
+        """Ejecutar fn(conn, *args) con una conexión lectora del pool"""
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._executor, context.run, self._read, fn, args)
+
+    async def write(self, fn, *args):
+        """Ejecutar fn(conn, *args) en el hilo escritor; fn no debe hacer commit"""
+        return await asyncio.wrap_future(self.writer.submit(fn, *args))
+
+    def stats(self):
+        """Lecturas esperando un hilo lector"""
+        return {'readers': self._executor._max_workers, 'queued': self._executor._work_queue.qsize()}
+
+
+writer = DatabaseWriter()
+db = AsyncDatabase(writer)
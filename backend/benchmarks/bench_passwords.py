@@ -0,0 +1,51 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passwords import PasswordHasher
+
+# Benchmark del servicio de hashing: logins por segundo por núcleo.
+#
+# Uso (desde backend/): python -m benchmarks.bench_passwords [--logins 200]
+
+
+def run(workers, logins):
+    """Verificar `logins` contraseñas con `workers` procesos; devuelve logins/s"""
+    hasher = PasswordHasher(workers=workers)
+    stored = hasher.hash('password123')
+    # Calentar el pool para no medir el arranque de los procesos
+    hasher.verify('password123', stored)
+
+    # Los hilos simulan peticiones concurrentes del servidor
+    with ThreadPoolExecutor(max_workers=workers * 4) as threads:
+        start = time.perf_counter()
+        results = list(threads.map(lambda _: hasher.verify('password123', stored), range(logins)))
+        elapsed = time.perf_counter() - start
+    hasher.shutdown()
+
+    assert all(valid for valid, _ in results)
+    return logins / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de hashing de contraseñas")
+    parser.add_argument('--logins', type=int, default=200)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    print("=" * 60)
+    print("🔐 BENCHMARK DE LOGINS (scrypt)")
+    print("=" * 60)
+
+    single = run(1, args.logins)
+    print(f"  1 proceso:{'':.<27} {single:>8.1f} logins/s")
+
+    if cores > 1:
+        total = run(cores, args.logins)
+        print(f"  {cores} procesos:{'':.<26} {total:>8.1f} logins/s")
+        print(f"  Por núcleo:{'':.<26} {total / cores:>8.1f} logins/s")
+
+
+if __name__ == "__main__":
+    main()
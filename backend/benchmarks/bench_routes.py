@@ -0,0 +1,350 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Benchmark de todas las rutas de main.py: latencia (p50/p95/p99) y throughput.
+#
+# En proceso (por defecto) se usa TestClient contra la app, sin red: sirve como
+# micro-benchmark de cada ruta. Con --url se mide un servidor real por HTTP, con
+# --concurrency clientes en paralelo (prueba de carga).
+#
+# Los resultados se guardan con --save y se comparan con una corrida anterior con
+# --compare (código de salida 1 si alguna ruta empeoró más que --threshold).
+#
+# Uso (desde backend/):
+#   python generate_data.py --db bench.db --products 2000 --users 1000000 --orders 3000000
+#   python -m benchmarks.bench_routes --db bench.db --save base.json
+#   python -m benchmarks.bench_routes --db bench.db --compare base.json
+#   python -m benchmarks.bench_routes --url http://localhost:8000 --concurrency 32
+
+PASSWORD = 'password123'
+SEARCHES = ['cuero', 'cartera', 'alf vac', 'cinturon negro', 'mochila vintage', 'billetera', 'ca']
+# Pedidos por petición en /api/orders/bulk
+BULK_ORDERS = 100
+# Diferencia mínima de p95 (ms) para considerar una regresión (por debajo es ruido)
+NOISE_MS = 0.5
+
+
+class Scenario:
+    """Una petición a medir: make(client, rng) devuelve los argumentos de la petición"""
+
+    def __init__(self, name, route, make, method='GET', expected=(200,), max_requests=None):
+        self.name = name
+        self.route = route
+        self.make = make
+        self.method = method
+        self.expected = expected
+        # Las rutas caras (scrypt) se miden con menos peticiones
+        self.max_requests = max_requests
+
+
+class Fixtures:
+    """Ids y datos reales de la base, descubiertos por la API"""
+
+    def __init__(self, client, admin_token=None):
+        self.category_rows = client.get('/api/categories').json()['categories']
+        self.categories = [category['id'] for category in self.category_rows]
+        users = client.get('/api/users', params={'limit': 100}).json()['users']
+        self.user_ids = [user['id'] for user in users]
+        self.login_email = users[0]['email']
+        self.products = client.get('/api/products/search', params={'q': 'cuero', 'limit': 50}).json()['products']
+        self.products_etag = client.get('/api/products').headers.get('etag')
+        html = client.get('/site/').text
+        self.assets = re.findall(r'/assets/[^"\')]+', html)
+        # Sin Pillow, thumbnail_url apunta a la imagen original (no a /assets/thumbs/)
+        self.thumbnails = [p['thumbnail_url'] for p in self.products
+                           if (p.get('thumbnail_url') or '').startswith('/assets/thumbs/')]
+        # Un perfil para medir su descarga
+        self.profile_id = admin_token and client.get('/api/products', headers={
+            'X-Profile': '1', 'X-Admin-Token': admin_token,
+        }).headers.get('x-profile-id')
+
+    def order(self, rng, user_id=None):
+        items = [
+            {'nombre': p['name'], 'precio': p['price'], 'cantidad': 1}
+            for p in rng.sample(self.products, min(len(self.products), rng.randint(1, 3)))
+        ]
+        return {'items': items, 'total': sum(item['precio'] for item in items), 'user_id': user_id}
+
+
+def _login(client, email):
+    response = client.post('/api/login', json={'email': email, 'password': PASSWORD})
+    return {'Authorization': f"Bearer {response.json()['token']}"}
+
+
+def scenarios(fx, admin_token):
+    """Escenarios para cada ruta de main.py"""
+    def unique():
+        return uuid.uuid4().hex[:12]
+
+    admin = {'X-Admin-Token': admin_token or ''}
+
+    return [scenario for scenario in [
+        Scenario('raíz', '/', lambda c, r: {'url': '/'}),
+        Scenario('productos', '/api/products', lambda c, r: {'url': '/api/products'}),
+        Scenario('productos filtrados', '/api/products', lambda c, r: {
+            'url': '/api/products',
+            'params': {'categories': ','.join(map(str, r.sample(fx.categories, 2))),
+                       'min_price': r.choice([0, 10000, 30000]), 'sort': r.choice(['price_asc', 'name'])},
+        }),
+        Scenario('productos (304)', '/api/products', lambda c, r: {
+            'url': '/api/products', 'headers': {'If-None-Match': fx.products_etag},
+        }, expected=(304,)),
+        Scenario('búsqueda', '/api/products/search', lambda c, r: {
+            'url': '/api/products/search', 'params': {'q': r.choice(SEARCHES)},
+        }),
+        Scenario('categorías', '/api/categories', lambda c, r: {'url': '/api/categories'}),
+        Scenario('productos por categoría', '/api/categories/{category_id}/products', lambda c, r: {
+            'url': f'/api/categories/{r.choice(fx.categories)}/products',
+        }),
+        Scenario('registro', '/api/register', lambda c, r: {
+            'url': '/api/register',
+            'json': {'username': f'bench_{unique()}', 'email': f'bench_{unique()}@email.com',
+                     'password': PASSWORD, 'phone': '1100000000'},
+        }, method='POST', max_requests=50),
+        Scenario('login', '/api/login', lambda c, r: {
+            'url': '/api/login', 'json': {'email': fx.login_email, 'password': PASSWORD},
+        }, method='POST', max_requests=50),
+        # El login previo no se mide
+        Scenario('logout', '/api/logout', lambda c, r: {
+            'url': '/api/logout', 'headers': _login(c, fx.login_email),
+        }, method='POST', max_requests=20),
+        Scenario('contacto', '/api/contact', lambda c, r: {
+            'url': '/api/contact',
+            'json': {'name': 'Benchmark', 'email': 'bench@email.com', 'message': 'Consulta de prueba'},
+        }, method='POST'),
+        Scenario('pedido', '/api/orders', lambda c, r: {
+            'url': '/api/orders', 'json': fx.order(r, r.choice(fx.user_ids)),
+        }, method='POST'),
+        Scenario(f'pedidos en lote ({BULK_ORDERS})', '/api/orders/bulk', lambda c, r: {
+            'url': '/api/orders/bulk', 'json': [fx.order(r, r.choice(fx.user_ids)) for _ in range(BULK_ORDERS)],
+        }, method='POST', max_requests=50),
+        Scenario('pedidos de un usuario', '/api/orders/{user_id}', lambda c, r: {
+            'url': f'/api/orders/{r.choice(fx.user_ids)}',
+        }),
+        Scenario('usuarios (página)', '/api/users', lambda c, r: {
+            'url': '/api/users', 'params': {'limit': 50},
+        }),
+        Scenario('usuarios (NDJSON)', '/api/users', lambda c, r: {
+            'url': '/api/users', 'params': {'format': 'ndjson', 'limit': 100},
+        }),
+        Scenario('resumen de un usuario', '/api/users/{user_id}/orders', lambda c, r: {
+            'url': f'/api/users/{r.choice(fx.user_ids)}/orders',
+        }),
+        Scenario('estadísticas de ventas', '/api/statistics/sales', lambda c, r: {
+            'url': '/api/statistics/sales',
+        }),
+        Scenario('estadísticas de productos', '/api/statistics/products', lambda c, r: {
+            'url': '/api/statistics/products',
+        }),
+        Scenario('mensajes de contacto', '/api/contact-messages', lambda c, r: {
+            'url': '/api/contact-messages', 'params': {'limit': 50},
+        }),
+        Scenario('estado de la base', '/api/db/stats', lambda c, r: {'url': '/api/db/stats'}),
+        Scenario('métricas', '/metrics', lambda c, r: {'url': '/metrics'}),
+        # Reimporta las categorías existentes (no cambia nada)
+        Scenario('importar categorías', '/api/admin/catalog/{table}/import', lambda c, r: {
+            'url': '/api/admin/catalog/categories/import', 'headers': admin, 'params': {'format': 'ndjson'},
+            'content': '\n'.join(json.dumps(category) for category in fx.category_rows),
+        }, method='POST') if admin_token else None,
+        Scenario('exportar productos', '/api/admin/catalog/{table}/export', lambda c, r: {
+            'url': '/api/admin/catalog/products/export', 'headers': admin, 'params': {'format': 'ndjson'},
+        }, max_requests=20) if admin_token else None,
+        Scenario('consultas lentas', '/api/admin/slow-queries', lambda c, r: {
+            'url': '/api/admin/slow-queries', 'headers': admin,
+        }) if admin_token else None,
+        Scenario('perfiles', '/api/admin/profiles', lambda c, r: {
+            'url': '/api/admin/profiles', 'headers': admin,
+        }) if admin_token else None,
+        Scenario('perfil (pilas colapsadas)', '/api/admin/profiles/{profile_id}', lambda c, r: {
+            'url': f'/api/admin/profiles/{fx.profile_id}', 'headers': admin, 'params': {'format': 'collapsed'},
+        }) if fx.profile_id else None,
+        Scenario('sitio (redirección)', '/site', lambda c, r: {'url': '/site'}, expected=(307,)),
+        Scenario('sitio', '/site/{path:path}', lambda c, r: {
+            'url': r.choice(['/site/', '/site/pages/tienda.html', '/site/pages/contacto.html']),
+        }),
+        Scenario('archivos estáticos', '/assets/{path:path}', lambda c, r: {
+            'url': r.choice(fx.assets),
+        }),
+        Scenario('miniaturas', '/assets/thumbs/{width}/{name:path}', lambda c, r: {
+            'url': r.choice(fx.thumbnails),
+        }) if fx.thumbnails else None,
+    ] if scenario is not None]
+
+
+def _percentile(ordered, q):
+    """Percentil q (0-100) por rango más cercano"""
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def run_scenario(client, scenario, requests, concurrency, seed):
+    """Ejecutar la petición requests veces con concurrency hilos; devuelve el resumen"""
+    count = min(requests, scenario.max_requests or requests)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    pending = iter(range(count))
+
+    def worker(worker_id):
+        rng = random.Random(seed * 1000 + worker_id)
+        while True:
+            with lock:
+                if next(pending, None) is None:
+                    return
+            kwargs = scenario.make(client, rng)
+            url = kwargs.pop('url')
+            start = time.perf_counter()
+            response = client.request(scenario.method, url, follow_redirects=False, **kwargs)
+            response.read()
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code not in scenario.expected:
+                    errors.append(response.status_code)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as threads:
+        list(threads.map(worker, range(concurrency)))
+    wall = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'route': f'{scenario.method} {scenario.route}',
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_statuses': sorted(set(errors)),
+        'p50_ms': round(_percentile(latencies, 50), 3),
+        'p95_ms': round(_percentile(latencies, 95), 3),
+        'p99_ms': round(_percentile(latencies, 99), 3),
+        'max_ms': round(latencies[-1], 3),
+        'throughput_rps': round(len(latencies) / wall, 1),
+    }
+
+
+def run(client, args):
+    fx = Fixtures(client, args.admin_token)
+    results = {}
+    for scenario in scenarios(fx, args.admin_token):
+        if args.only and not re.search(args.only, scenario.name):
+            continue
+        # Calentamiento: cachés, conexiones del pool, procesos de hashing
+        for _ in range(min(args.warmup, scenario.max_requests or args.warmup)):
+            kwargs = scenario.make(client, random.Random(0))
+            client.request(scenario.method, kwargs.pop('url'), follow_redirects=False, **kwargs)
+        results[scenario.name] = result = run_scenario(client, scenario, args.requests, args.concurrency, args.seed)
+        errors = f"  ⚠️  {result['errors']} errores {result['error_statuses']}" if result['errors'] else ''
+        print(f"  {scenario.name:<32} p50 {result['p50_ms']:8.2f}  p95 {result['p95_ms']:8.2f}  "
+              f"p99 {result['p99_ms']:8.2f} ms  {result['throughput_rps']:9.1f} req/s{errors}")
+    return results
+
+
+def uncovered_routes(app, covered):
+    """Rutas de la app sin escenario"""
+    from fastapi.routing import APIRoute
+    routes = {
+        f'{method} {route.path}'
+        for route in app.routes if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+    return sorted(routes - covered)
+
+
+def compare(baseline, results, threshold):
+    """Imprimir la diferencia con una corrida anterior; devuelve las rutas que empeoraron"""
+    print("\n" + "=" * 60)
+    print(f"📊 COMPARACIÓN CON {baseline['meta'].get('date', '?')} (umbral {threshold:.0f}%)")
+    print("=" * 60)
+    regressions = []
+    for name, current in results.items():
+        previous = baseline['results'].get(name)
+        if not previous:
+            print(f"  {name:<32} (nuevo)")
+            continue
+        p95_delta = (current['p95_ms'] - previous['p95_ms']) / max(previous['p95_ms'], 1e-9) * 100
+        rps_delta = (current['throughput_rps'] - previous['throughput_rps']) / max(previous['throughput_rps'], 1e-9) * 100
+        worse = (p95_delta > threshold and current['p95_ms'] - previous['p95_ms'] > NOISE_MS) or rps_delta < -threshold
+        if worse:
+            regressions.append(name)
+        print(f"  {name:<32} p95 {previous['p95_ms']:8.2f} -> {current['p95_ms']:8.2f} ms ({p95_delta:+6.1f}%)  "
+              f"throughput {rps_delta:+6.1f}%{'  ❌' if worse else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las rutas de la API")
+    parser.add_argument('--db', help="Base a usar en proceso (por defecto CUERAR_DB o cuerar.db)")
+    parser.add_argument('--url', help="Medir un servidor por HTTP en vez de la app en proceso")
+    parser.add_argument('--requests', type=int, default=200, help="Peticiones por escenario")
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--admin-token', default=os.environ.get('CUERAR_ADMIN_TOKEN'),
+                        help="Token para medir /api/admin/* (en proceso se usa uno propio si falta)")
+    parser.add_argument('--only', help="Solo los escenarios cuyo nombre coincide con esta expresión")
+    parser.add_argument('--save', help="Guardar los resultados en este archivo JSON")
+    parser.add_argument('--compare', help="Comparar con los resultados guardados en este archivo JSON")
+    parser.add_argument('--threshold', type=float, default=10.0, help="Porcentaje de empeoramiento tolerado")
+    args = parser.parse_args()
+
+    mode = 'http' if args.url else 'inprocess'
+    print("=" * 60)
+    print(f"⏱️  RUTAS DE LA API ({args.url or 'en proceso'}, {args.requests} peticiones, "
+          f"{args.concurrency} clientes)")
+    print("=" * 60)
+
+    if args.url:
+        import httpx
+        with httpx.Client(base_url=args.url, timeout=60,
+                          limits=httpx.Limits(max_connections=args.concurrency)) as client:
+            results = run(client, args)
+        missing = []
+    else:
+        if args.db:
+            os.environ['CUERAR_DB'] = args.db
+        if not args.admin_token:
+            args.admin_token = os.environ['CUERAR_ADMIN_TOKEN'] = uuid.uuid4().hex
+        # main se importa después de fijar CUERAR_DB (la ruta se lee al importar)
+        from fastapi.testclient import TestClient
+        import main as app_module
+        with TestClient(app_module.app) as client:
+            results = run(client, args)
+        covered = {result['route'] for result in results.values()}
+        missing = [] if args.only else uncovered_routes(app_module.app, covered)
+    if missing:
+        print(f"\n⚠️  Rutas sin escenario: {', '.join(missing)}")
+
+    report = {
+        'meta': {
+            'mode': mode,
+            'target': args.url or os.environ.get('CUERAR_DB', 'cuerar.db'),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+        },
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en {args.save}")
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print(f"\n❌ Empeoraron: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
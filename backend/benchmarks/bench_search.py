@@ -0,0 +1,70 @@
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from database import connect
+from migrations import migrate
+from search import search_products
+
+# Benchmark de búsqueda de productos (FTS5) sobre un catálogo grande generado al azar.
+# Usa una base temporal.
+#
+# Uso (desde backend/): python -m benchmarks.bench_search [--products 300000]
+
+TYPES = ['Alfombra', 'Cartera', 'Billetera', 'Cinturón', 'Mochila', 'Zapatos', 'Chaqueta',
+         'Cuero', 'Porta documentos', 'Cojín', 'Bolso', 'Llavero', 'Guantes', 'Sombrero']
+MATERIALS = ['de vaca', 'de cabra', 'de oveja', 'de carpincho', 'de búfalo', 'de cerdo', 'sintético']
+ADJECTIVES = ['negro', 'marrón', 'blanco', 'overo', 'clásico', 'vintage', 'premium', 'artesanal',
+              'trenzado', 'grande', 'compacto', 'rústico', 'elegante', 'suave', 'resistente']
+WORDS = ['ideal', 'para', 'uso', 'diario', 'hecho', 'a', 'mano', 'con', 'costuras', 'reforzadas',
+         'terminación', 'encerada', 'forro', 'interior', 'herrajes', 'metálicos', 'diseño', 'único']
+
+QUERIES = ['cuero', 'cinturon negro', 'alf vac', 'ca', 'mochila vintage', 'billetera marron compacta',
+           'bolso de carpincho', 'guantes', 'chaqueta', 'zapatos artesanales', 'llav', 'herrajes']
+
+
+def generate(conn, count, seed=1):
+    """Insertar count productos con nombres y descripciones al azar"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        name = f'{rng.choice(TYPES)} {rng.choice(MATERIALS)} {rng.choice(ADJECTIVES)} {i}'
+        description = ' '.join(rng.choice(WORDS + ADJECTIVES) for _ in range(rng.randint(6, 14)))
+        rows.append((name, description, rng.randint(5, 200) * 1000.0, rng.randint(0, 50)))
+    conn.executemany('INSERT INTO products (name, description, price, stock) VALUES (?, ?, ?, ?)', rows)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda de productos")
+    parser.add_argument('--products', type=int, default=300000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = connect(os.path.join(tmp, 'bench.db'))
+        migrate(conn)
+        start = time.perf_counter()
+        generate(conn, args.products)
+        print("=" * 60)
+        print(f"🔎 BÚSQUEDA EN {args.products} PRODUCTOS (carga e indexado: {time.perf_counter() - start:.1f} s)")
+        print("=" * 60)
+        for query in QUERIES:
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                results = search_products(conn, query, args.limit)
+                times.append((time.perf_counter() - start) * 1000)
+            times.sort()
+            p95 = times[int(len(times) * 0.95) - 1]
+            print(f"  {query:<28} {len(results):>3} resultados  "
+                  f"mediana {statistics.median(times):7.2f} ms  p95 {p95:7.2f} ms")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import json
+import random
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from serialization import dumps, orjson
+
+# Benchmark de serialización de un catálogo grande: el camino por defecto de FastAPI
+# (jsonable_encoder + json) contra dumps() (orjson si está instalado) y contra
+# reutilizar los bytes ya serializados.
+#
+# Uso (desde backend/): python -m benchmarks.bench_serialization [--products 20000]
+
+
+def make_catalog(count, seed=1):
+    rng = random.Random(seed)
+    categories = [{'id': i, 'name': f'Categoría {i}', 'description': 'Descripción de la categoría'} for i in range(1, 11)]
+    return {'products': [
+        {
+            'id': i,
+            'name': f'Producto de cuero {i}',
+            'description': 'Cuero genuino, hecho a mano, con terminación encerada y costuras reforzadas',
+            'price': rng.randint(5, 200) * 1000.0,
+            'image_url': f'../img/producto-{i}.jpg',
+            'stock': rng.randint(0, 50),
+            'categories': rng.sample(categories, 2),
+        }
+        for i in range(1, count + 1)
+    ]}
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    return (time.perf_counter() - start) / repeat * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de respuestas")
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    catalog = make_catalog(args.products)
+    cached = dumps(catalog)
+    variants = [
+        ('jsonable_encoder + json', lambda: json.dumps(
+            jsonable_encoder(catalog), ensure_ascii=False, separators=(',', ':')).encode()),
+        (f"dumps ({'orjson' if orjson else 'json'})", lambda: dumps(catalog)),
+        ('bytes cacheados', lambda: cached),
+    ]
+
+    print("=" * 60)
+    print(f"📦 SERIALIZACIÓN DE {args.products} PRODUCTOS")
+    print("=" * 60)
+    for name, fn in variants:
+        ms, size = timed(fn, args.repeat)
+        print(f"  {name:<28} {ms:>9.2f} ms  ({size / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# Benchmark del arranque de la API.
+#
+# Cada corrida es un proceso nuevo (arranque en frío):
+# - importar main.py (sin contar FastAPI, que el proceso ya importó antes) y
+#   arrancar la app (lifespan) con TestClient, con una base
+#   nueva (se crean las tablas) y con la base indicada (esquema al día);
+# - uvicorn con uno o varios workers, hasta que responde la primera petición.
+#
+# Uso (desde backend/): python -m benchmarks.bench_startup [--db cuerar.db] [--runs 5] [--workers 4]
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Corre dentro del proceso medido: tiempos de import y de lifespan en ms
+_PROBE = '''
+import json, time
+from fastapi.testclient import TestClient
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+with TestClient(main.app) as client:
+    started = time.perf_counter()
+stopped = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "startup_ms": (started - imported) * 1000,
+                  "shutdown_ms": (stopped - started) * 1000}))
+'''
+
+
+def _env(db):
+    return {**os.environ, 'CUERAR_DB': db, 'CUERAR_SLOW_QUERY_LOG': ''}
+
+
+def probe(db):
+    """Un proceso nuevo: (total, import, startup, shutdown) en ms"""
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', _PROBE], cwd=BACKEND_DIR, env=_env(db),
+                         capture_output=True, text=True, check=True).stdout
+    total = (time.perf_counter() - start) * 1000
+    times = json.loads(out.strip().splitlines()[-1])
+    return total, times['import_ms'], times['startup_ms'], times['shutdown_ms']
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def uvicorn_boot(db, workers, timeout=60):
+    """ms desde lanzar uvicorn hasta la primera respuesta"""
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--workers', str(workers),
+         '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=_env(db), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("uvicorn no respondió")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _report(name, samples):
+    print(f"  {name:<34} mediana {statistics.median(samples):8.1f} ms   mín {min(samples):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del arranque de la API")
+    parser.add_argument('--db', default=os.environ.get('CUERAR_DB', 'cuerar.db'),
+                        help="Base con el esquema al día (por defecto CUERAR_DB o cuerar.db)")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4, help="Workers de uvicorn para la segunda medición")
+    args = parser.parse_args()
+    db = os.path.abspath(os.path.join(BACKEND_DIR, args.db))
+
+    print("=" * 60)
+    print(f"🚀 ARRANQUE DE LA API ({args.runs} corridas)")
+    print("=" * 60)
+
+    tmp = tempfile.mkdtemp()
+    try:
+        for label, make_db in (('base nueva', lambda i: os.path.join(tmp, f'nueva-{i}.db')),
+                               ('esquema al día', lambda i: db)):
+            runs = [probe(make_db(i)) for i in range(args.runs)]
+            print(f"\n{label}:")
+            _report('proceso completo', [r[0] for r in runs])
+            _report('import main', [r[1] for r in runs])
+            _report('lifespan (startup)', [r[2] for r in runs])
+            _report('lifespan (shutdown)', [r[3] for r in runs])
+
+        print("\nuvicorn hasta la primera respuesta (esquema al día):")
+        for workers in sorted({1, args.workers}):
+            _report(f'{workers} worker(s)', [uvicorn_boot(db, workers) for _ in range(args.runs)])
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
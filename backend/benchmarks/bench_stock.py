@@ -0,0 +1,77 @@
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from async_db import DatabaseWriter
+from database import connect
+from migrations import migrate
+from orders import OutOfStock, insert_orders
+
+# Benchmark de reservas de stock concurrentes: muchos clientes compran a la vez el
+# mismo producto. Comprueba que no se venda más de lo disponible. Usa una base temporal.
+#
+# Uso (desde backend/): python -m benchmarks.bench_stock [--checkouts 5000 --clients 200 --stock 1000]
+
+
+def checkout(conn, product_id, quantity):
+    result = insert_orders(conn, [(None, 100.0, [('Producto popular', 100.0, quantity, product_id)])])[0]
+    if isinstance(result, OutOfStock):
+        raise result
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de reservas de stock concurrentes")
+    parser.add_argument('--checkouts', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--stock', type=int, default=1000)
+    parser.add_argument('--quantity', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = connect(path)
+        migrate(conn)
+        product_id = conn.execute(
+            'INSERT INTO products (name, price, stock) VALUES (?, ?, ?)', ('Producto popular', 100.0, args.stock)
+        ).lastrowid
+        conn.commit()
+
+        writer = DatabaseWriter(path)
+        writer.start()
+
+        def work(_):
+            try:
+                writer.submit(checkout, product_id, args.quantity).result()
+                return True
+            except OutOfStock:
+                return False
+
+        with ThreadPoolExecutor(max_workers=args.clients) as threads:
+            start = time.perf_counter()
+            outcomes = list(threads.map(work, range(args.checkouts)))
+            elapsed = time.perf_counter() - start
+        writer.stop()
+
+        sold = sum(outcomes)
+        stock = conn.execute('SELECT stock FROM products WHERE id = ?', (product_id,)).fetchone()[0]
+        orders = conn.execute('SELECT COUNT(*) FROM orders').fetchone()[0]
+        units = conn.execute('SELECT COALESCE(SUM(quantity), 0) FROM order_items').fetchone()[0]
+        conn.close()
+
+        print("=" * 60)
+        print(f"🛒 {args.checkouts} COMPRAS, {args.clients} CLIENTES, STOCK INICIAL {args.stock}")
+        print("=" * 60)
+        print(f"  Compras por segundo:{'':.<17} {args.checkouts / elapsed:>10.0f}")
+        print(f"  Aceptadas / sin stock: {sold} / {len(outcomes) - sold}")
+        print(f"  Unidades vendidas: {units} (stock final {stock})")
+        ok = units + stock == args.stock and stock >= 0 and orders == sold
+        print(f"  {'✅ Sin sobreventa' if ok else '❌ SOBREVENTA O INCONSISTENCIA'}")
+        if not ok:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
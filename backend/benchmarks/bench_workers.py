@@ -0,0 +1,175 @@
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+# Benchmark de escalado con varios workers (python main.py --workers N).
+#
+# Para cada cantidad de workers se levanta el servidor sobre la misma base y se
+# mide el throughput de tráfico mayormente de lectura (catálogo, búsqueda,
+# categorías, estadísticas) con una fracción de escrituras (mensajes de contacto)
+# que invalidan cachés en todos los workers. Los clientes son procesos aparte,
+# con varias conexiones keep-alive cada uno, para que el cliente no sea el cuello
+# de botella. Con más workers que núcleos no se puede esperar escalado.
+#
+# Uso (desde backend/):
+#   python -m benchmarks.bench_workers [--db cuerar.db] [--workers 1,2,4] [--seconds 10]
+#                                      [--clients 4] [--connections 8] [--write-ratio 0.02]
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READS = [
+    '/api/products',
+    '/api/products?limit=20&sort=price_asc',
+    '/api/products/search?q=cuero',
+    '/api/products/search?q=cartera',
+    '/api/categories',
+    '/api/statistics/sales',
+    '/api/statistics/products',
+]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _client(port, seconds, connections, write_ratio, seed, results):
+    """Un proceso cliente: connections hilos con una conexión keep-alive cada uno"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def loop(n):
+        rng = random.Random(seed * 1000 + n)
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        while time.perf_counter() < deadline:
+            if rng.random() < write_ratio:
+                body = json.dumps({'name': 'Bench', 'email': 'bench@example.com', 'message': 'hola'})
+                args = ('POST', '/api/contact', body, {'Content-Type': 'application/json'})
+            else:
+                args = ('GET', rng.choice(READS), None, {})
+            start = time.perf_counter()
+            try:
+                conn.request(*args)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                ok = False
+            if ok:
+                local.append(time.perf_counter() - start)
+            else:
+                with lock:
+                    errors[0] += 1
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=loop, args=(n,)) for n in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put((latencies, errors[0]))
+
+
+def _wait_ready(port, timeout=60):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/api/categories')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError("el servidor no respondió")
+
+
+def measure(db, workers, args):
+    """(peticiones por segundo, p50 ms, p99 ms, errores) con workers procesos"""
+    port = _free_port()
+    env = {**os.environ, 'CUERAR_DB': db, 'CUERAR_SLOW_QUERY_LOG': '', 'CUERAR_SESSION_SECRET': 'bench'}
+    server = subprocess.Popen(
+        [sys.executable, 'main.py', '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers)],
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_ready(port)
+        # Calentamiento: cachés de todos los workers llenas antes de medir
+        _run_clients(port, min(2.0, args.seconds), args)
+        start = time.perf_counter()
+        latencies, errors = _run_clients(port, args.seconds, args)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0.0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+    return len(latencies) / elapsed, p50, p99, errors
+
+
+def _run_clients(port, seconds, args):
+    results = multiprocessing.Queue()
+    clients = [
+        multiprocessing.Process(target=_client,
+                                args=(port, seconds, args.connections, args.write_ratio, seed, results))
+        for seed in range(args.clients)
+    ]
+    for client in clients:
+        client.start()
+    latencies, errors = [], 0
+    for _ in clients:
+        client_latencies, client_errors = results.get()
+        latencies.extend(client_latencies)
+        errors += client_errors
+    for client in clients:
+        client.join()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput de la API según la cantidad de workers")
+    parser.add_argument('--db', default=os.environ.get('CUERAR_DB', 'cuerar.db'),
+                        help="Base a usar (por defecto CUERAR_DB o cuerar.db)")
+    parser.add_argument('--workers', default='1,2,4', help="Cantidades de workers a medir, separadas por comas")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Duración de cada medición")
+    parser.add_argument('--clients', type=int, default=4, help="Procesos cliente")
+    parser.add_argument('--connections', type=int, default=8, help="Conexiones keep-alive por cliente")
+    parser.add_argument('--write-ratio', type=float, default=0.02, help="Fracción de peticiones que escriben")
+    args = parser.parse_args()
+    db = os.path.abspath(os.path.join(BACKEND_DIR, args.db))
+    counts = [int(n) for n in args.workers.split(',')]
+
+    print("=" * 60)
+    print(f"⚙️  ESCALADO CON WORKERS ({os.cpu_count()} núcleos, {args.clients}x{args.connections} conexiones, "
+          f"{args.write_ratio:.0%} escrituras)")
+    print("=" * 60)
+    base = None
+    for workers in counts:
+        rps, p50, p99, errors = measure(db, workers, args)
+        base = base or rps / workers
+        efficiency = rps / (base * workers)
+        print(f"  {workers:>2} worker(s): {rps:9.1f} req/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   "
+              f"eficiencia {efficiency:5.0%}   errores {errors}")
+    if max(counts) > (os.cpu_count() or 1):
+        print("\n⚠️  Hay más workers que núcleos: el throughput no puede escalar más allá de los núcleos")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from async_db import DatabaseWriter
+from database import connect
+from migrations import migrate
+
+# Benchmark de escrituras concurrentes: un COMMIT por escritura contra group commit
+# en el hilo escritor. Usa una base temporal.
+#
+# Uso (desde backend/): python -m benchmarks.bench_writes [--writes 5000 --clients 64]
+
+
+def insert_message(conn, i):
+    conn.execute(
+        'INSERT INTO contact_messages (name, email, message) VALUES (?, ?, ?)',
+        (f'Cliente {i}', f'cliente{i}@email.com', 'Consulta de prueba')
+    )
+
+
+def commit_per_write(path, writes, clients):
+    """Una conexión y un COMMIT por escritura (como el get_db() original)"""
+    def work(i):
+        conn = connect(path)
+        try:
+            insert_message(conn, i)
+            conn.commit()
+        finally:
+            conn.close()
+
+    with ThreadPoolExecutor(max_workers=clients) as threads:
+        start = time.perf_counter()
+        list(threads.map(work, range(writes)))
+        return time.perf_counter() - start
+
+
+def group_commit(path, writes, clients):
+    """Todas las escrituras por el hilo escritor"""
+    writer = DatabaseWriter(path)
+    writer.start()
+    with ThreadPoolExecutor(max_workers=clients) as threads:
+        start = time.perf_counter()
+        list(threads.map(lambda i: writer.submit(insert_message, i).result(), range(writes)))
+        elapsed = time.perf_counter() - start
+    stats = writer.stats()
+    writer.stop()
+    return elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de escrituras concurrentes")
+    parser.add_argument('--writes', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = connect(path)
+        migrate(conn)
+        conn.close()
+
+        print("=" * 60)
+        print(f"✍️  {args.writes} ESCRITURAS, {args.clients} CLIENTES CONCURRENTES")
+        print("=" * 60)
+        try:
+            elapsed = commit_per_write(path, args.writes, args.clients)
+            print(f"  COMMIT por escritura:{'':.<16} {args.writes / elapsed:>10.0f} escrituras/s")
+        except sqlite3.OperationalError as e:
+            print(f"  COMMIT por escritura: falló ({e})")
+
+        elapsed, stats = group_commit(path, args.writes, args.clients)
+        avg_batch = stats['jobs'] / max(stats['batches'], 1)
+        print(f"  Group commit:{'':.<24} {args.writes / elapsed:>10.0f} escrituras/s")
+        print(f"  Transacciones: {stats['batches']} (promedio {avg_batch:.1f} escrituras, máximo {stats['max_batch']})")
+
+
+if __name__ == "__main__":
+    main()
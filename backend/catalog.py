@@ -0,0 +1,191 @@
+import bisect
+import json
+import threading
+
+from assets import asset_manifest, image_logical_path
+from database import pool
+from versions import data_versions
+
+# Catálogo completo en una sola consulta: cada producto con sus categorías
+# agregadas como JSON (evita una consulta por producto)
+CATALOG_QUERY = '''
+    SELECT
+        p.id, p.name, p.description, p.price, p.image_url, p.stock,
+        json_group_array(
+            json_object('id', c.id, 'name', c.name, 'description', c.description)
+        ) FILTER (WHERE c.id IS NOT NULL) AS categories
+    FROM products p
+    LEFT JOIN product_categories pc ON p.id = pc.product_id
+    LEFT JOIN categories c ON c.id = pc.category_id
+    GROUP BY p.id
+    ORDER BY p.id
+'''
+
+CATEGORIES_QUERY = 'SELECT * FROM categories'
+
+# Tablas de las que depende el catálogo cacheado
+CATALOG_TABLES = ('products', 'categories', 'product_categories')
+
+PRODUCT_FIELDS = ('id', 'name', 'description', 'price', 'image_url', 'stock')
+# Campos de un producto en las respuestas (los de la tabla más la miniatura)
+PAYLOAD_FIELDS = PRODUCT_FIELDS + ('thumbnail_url',)
+
+# Órdenes admitidos en /api/products?sort=
+SORTS = ('price_asc', 'price_desc', 'name', 'newest')
+
+
+def thumbnail_url(image_url):
+    """URL de la miniatura del catálogo para el image_url de un producto"""
+    return asset_manifest.thumbnail_url(image_logical_path(image_url))
+
+
+def load_catalog(conn):
+    """Leer todos los productos con sus categorías"""
+    products = []
+    for row in conn.execute(CATALOG_QUERY):
+        product = {field: row[field] for field in PRODUCT_FIELDS}
+        product['thumbnail_url'] = thumbnail_url(row['image_url'])
+        product['categories'] = json.loads(row['categories'] or '[]')
+        products.append(product)
+    return products
+
+
+def load_categories(conn):
+    """Leer todas las categorías"""
+    return [dict(row) for row in conn.execute(CATEGORIES_QUERY)]
+
+
+def _bits(positions, size):
+    """Conjunto de posiciones como entero (bit i = producto i del catálogo)"""
+    flags = bytearray(b'0' * size)
+    for position in positions:
+        flags[position] = ord('1')
+    return int(flags[::-1].decode() or '0', 2)
+
+
+def _flags(mask, size):
+    """Bitset como texto de '0' y '1', donde el carácter i es el bit i"""
+    return format(mask, f'0{size}b')[::-1]
+
+
+class CatalogIndex:
+    """Índice invertido del catálogo: por categoría y por stock, como bitsets sobre las posiciones"""
+
+    def __init__(self, products, categories, version=None):
+        self.version = version
+        self.products = products
+        self.categories = categories
+        self.size = len(products)
+        self.all = (1 << self.size) - 1
+        self.in_stock = _bits((i for i, product in enumerate(products) if product['stock'] > 0), self.size)
+        members = {category['id']: [] for category in categories}
+        for i, product in enumerate(products):
+            for category in product['categories']:
+                members.setdefault(category['id'], []).append(i)
+        self.by_category = {category_id: _bits(positions, self.size) for category_id, positions in members.items()}
+        # Posiciones ordenadas por precio (para filtrar rangos con bisect) y por cada sort
+        self.by_price = sorted(range(len(products)), key=lambda i: (products[i]['price'], products[i]['id']))
+        self.prices = [products[i]['price'] for i in self.by_price]
+        self.orders = {
+            None: list(range(len(products))),
+            'price_asc': self.by_price,
+            'price_desc': sorted(range(len(products)), key=lambda i: (-products[i]['price'], products[i]['id'])),
+            'name': sorted(range(len(products)), key=lambda i: (products[i]['name'].casefold(), products[i]['id'])),
+            'newest': list(range(len(products) - 1, -1, -1)),
+        }
+        self.available = [product for product in products if product['stock'] > 0]
+        # Listas por categoría ya armadas para /api/categories/{id}/products
+        self.category_lists = {}
+
+    def price_mask(self, min_price=None, max_price=None):
+        """Productos con precio dentro del rango (extremos incluidos)"""
+        if min_price is None and max_price is None:
+            return self.all
+        start = 0 if min_price is None else bisect.bisect_left(self.prices, min_price)
+        end = len(self.prices) if max_price is None else bisect.bisect_right(self.prices, max_price)
+        if end - start > len(self.prices) // 2:
+            # Rango amplio: más barato quitar lo que queda afuera
+            return self.all & ~_bits(self.by_price[:start] + self.by_price[end:], self.size)
+        return _bits(self.by_price[start:end], self.size)
+
+    def category_mask(self, category_ids):
+        """Productos de cualquiera de las categorías"""
+        mask = 0
+        for category_id in category_ids:
+            mask |= self.by_category.get(category_id, 0)
+        return mask
+
+    def filter(self, category_ids=None, min_price=None, max_price=None, in_stock=True, sort=None):
+        """Productos filtrados y ordenados, más la cantidad por categoría.
+
+        Los conteos por categoría aplican los demás filtros pero no el de categorías,
+        para mostrar cuántos productos sumaría marcar cada una.
+        """
+        base = self.price_mask(min_price, max_price)
+        if in_stock:
+            base &= self.in_stock
+        mask = base & self.category_mask(category_ids) if category_ids else base
+
+        if sort is None and mask == self.in_stock:
+            # Sin filtros: el catálogo en stock ya está armado
+            matches = self.available
+        elif mask == self.all:
+            matches = [self.products[i] for i in self.orders[sort]]
+        else:
+            flags = _flags(mask, self.size)
+            matches = [self.products[i] for i in self.orders[sort] if flags[i] == '1']
+
+        facets = [
+            {'id': category['id'], 'name': category['name'],
+             'count': (base & self.by_category.get(category['id'], 0)).bit_count()}
+            for category in self.categories
+        ]
+        return matches, facets
+
+
+class CatalogCache:
+    """Caché en memoria del catálogo, de las categorías y de los productos por categoría.
+
+    Se carga desde SQLite solo cuando cambió la versión de las tablas del catálogo;
+    las peticiones servidas desde la caché no toman conexiones del pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+
+    def version(self):
+        """Versión de los datos del catálogo (cambia con cada escritura en sus tablas)"""
+        return data_versions.get(*CATALOG_TABLES)
+
+    def index(self):
+        """Índice del catálogo; se reconstruye si cambiaron las tablas"""
+        index = self._index
+        if index is not None and index.version == self.version():
+            return index
+        with self._lock:
+            # La versión se toma antes de leer: si cambia durante la carga,
+            # la próxima petición vuelve a reconstruir
+            version = self.version()
+            if self._index is None or self._index.version != version:
+                with pool.connection() as conn:
+                    self._index = CatalogIndex(load_catalog(conn), load_categories(conn), version)
+            return self._index
+
+    def categories(self):
+        """Lista de categorías cacheada"""
+        return self.index().categories
+
+    def products_by_category(self, category_id):
+        """Productos en stock de una categoría, derivados del índice"""
+        index = self.index()
+        products = index.category_lists.get(category_id)
+        if products is None:
+            matches, _ = index.filter(category_ids=[category_id])
+            products = index.category_lists[category_id] = [
+                {field: product[field] for field in PAYLOAD_FIELDS} for product in matches
+            ]
+        return products
+
+
+catalog_cache = CatalogCache()
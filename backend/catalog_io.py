@@ -0,0 +1,434 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from database import connect
+from migrations import migrate
+from serialization import dumps
+
+# Importación y exportación del catálogo (products, categories, product_categories)
+# en CSV o NDJSON, en streaming: se lee, valida y escribe por bloques, sin cargar
+# el archivo completo en memoria.
+#
+# Uso:
+#   python catalog_io.py import products proveedor.csv
+#   python catalog_io.py export products -o catalogo.ndjson
+# También disponible por HTTP en /api/admin/catalog/{tabla}/import y /export.
+
+FORMATS = ('csv', 'ndjson')
+MEDIA_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+# Filas por transacción al importar y por fetchmany() al exportar
+IMPORT_CHUNK_SIZE = int(os.environ.get('CUERAR_IMPORT_CHUNK_SIZE', '5000'))
+EXPORT_CHUNK_SIZE = 1000
+# Tamaño máximo de un archivo subido por HTTP, y cuánto se guarda en memoria
+# antes de pasar a un archivo temporal
+IMPORT_MAX_BYTES = int(os.environ.get('CUERAR_IMPORT_MAX_BYTES', str(1024 ** 3)))
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+# Errores que se detallan en el resultado (el resto solo se cuenta)
+MAX_REPORTED_ERRORS = 100
+
+
+def _empty(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _integer(record, field, required=False, minimum=None):
+    value = record.get(field)
+    if _empty(value):
+        if required:
+            raise ValueError(f"{field}: obligatorio")
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field}: se esperaba un número entero")
+    if isinstance(value, float) and value != number:
+        raise ValueError(f"{field}: se esperaba un número entero")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"{field}: debe ser mayor o igual a {minimum}")
+    return number
+
+
+def _number(record, field, required=False, minimum=None):
+    value = record.get(field)
+    if _empty(value):
+        if required:
+            raise ValueError(f"{field}: obligatorio")
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field}: se esperaba un número")
+    if number != number or number in (float('inf'), float('-inf')):
+        raise ValueError(f"{field}: se esperaba un número")
+    if minimum is not None and number < minimum:
+        raise ValueError(f"{field}: debe ser mayor o igual a {minimum}")
+    return number
+
+
+def _text(record, field, required=False):
+    value = record.get(field)
+    if _empty(value):
+        if required:
+            raise ValueError(f"{field}: obligatorio")
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"{field}: se esperaba texto")
+    return value.strip()
+
+
+class CatalogTable:
+    """Columnas, validación y SQL de importación/exportación de una tabla del catálogo"""
+
+    def __init__(self, name, columns, validate, upsert, export):
+        self.name = name
+        self.columns = columns
+        self.validate = validate
+        self.upsert = upsert
+        self.export = export
+
+
+def _validate_product(record):
+    return (
+        _integer(record, 'id', minimum=1),
+        _text(record, 'name', required=True),
+        _text(record, 'description'),
+        _number(record, 'price', required=True, minimum=0),
+        _text(record, 'image_url'),
+        _integer(record, 'stock', minimum=0),
+    )
+
+
+def _validate_category(record):
+    return (_integer(record, 'id', minimum=1), _text(record, 'name', required=True), _text(record, 'description'))
+
+
+def _validate_link(record):
+    return (_integer(record, 'product_id', required=True), _integer(record, 'category_id', required=True))
+
+
+# Sin id se crea un registro nuevo; con id se actualiza (o se crea con ese id).
+# Las columnas opcionales vacías o ausentes conservan el valor actual.
+TABLES = {
+    'products': CatalogTable(
+        'products', ('id', 'name', 'description', 'price', 'image_url', 'stock'), _validate_product,
+        '''
+        INSERT INTO products (id, name, description, price, image_url, stock)
+        VALUES (?1, ?2, ?3, ?4, ?5, COALESCE(?6, 0))
+        ON CONFLICT (id) DO UPDATE SET
+            name = ?2,
+            description = COALESCE(?3, description),
+            price = ?4,
+            image_url = COALESCE(?5, image_url),
+            stock = COALESCE(?6, stock)
+        ''',
+        'SELECT id, name, description, price, image_url, stock FROM products ORDER BY id',
+    ),
+    # El nombre también identifica a la categoría (es UNIQUE)
+    'categories': CatalogTable(
+        'categories', ('id', 'name', 'description'), _validate_category,
+        '''
+        INSERT INTO categories (id, name, description) VALUES (?1, ?2, ?3)
+        ON CONFLICT (id) DO UPDATE SET name = ?2, description = COALESCE(?3, description)
+        ON CONFLICT (name) DO UPDATE SET description = COALESCE(?3, description)
+        ''',
+        'SELECT id, name, description FROM categories ORDER BY id',
+    ),
+    # Solo se vinculan productos y categorías que existen
+    'product_categories': CatalogTable(
+        'product_categories', ('product_id', 'category_id'), _validate_link,
+        '''
+        INSERT OR IGNORE INTO product_categories (product_id, category_id)
+        SELECT p.id, c.id FROM products p, categories c WHERE p.id = ? AND c.id = ?
+        ''',
+        'SELECT product_id, category_id FROM product_categories ORDER BY product_id, category_id',
+    ),
+}
+
+
+def guess_format(filename=None, content_type=None):
+    """Formato según la extensión del archivo o el Content-Type, o None"""
+    if content_type:
+        media_type = content_type.split(';')[0].strip().lower()
+        if media_type in ('text/csv', 'application/csv'):
+            return 'csv'
+        if media_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+            return 'ndjson'
+    if filename:
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == '.csv':
+            return 'csv'
+        if extension in ('.ndjson', '.jsonl'):
+            return 'ndjson'
+    return None
+
+
+def iter_records(lines, fmt):
+    """(número de línea, registro o ValueError) por cada registro de lines (texto)"""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            if None in record:
+                yield reader.line_num, ValueError("más columnas que el encabezado")
+            else:
+                yield reader.line_num, record
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f"JSON inválido: {e}")
+            continue
+        if isinstance(record, dict):
+            yield number, record
+        else:
+            yield number, ValueError("se esperaba un objeto JSON")
+
+
+# Texto actual de los productos de un bloque que ya existen
+PRODUCTS_TEXT = 'SELECT id, name, description FROM products WHERE id IN ({placeholders})'
+
+# Triggers que mantienen products_fts fila por fila. En una importación se
+# suspenden y el índice se actualiza por bloque, con INSERT ... SELECT
+# (cinco veces más rápido que disparar el trigger por cada producto).
+FTS_TRIGGERS = ('trg_products_fts_insert', 'trg_products_fts_update')
+FTS_DELETE = '''
+    INSERT INTO products_fts (products_fts, rowid, name, description)
+    SELECT 'delete', id, name, description FROM products WHERE id = ?
+'''
+FTS_INSERT = 'INSERT INTO products_fts (rowid, name, description) SELECT id, name, description FROM products WHERE id = ?'
+FTS_INSERT_NEW = '''
+    INSERT INTO products_fts (rowid, name, description)
+    SELECT id, name, description FROM products WHERE id > ?
+'''
+# Los triggers de table_versions (migración 6) también se suspenden en los bloques
+# grandes: un cambio de versión por bloque en lugar de uno por fila (casi
+# triplicaban el tiempo de un bloque de 20.000 productos). En los bloques chicos
+# borrar y recrear los triggers cuesta más que dispararlos.
+VERSION_EVENTS = ('insert', 'update', 'delete')
+VERSION_TRIGGERS_MIN_ROWS = 100
+
+
+def _suspend_triggers(conn, names):
+    """Borrar los triggers indicados; devuelve su SQL para volver a crearlos"""
+    placeholders = ','.join('?' * len(names))
+    triggers = conn.execute(
+        f"SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name IN ({placeholders})", names
+    ).fetchall()
+    for name in names:
+        conn.execute(f'DROP TRIGGER IF EXISTS {name}')
+    return [sql for (sql,) in triggers]
+
+
+def _write_rows(conn, sql, rows):
+    """executemany; si el bloque viola una restricción, fila por fila para aislar las que fallan"""
+    conn.execute('SAVEPOINT catalog_rows')
+    try:
+        written = conn.executemany(sql, rows).rowcount
+        conn.execute('RELEASE catalog_rows')
+        return written, []
+    except sqlite3.IntegrityError:
+        conn.execute('ROLLBACK TO catalog_rows')
+        conn.execute('RELEASE catalog_rows')
+    written = 0
+    errors = []
+    for position, row in enumerate(rows):
+        try:
+            written += conn.execute(sql, row).rowcount
+        except sqlite3.IntegrityError as e:
+            errors.append((position, str(e)))
+    return written, errors
+
+
+def _existing_products(conn, rows, batch=500):
+    """(ids de rows que ya existen, ids existentes cuyo nombre o descripción cambia)"""
+    incoming = {row[0]: row for row in rows if row[0] is not None}
+    ids = list(incoming)
+    existing, changed = set(), set()
+    for start in range(0, len(ids), batch):
+        part = ids[start:start + batch]
+        current = conn.execute(
+            PRODUCTS_TEXT.format(placeholders=','.join('?' * len(part))), part
+        )
+        for product_id, name, description in current:
+            existing.add(product_id)
+            row = incoming[product_id]
+            if row[1] != name or (row[2] is not None and row[2] != description):
+                changed.add(product_id)
+    return existing, changed
+
+
+def _write_products(conn, rows):
+    """Productos con el índice de búsqueda actualizado por bloque"""
+    triggers = _suspend_triggers(conn, FTS_TRIGGERS)
+    last_id = conn.execute('SELECT MAX(id) FROM products').fetchone()[0] or 0
+    # Productos existentes a los que les cambia el nombre o la descripción: se quita
+    # su texto actual del índice y se vuelve a indexar después (cambiar solo precio o
+    # stock, lo habitual en un feed, no toca el índice)
+    existing, changed = _existing_products(conn, rows)
+    changed = [(product_id,) for product_id in changed]
+    # Productos nuevos: los que quedan por encima del id máximo (sin id o con uno
+    # mayor) se indexan juntos; los que traen un id libre por debajo, uno por uno
+    gaps = {row[0] for row in rows if row[0] is not None and row[0] <= last_id} - existing
+    conn.executemany(FTS_DELETE, changed)
+    written, errors = _write_rows(conn, TABLES['products'].upsert, rows)
+    conn.executemany(FTS_INSERT, changed + [(product_id,) for product_id in gaps])
+    conn.execute(FTS_INSERT_NEW, (last_id,))
+    for sql in triggers:
+        conn.execute(sql)
+    return written, errors
+
+
+def write_chunk(conn, table, rows):
+    """Escribir un bloque de filas validadas con executemany, todo o nada.
+
+    Las filas que violan una restricción (por ejemplo, un nombre de categoría
+    repetido) se rechazan sin afectar al resto del bloque.
+    Devuelve (filas escritas, [(posición en el bloque, error)]).
+    """
+    # Los triggers se suspenden dentro de la misma transacción: otras conexiones
+    # nunca ven el esquema sin ellos
+    conn.execute('SAVEPOINT catalog_import')
+    try:
+        triggers = []
+        if len(rows) >= VERSION_TRIGGERS_MIN_ROWS:
+            triggers = _suspend_triggers(conn, [f'trg_{table}_version_{event}' for event in VERSION_EVENTS])
+        if table == 'products':
+            result = _write_products(conn, rows)
+        else:
+            result = _write_rows(conn, TABLES[table].upsert, rows)
+        for sql in triggers:
+            conn.execute(sql)
+        if result[0] and triggers:
+            conn.execute('UPDATE table_versions SET version = version + 1 WHERE name = ?', (table,))
+    except BaseException:
+        conn.execute('ROLLBACK TO catalog_import')
+        conn.execute('RELEASE catalog_import')
+        raise
+    conn.execute('RELEASE catalog_import')
+    return result
+
+
+def import_records(lines, table, fmt, write, chunk_size=IMPORT_CHUNK_SIZE):
+    """Validar e importar los registros de lines por bloques.
+
+    write(filas) escribe un bloque en su propia transacción y devuelve lo mismo que
+    write_chunk. Devuelve el resumen de la importación.
+    """
+    validate = TABLES[table].validate
+    result = {'table': table, 'format': fmt, 'records': 0, 'written': 0, 'rejected': 0, 'errors': []}
+    rows, numbers = [], []
+
+    def reject(number, error):
+        result['rejected'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append({'line': number, 'error': error})
+
+    def flush():
+        written, errors = write(rows)
+        result['written'] += written
+        for position, error in errors:
+            reject(numbers[position], error)
+        rows.clear()
+        numbers.clear()
+
+    for number, record in iter_records(lines, fmt):
+        result['records'] += 1
+        if isinstance(record, ValueError):
+            reject(number, str(record))
+            continue
+        try:
+            rows.append(validate(record))
+            numbers.append(number)
+        except ValueError as e:
+            reject(number, str(e))
+            continue
+        if len(rows) >= chunk_size:
+            flush()
+    if rows:
+        flush()
+    result['errors'].sort(key=lambda error: error['line'])
+    return result
+
+
+def iter_export(conn, table, fmt, chunk_size=EXPORT_CHUNK_SIZE):
+    """Recorrer la tabla con fetchmany y emitirla en CSV o NDJSON (bytes)"""
+    columns = TABLES[table].columns
+    cursor = conn.execute(TABLES[table].export)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if fmt == 'csv':
+        writer.writerow(columns)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        if fmt == 'csv':
+            writer.writerows(tuple(row) for row in rows)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            yield b''.join(dumps(dict(zip(columns, row))) + b'\n' for row in rows)
+    if fmt == 'csv' and buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importar o exportar el catálogo en CSV o NDJSON")
+    parser.add_argument('action', choices=('import', 'export'))
+    parser.add_argument('table', choices=tuple(TABLES))
+    parser.add_argument('file', nargs='?', help="Archivo a importar ('-' o vacío: entrada estándar)")
+    parser.add_argument('-o', '--output', help="Archivo de salida al exportar (por defecto, salida estándar)")
+    parser.add_argument('--format', choices=FORMATS)
+    parser.add_argument('--db', help="Ruta de la base (por defecto CUERAR_DB o cuerar.db)")
+    args = parser.parse_args()
+
+    path = args.file if args.action == 'import' else args.output
+    fmt = args.format or guess_format(path if path != '-' else None)
+    if fmt is None:
+        parser.error("no se pudo deducir el formato: usar --format csv|ndjson")
+
+    conn = connect(args.db)
+    migrate(conn)
+    try:
+        if args.action == 'export':
+            out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+            try:
+                for chunk in iter_export(conn, args.table, fmt):
+                    out.write(chunk)
+            finally:
+                if args.output:
+                    out.close()
+            return 0
+
+        def write(rows):
+            with conn:
+                return write_chunk(conn, args.table, rows)
+
+        start = time.perf_counter()
+        source = open(args.file, encoding='utf-8-sig', newline='') if args.file and args.file != '-' else sys.stdin
+        try:
+            result = import_records(source, args.table, fmt, write)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        elapsed = time.perf_counter() - start
+        print(f"✅ {result['records']:,} registros en {elapsed:.1f} s: "
+              f"{result['written']:,} escritos, {result['rejected']:,} rechazados")
+        for error in result['errors']:
+            print(f"  línea {error['line']}: {error['error']}")
+        return 1 if result['rejected'] else 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+import gzip
+import os
+
+from starlette.middleware.gzip import GZipMiddleware
+
+# brotli es opcional: si no está instalado solo se ofrece gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Tamaño mínimo (bytes) para comprimir una respuesta
+COMPRESS_MIN_SIZE = int(os.environ.get('CUERAR_COMPRESS_MIN_SIZE', '1024'))
+# Niveles moderados: las variantes cacheadas se recalculan cada vez que cambian los datos
+GZIP_LEVEL = int(os.environ.get('CUERAR_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('CUERAR_BROTLI_QUALITY', '5'))
+# Archivos ya comprimidos (imágenes): volver a comprimirlos gasta CPU y no achica nada
+PRECOMPRESSED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.ico', '.woff', '.woff2')
+
+
+def supported_encodings():
+    """Codificaciones disponibles, en orden de preferencia"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding):
+    """Mejor codificación aceptada según Accept-Encoding, o None para enviar sin comprimir"""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip().lower()] = quality
+    candidates = [
+        encoding for encoding in supported_encodings()
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0
+    ]
+    if not candidates:
+        return None
+    # A igual calidad gana el orden de preferencia del servidor
+    return max(candidates, key=lambda encoding: accepted.get(encoding, accepted.get('*', 0.0)))
+
+
+def compress(body, encoding):
+    """Comprimir body con la codificación indicada"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f'Codificación no soportada: {encoding}')
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware que no toca las rutas con prefijo skip_prefixes ni los archivos
+    ya comprimidos (por extensión en la URL)."""
+
+    def __init__(self, app, skip_prefixes=(), **kwargs):
+        super().__init__(app, **kwargs)
+        self.skip_prefixes = tuple(skip_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            path = scope['path']
+            if path.startswith(self.skip_prefixes) or path.lower().endswith(PRECOMPRESSED_EXTENSIONS):
+                await self.app(scope, receive, send)
+                return
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,100 @@
+import logging
+import os
+import threading
+import time
+
+from database import pool
+from versions import data_versions
+
+logger = logging.getLogger(__name__)
+
+# Cada cuánto (segundos) se revisa si cambiaron las tablas de una instantánea
+STATS_MAX_AGE = float(os.environ.get('CUERAR_STATS_MAX_AGE', '30'))
+
+
+class StatsSnapshot:
+    """Resultado de un reporte precalculado; se recalcula solo si cambiaron sus tablas"""
+
+    def __init__(self, name, compute, tables, max_age=STATS_MAX_AGE):
+        self.name = name
+        self.compute = compute
+        self.tables = tables
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # (datos, segundo del cálculo, versión de las tablas con las que se calculó); el
+        # cuerpo de la respuesta incluye la fecha de cálculo, así que el ETag lleva las dos
+        self._state = None
+        self._version = None
+        self._checked_at = 0.0
+        self._computed_at = 0.0
+
+    def refresh(self, force=False):
+        """Recalcular la instantánea con una conexión del pool si cambiaron sus tablas"""
+        # Un solo cálculo a la vez: si ya hay uno en curso, se espera y se reutiliza
+        started = time.monotonic()
+        with self._lock:
+            if self._state is not None and self._checked_at >= started:
+                return
+            version = data_versions.get(*self.tables)
+            if force or self._state is None or version != self._version:
+                with pool.connection() as conn:
+                    # Versión y datos de la misma transacción de lectura
+                    conn.execute('BEGIN')
+                    try:
+                        version = data_versions.read(conn, *self.tables)
+                        data = self.compute(conn)
+                    finally:
+                        conn.rollback()
+                self._state = (data, int(time.time()), version)
+                self._version = version
+                self._computed_at = time.monotonic()
+            self._checked_at = time.monotonic()
+
+    def age(self):
+        if self._state is None:
+            return None
+        return time.monotonic() - self._computed_at
+
+    def get(self, fresh=False):
+        """Devolver (datos, metadatos, etiqueta); revisa la versión si se pide o si pasó max_age.
+
+        La etiqueta identifica la respuesta completa para el ETag: versión de las
+        tablas y segundo del cálculo, que cambia al recalcular aunque los datos no.
+        """
+        if fresh or self._state is None or time.monotonic() - self._checked_at > self.max_age:
+            self.refresh(force=fresh)
+        data, generated, version = self._state
+        generated_at = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(generated))
+        return data, {"generated_at": generated_at, "max_age_seconds": self.max_age}, f'{version}-{generated}'
+
+
+class SnapshotRefresher:
+    """Hilo en segundo plano que mantiene las instantáneas al día"""
+
+    def __init__(self, snapshots, interval=None):
+        self.snapshots = snapshots
+        # Se refresca antes de llegar a max_age para que las peticiones no esperen
+        self.interval = interval or STATS_MAX_AGE / 2
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            for snapshot in self.snapshots:
+                try:
+                    snapshot.refresh()
+                except Exception:
+                    logger.exception("Error al refrescar la instantánea '%s'", snapshot.name)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='stats-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
@@ -0,0 +1,174 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import connection_factory
+
+# Ruta de la base de datos (se puede cambiar con la variable de entorno CUERAR_DB)
+DB_PATH = os.environ.get('CUERAR_DB', 'cuerar.db')
+
+# Configuración del pool
+POOL_SIZE = int(os.environ.get('CUERAR_DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.environ.get('CUERAR_DB_POOL_TIMEOUT', '10'))
+# Segundos que una conexión puede estar ociosa antes de volver a verificarla
+HEALTH_CHECK_INTERVAL = 30.0
+
+# PRAGMAs que se aplican una sola vez a cada conexión nueva
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 16384        # 16 MiB de caché de páginas por conexión
+MMAP_SIZE_BYTES = 268435456   # 256 MiB de E/S mapeada en memoria
+
+
+class PoolTimeout(Exception):
+    """No hay conexiones libres en el pool dentro del tiempo de espera"""
+
+
+def configure_connection(conn):
+    """Aplicar los PRAGMAs de rendimiento a una conexión"""
+    # Primero busy_timeout: pasar a WAL una base nueva necesita el lock exclusivo, y
+    # con varios workers arrancando a la vez otro proceso puede tenerlo
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA cache_size = -{CACHE_SIZE_KIB}')
+    conn.execute(f'PRAGMA mmap_size = {MMAP_SIZE_BYTES}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    return conn
+
+
+def connect(path=None):
+    """Abrir una conexión configurada fuera del pool (scripts, init_db)"""
+    conn = sqlite3.connect(path or DB_PATH, check_same_thread=False, factory=connection_factory)
+    conn.row_factory = sqlite3.Row
+    return configure_connection(conn)
+
+
+class ConnectionPool:
+    """Pool de conexiones SQLite thread-safe y de tamaño acotado"""
+
+    def __init__(self, path=None, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.path = path or DB_PATH
+        self.size = size
+        self.timeout = timeout
+        # LIFO: se reutiliza primero la conexión más "caliente"
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._last_used = {}
+        self._stats = {
+            'acquired': 0,
+            'released': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'health_checks': 0,
+            'discarded': 0,
+        }
+
+    def _new_connection(self):
+        conn = connect(self.path)
+        self._last_used[id(conn)] = time.monotonic()
+        return conn
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _is_healthy(self, conn):
+        self._bump('health_checks')
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+            self._stats['discarded'] += 1
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self):
+        """Obtener una conexión del pool (o crear una si hay lugar)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        conn = self._new_connection()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                else:
+                    self._bump('waits')
+                    try:
+                        conn = self._idle.get(timeout=self.timeout)
+                    except queue.Empty:
+                        self._bump('timeouts')
+                        raise PoolTimeout("No hay conexiones disponibles en el pool")
+
+            idle_for = time.monotonic() - self._last_used.get(id(conn), 0)
+            if idle_for > HEALTH_CHECK_INTERVAL and not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+
+            self._bump('acquired')
+            return conn
+
+    def release(self, conn):
+        """Devolver una conexión al pool"""
+        if conn.in_transaction:
+            # Una transacción abierta no debe pasar al siguiente usuario
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                self._discard(conn)
+                return
+        self._last_used[id(conn)] = time.monotonic()
+        self._bump('released')
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Usar una conexión del pool dentro de un bloque with"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Cerrar todas las conexiones ociosas"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        """Estadísticas del pool"""
+        idle = self._idle.qsize()
+        return {
+            'size': self.size,
+            'open': self._created,
+            'idle': idle,
+            'in_use': self._created - idle,
+            **self._stats,
+        }
+
+
+pool = ConnectionPool()
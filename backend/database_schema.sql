@@ -84,17 +84,286 @@ CREATE TABLE IF NOT EXISTS contact_messages (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Tabla: user_order_stats
+-- Descripción: Resumen de pedidos por usuario (cantidad, total gastado, pedido máximo).
+--              La mantienen exacta los triggers sobre orders (migración 3 de migrations.py);
+--              verify_user_order_stats.py comprueba su consistencia.
+-- Relaciones: 1:1 con users
+CREATE TABLE IF NOT EXISTS user_order_stats (
+    user_id INTEGER PRIMARY KEY,
+    total_orders INTEGER NOT NULL DEFAULT 0,
+    total_spent REAL NOT NULL DEFAULT 0,
+    max_order REAL,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+-- Tabla: sessions
+-- Descripción: Sesiones abiertas con /api/login (el token firmado lleva el id).
+--              Tiempos en segundos desde epoch. Migración 4 de migrations.py.
+-- Relaciones: N:1 con users (un usuario puede tener varias sesiones)
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    created_at INTEGER NOT NULL,
+    expires_at INTEGER NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+
+-- Tabla virtual: products_fts
+-- Descripción: Índice de texto completo (FTS5) sobre products.name y products.description
+--              para /api/products/search. No guarda copia del texto (content='products')
+--              y se mantiene con triggers. Migración 5 de migrations.py.
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+    name, description,
+    content='products', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+-- Tabla: table_versions
+-- Descripción: Contador de cambios por tabla, compartido por todos los workers
+--              (versions.py), sumado a la secuencia de sqlite_sequence. Lo
+--              mantienen los triggers trg_<tabla>_version_*.
+--              La fila 'epoch' es un número al azar fijado al crear la tabla.
+--              Migración 6 de migrations.py.
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- Tabla: session_revocations
+-- Descripción: Sesiones cerradas antes de vencer, para que cada worker las quite
+--              de su caché (sessions.py); su versión es la secuencia de seq.
+--              Se borran pasado SESSION_CACHE_TTL.
+--              Migración 6 de migrations.py.
+CREATE TABLE IF NOT EXISTS session_revocations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    revoked_at INTEGER NOT NULL
+);
+
 -- ============================================
 -- ÍNDICES PARA MEJORAR RENDIMIENTO
 -- ============================================
 
--- Índices para búsquedas frecuentes
-CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
-CREATE INDEX IF NOT EXISTS idx_orders_user_id ON orders(user_id);
+-- Los índices se crean con la migración 2 de migrations.py (PRAGMA user_version = 2).
+-- Las búsquedas por users.email/username y por product_categories.product_id
+-- ya usan los índices implícitos de UNIQUE y de la PRIMARY KEY.
+
+-- Historial y estadísticas por usuario (WHERE user_id ORDER BY created_at, id)
+CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders(user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at);
 CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status);
+
+-- Carga de items por pedido
 CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id);
-CREATE INDEX IF NOT EXISTS idx_product_categories_product ON product_categories(product_id);
-CREATE INDEX IF NOT EXISTS idx_product_categories_category ON product_categories(category_id);
+
+-- Índice cubriente para el ranking de productos más vendidos
+CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items(product_name, product_price, quantity);
+
+-- Productos por categoría
+CREATE INDEX IF NOT EXISTS idx_product_categories_category ON product_categories(category_id, product_id);
+
+-- Filtros por stock (catálogo y reporte de bajo stock)
+CREATE INDEX IF NOT EXISTS idx_products_stock ON products(stock);
+
+-- Listado de mensajes de contacto del más reciente al más antiguo
+CREATE INDEX IF NOT EXISTS idx_contact_messages_created ON contact_messages(created_at, id);
+
+-- Recalcular MAX(total) de un usuario sin recorrer todos sus pedidos
+CREATE INDEX IF NOT EXISTS idx_orders_user_total ON orders(user_id, total);
+
+-- Sesiones por usuario (revocación) y limpieza de sesiones vencidas
+CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at);
+
+-- ============================================
+-- TRIGGERS
+-- ============================================
+
+-- Mantienen user_order_stats al insertar, borrar o modificar pedidos
+CREATE TRIGGER IF NOT EXISTS trg_orders_stats_insert
+AFTER INSERT ON orders
+WHEN NEW.user_id IS NOT NULL
+BEGIN
+    INSERT INTO user_order_stats (user_id, total_orders, total_spent, max_order)
+    VALUES (NEW.user_id, 1, NEW.total, NEW.total)
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_orders = total_orders + 1,
+        total_spent = total_spent + excluded.total_spent,
+        max_order = MAX(COALESCE(max_order, excluded.max_order), excluded.max_order);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_orders_stats_delete
+AFTER DELETE ON orders
+WHEN OLD.user_id IS NOT NULL
+BEGIN
+    UPDATE user_order_stats SET
+        total_orders = total_orders - 1,
+        total_spent = total_spent - OLD.total,
+        max_order = (SELECT MAX(total) FROM orders WHERE user_id = OLD.user_id)
+    WHERE user_id = OLD.user_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_orders_stats_update
+AFTER UPDATE OF user_id, total ON orders
+BEGIN
+    UPDATE user_order_stats SET
+        total_orders = total_orders - 1,
+        total_spent = total_spent - OLD.total,
+        max_order = (SELECT MAX(total) FROM orders WHERE user_id = OLD.user_id)
+    WHERE user_id = OLD.user_id;
+    INSERT INTO user_order_stats (user_id, total_orders, total_spent, max_order)
+    SELECT NEW.user_id, 1, NEW.total, NEW.total
+    WHERE NEW.user_id IS NOT NULL
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_orders = total_orders + 1,
+        total_spent = total_spent + excluded.total_spent,
+        max_order = (SELECT MAX(total) FROM orders WHERE user_id = NEW.user_id);
+END;
+
+-- Mantienen products_fts al insertar, borrar o cambiar el texto de un producto
+CREATE TRIGGER IF NOT EXISTS trg_products_fts_insert
+AFTER INSERT ON products
+BEGIN
+    INSERT INTO products_fts (rowid, name, description)
+    VALUES (NEW.id, NEW.name, NEW.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_fts_delete
+AFTER DELETE ON products
+BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description)
+    VALUES ('delete', OLD.id, OLD.name, OLD.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_fts_update
+AFTER UPDATE OF name, description ON products
+BEGIN
+    INSERT INTO products_fts (products_fts, rowid, name, description)
+    VALUES ('delete', OLD.id, OLD.name, OLD.description);
+    INSERT INTO products_fts (rowid, name, description)
+    VALUES (NEW.id, NEW.name, NEW.description);
+END;
+
+-- Cuentan en table_versions los cambios de cada tabla. Los INSERT en tablas con
+-- AUTOINCREMENT ya cambian sqlite_sequence (versions.py suma ambos): solo el
+-- catálogo, que puede recibir ids menores que la secuencia, cuenta sus INSERT
+INSERT OR IGNORE INTO table_versions (name, version) VALUES
+    ('epoch', abs(random() % 4294967296)),
+    ('users', 0), ('products', 0), ('categories', 0), ('product_categories', 0),
+    ('orders', 0), ('order_items', 0), ('contact_messages', 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_products_version_insert
+AFTER INSERT ON products
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'products';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_version_update
+AFTER UPDATE ON products
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'products';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_version_delete
+AFTER DELETE ON products
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'products';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_categories_version_insert
+AFTER INSERT ON categories
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'categories';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_categories_version_update
+AFTER UPDATE ON categories
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'categories';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_categories_version_delete
+AFTER DELETE ON categories
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'categories';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_product_categories_version_insert
+AFTER INSERT ON product_categories
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'product_categories';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_product_categories_version_update
+AFTER UPDATE ON product_categories
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'product_categories';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_product_categories_version_delete
+AFTER DELETE ON product_categories
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'product_categories';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_users_version_update
+AFTER UPDATE ON users
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_users_version_delete
+AFTER DELETE ON users
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_orders_version_update
+AFTER UPDATE ON orders
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'orders';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_orders_version_delete
+AFTER DELETE ON orders
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'orders';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_order_items_version_update
+AFTER UPDATE ON order_items
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'order_items';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_order_items_version_delete
+AFTER DELETE ON order_items
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'order_items';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_contact_messages_version_update
+AFTER UPDATE ON contact_messages
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'contact_messages';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_contact_messages_version_delete
+AFTER DELETE ON contact_messages
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'contact_messages';
+END;
+
+-- Registra las sesiones cerradas antes de vencer (no las vencidas que se limpian)
+CREATE TRIGGER IF NOT EXISTS trg_sessions_revoked
+AFTER DELETE ON sessions
+WHEN OLD.expires_at > CAST(strftime('%s', 'now') AS INTEGER)
+BEGIN
+    INSERT INTO session_revocations (session_id, revoked_at)
+    VALUES (OLD.id, CAST(strftime('%s', 'now') AS INTEGER));
+END;
 
 -- ============================================
 -- RESUMEN DE RELACIONES
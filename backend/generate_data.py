@@ -0,0 +1,369 @@
+import argparse
+import bisect
+import itertools
+import random
+import sys
+import time
+
+from database import connect
+from migrations import migrate
+from passwords import password_hasher
+
+# Generador de datos sintéticos para pruebas de carga y benchmarks.
+#
+# Agrega usuarios, productos, pedidos (con sus items) y mensajes de contacto a la
+# base indicada, con distribuciones parecidas a las de una tienda real:
+#   - Los usuarios se registran cada vez más seguido (crecimiento hacia el presente).
+#   - Unos pocos clientes hacen muchos pedidos y la mayoría pocos; los más antiguos
+#     compran más.
+#   - Pocos productos concentran la mayoría de las ventas (distribución de Zipf).
+#   - La mayoría de los pedidos tiene 1 o 2 items y cantidad 1.
+#   - Los pedidos recientes pueden estar pendientes; los viejos están completos o cancelados.
+#
+# La carga es en lote: executemany por bloques, índices secundarios y triggers de
+# user_order_stats desactivados durante la carga y reconstruidos al final.
+#
+# Uso: python generate_data.py --users 1000000 --orders 3000000 [--db otra.db]
+# Todos los usuarios generados tienen la contraseña "password123".
+
+CHUNK_SIZE = 50000
+# Días hacia atrás que abarcan las fechas generadas
+HISTORY_DAYS = 730
+PASSWORD = 'password123'
+
+# Mismas categorías que los datos de ejemplo de seed.py
+CATEGORIES = [
+    ('Alfombras', 'Alfombras de cuero natural para decoración'),
+    ('Carteras', 'Accesorios de cuero genuino'),
+    ('Cueros', 'Cueros naturales de diversos animales'),
+    ('Billeteras', 'Billeteras de cuero premium'),
+    ('Cinturones', 'Cinturones artesanales de cuero'),
+    ('Mochilas', 'Mochilas de cuero resistentes'),
+    ('Zapatos', 'Calzado de cuero hecho a mano'),
+    ('Chaquetas', 'Chaquetas de cuero de alta calidad'),
+    ('Decoración', 'Artículos decorativos de cuero'),
+    ('Accesorios', 'Diversos accesorios de cuero'),
+]
+# Tipo de producto -> categorías a las que pertenece
+PRODUCT_TYPES = {
+    'Alfombra': ('Alfombras', 'Decoración'),
+    'Cartera': ('Carteras', 'Accesorios'),
+    'Cuero': ('Cueros',),
+    'Billetera': ('Billeteras', 'Accesorios'),
+    'Cinturón': ('Cinturones', 'Accesorios'),
+    'Mochila': ('Mochilas', 'Accesorios'),
+    'Zapatos': ('Zapatos',),
+    'Chaqueta': ('Chaquetas',),
+    'Cojín': ('Decoración',),
+    'Porta documentos': ('Carteras', 'Accesorios'),
+}
+MATERIALS = ['de vaca', 'de cabra', 'de oveja', 'de carpincho', 'de búfalo', 'de cerdo']
+ADJECTIVES = ['negro', 'marrón', 'blanco', 'overo', 'clásico', 'vintage', 'premium', 'artesanal',
+              'trenzado', 'grande', 'compacto', 'rústico', 'elegante', 'suave', 'resistente']
+IMAGES = ['../img/alfombra-de-vaca-blanca-con-puntos.jpg', '../img/alfombra-de-vaca-overa.jpg',
+          '../img/cuero-de-cabra.jpg', '../img/cartera-cuero-g.jpg', '../img/cartera-cuero.jpg']
+FIRST_NAMES = ['juan', 'maria', 'carlos', 'ana', 'luis', 'sofia', 'diego', 'laura', 'pablo',
+               'valentina', 'martin', 'lucia', 'javier', 'camila', 'andres', 'julieta', 'tomas',
+               'florencia', 'nicolas', 'agustina', 'federico', 'paula', 'ignacio', 'carla']
+LAST_NAMES = ['perez', 'garcia', 'rodriguez', 'martinez', 'fernandez', 'lopez', 'gomez', 'diaz',
+              'ruiz', 'torres', 'sanchez', 'romero', 'alvarez', 'benitez', 'acosta', 'medina',
+              'herrera', 'suarez', 'aguirre', 'gimenez', 'molina', 'silva', 'castro', 'rojas']
+DOMAINS = ['email.com', 'correo.com.ar', 'mail.com', 'cuerar.com.ar']
+MESSAGES = ['¿Tienen envíos a todo el país?', '¿Hacen trabajos personalizados?',
+            'Consulta sobre garantía de productos', '¿Cuánto demora el envío?',
+            'Quiero saber si tienen stock', '¿Aceptan tarjetas de crédito?',
+            '¿Tienen local físico para ver productos?', 'Consulta sobre cuidado del cuero',
+            '¿Hacen descuentos por cantidad?', 'Mi pedido todavía no llegó']
+
+# Pedidos por estado: los de la última semana pueden seguir pendientes
+RECENT_DAYS = 7
+RECENT_STATUSES = (('pending', 0.6), ('completed', 0.38), ('cancelled', 0.02))
+OLD_STATUSES = (('completed', 0.93), ('cancelled', 0.07))
+# Items por pedido y cantidad por item
+ITEMS_PER_ORDER = ((1, 0.55), (2, 0.25), (3, 0.12), (4, 0.05), (5, 0.03))
+QUANTITIES = ((1, 0.82), (2, 0.13), (3, 0.05))
+# Exponente de Zipf para la popularidad de los productos
+PRODUCT_ZIPF = 1.1
+# Cuánto más compran los clientes antiguos: el usuario se elige con u ** USER_SKEW
+USER_SKEW = 1.5
+
+
+def _cumulative(weights):
+    return list(itertools.accumulate(weights))
+
+
+def _sampler(choices, rng):
+    """Función que elige un valor de [(valor, probabilidad)]"""
+    values = [value for value, _ in choices]
+    cumulative = _cumulative(weight for _, weight in choices)
+    total = cumulative[-1]
+    return lambda: values[bisect.bisect(cumulative, rng.random() * total)]
+
+
+def _recent_epochs(rng, count, start, end):
+    """count instantes (segundos desde epoch) entre start y end, más densos cerca del presente (ordenados).
+
+    Las fechas se guardan con datetime(?, 'unixepoch'): el formato lo hace SQLite.
+    """
+    span = end - start
+    return sorted(int(end - span * (1 - rng.random() ** 0.5)) for _ in range(count))
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    iterator = iter(rows)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def _next_id(conn, table):
+    row = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+    current = conn.execute(f'SELECT MAX(id) FROM {table}').fetchone()[0]
+    return max(row[0] if row else 0, current or 0) + 1
+
+
+def _insert(conn, sql, rows, label, report):
+    """Insertar rows por bloques, un COMMIT por bloque"""
+    count = 0
+    for chunk in _chunks(rows):
+        with conn:
+            conn.executemany(sql, chunk)
+        count += len(chunk)
+        report(label, count)
+    return count
+
+
+class BulkLoad:
+    """Desactiva índices secundarios y triggers de las tablas durante una carga masiva.
+
+    Crear un índice al final, de una vez y con los datos ordenados, es mucho más
+    rápido que mantenerlo fila por fila. Al salir se vuelven a crear aunque la
+    carga falle.
+    """
+
+    def __init__(self, conn, tables, triggers):
+        self.conn = conn
+        self.tables = tables
+        self.triggers = triggers
+        self._saved = []
+
+    def __enter__(self):
+        placeholders = ','.join('?' * len(self.tables))
+        rows = self.conn.execute(f'''
+            SELECT type, name, sql FROM sqlite_master
+            WHERE sql IS NOT NULL AND (
+                (type = 'index' AND tbl_name IN ({placeholders}))
+                OR (type = 'trigger' AND name IN ({','.join('?' * len(self.triggers))}))
+            )
+        ''', (*self.tables, *self.triggers)).fetchall()
+        self._saved = [(row['type'], row['name'], row['sql']) for row in rows]
+        with self.conn:
+            for kind, name, _ in self._saved:
+                self.conn.execute(f'DROP {kind.upper()} {name}')
+        self.conn.execute('PRAGMA synchronous = OFF')
+        return self
+
+    def __exit__(self, *exc):
+        with self.conn:
+            for _, _, sql in self._saved:
+                self.conn.execute(sql)
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        return False
+
+
+def ensure_categories(conn):
+    """Categorías por nombre -> id (crea las que falten)"""
+    with conn:
+        conn.executemany('INSERT OR IGNORE INTO categories (name, description) VALUES (?, ?)', CATEGORIES)
+    return {row['name']: row['id'] for row in conn.execute('SELECT id, name FROM categories')}
+
+
+def generate_products(conn, count, rng, report):
+    categories = ensure_categories(conn)
+    first_id = _next_id(conn, 'products')
+    products, links = [], []
+    types = list(PRODUCT_TYPES)
+    for product_id in range(first_id, first_id + count):
+        kind = rng.choice(types)
+        name = f'{kind} {rng.choice(MATERIALS)} {rng.choice(ADJECTIVES)} {product_id}'
+        description = f'{kind} {rng.choice(ADJECTIVES)} de cuero genuino, {rng.choice(ADJECTIVES)} y {rng.choice(ADJECTIVES)}'
+        # Precios log-normales: muchos productos baratos, pocos muy caros
+        price = round(min(max(rng.lognormvariate(10.5, 0.6), 3000), 400000), -2)
+        products.append((product_id, name, description, price, rng.choice(IMAGES), rng.randint(0, 60)))
+        links.extend((product_id, categories[category]) for category in PRODUCT_TYPES[kind])
+    _insert(conn, 'INSERT INTO products (id, name, description, price, image_url, stock) VALUES (?, ?, ?, ?, ?, ?)',
+            products, 'productos', report)
+    _insert(conn, 'INSERT OR IGNORE INTO product_categories (product_id, category_id) VALUES (?, ?)',
+            links, 'categorías de productos', report)
+    return count
+
+
+def generate_users(conn, count, rng, now, report):
+    first_id = _next_id(conn, 'users')
+    # Un solo hash scrypt para todos (hashear millones de contraseñas llevaría horas)
+    password_hash = password_hasher.hash(PASSWORD)
+    password_hasher.shutdown()
+    epochs = _recent_epochs(rng, count, now - HISTORY_DAYS * 86400, now)
+
+    def rows():
+        for offset, epoch in enumerate(epochs):
+            user_id = first_id + offset
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            # El id en el nombre y el email los hace únicos
+            yield (user_id, f'{first}_{last}_{user_id}', f'{first}.{last}{user_id}@{rng.choice(DOMAINS)}',
+                   password_hash, f'11{rng.randrange(10 ** 8):08d}', epoch)
+
+    sql = '''
+        INSERT INTO users (id, username, email, password_hash, phone, created_at)
+        VALUES (?, ?, ?, ?, ?, datetime(?, 'unixepoch'))
+    '''
+    return _insert(conn, sql, rows(), 'usuarios', report)
+
+
+def generate_orders(conn, count, rng, now, report):
+    users = conn.execute(
+        "SELECT id, CAST(strftime('%s', created_at) AS INTEGER) FROM users ORDER BY created_at, id"
+    ).fetchall()
+    products = [tuple(row) for row in conn.execute('SELECT name, price FROM products')]
+    if not users or not products:
+        print("⚠️  Se necesitan usuarios y productos para generar pedidos")
+        return 0, 0
+    rng.shuffle(products)
+    product_weights = _cumulative(1 / (rank + 1) ** PRODUCT_ZIPF for rank in range(len(products)))
+    items_per_order = _sampler(ITEMS_PER_ORDER, rng)
+    quantity = _sampler(QUANTITIES, rng)
+    recent_status = _sampler(RECENT_STATUSES, rng)
+    old_status = _sampler(OLD_STATUSES, rng)
+    recent_since = now - RECENT_DAYS * 86400
+    first_order = _next_id(conn, 'orders')
+    first_item = _next_id(conn, 'order_items')
+    items = []
+
+    def orders():
+        item_id = first_item
+        for order_id in range(first_order, first_order + count):
+            # Usuarios ordenados por antigüedad: los primeros concentran más pedidos
+            user_id, since = users[int(len(users) * rng.random() ** USER_SKEW)]
+            since = min(since or now, now)
+            epoch = int(since + (now - since) * rng.random() ** 0.7)
+            total = 0.0
+            for name, price in rng.choices(products, cum_weights=product_weights, k=items_per_order()):
+                qty = quantity()
+                total += price * qty
+                items.append((item_id, order_id, name, price, qty))
+                item_id += 1
+            status = recent_status() if epoch >= recent_since else old_status()
+            yield (order_id, user_id, total, status, epoch)
+
+    sql_orders = '''
+        INSERT INTO orders (id, user_id, total, status, created_at)
+        VALUES (?, ?, ?, ?, datetime(?, 'unixepoch'))
+    '''
+    sql_items = 'INSERT INTO order_items (id, order_id, product_name, product_price, quantity) VALUES (?, ?, ?, ?, ?)'
+    inserted_items = 0
+    loaded = 0
+    for chunk in _chunks(orders()):
+        with conn:
+            conn.executemany(sql_orders, chunk)
+            conn.executemany(sql_items, items)
+        loaded += len(chunk)
+        inserted_items += len(items)
+        items.clear()
+        report('pedidos', loaded)
+    report('items de pedidos', inserted_items)
+    return loaded, inserted_items
+
+
+def generate_messages(conn, count, rng, now, report):
+    epochs = _recent_epochs(rng, count, now - HISTORY_DAYS * 86400, now)
+
+    def rows():
+        for epoch in epochs:
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            yield (f'{first.title()} {last.title()}', f'{first}.{last}@{rng.choice(DOMAINS)}',
+                   rng.choice(MESSAGES), epoch)
+
+    sql = '''
+        INSERT INTO contact_messages (name, email, message, created_at)
+        VALUES (?, ?, ?, datetime(?, 'unixepoch'))
+    '''
+    return _insert(conn, sql, rows(), 'mensajes de contacto', report)
+
+
+def rebuild_user_order_stats(conn):
+    """Recalcular user_order_stats a partir de orders (los triggers estuvieron desactivados)"""
+    with conn:
+        conn.execute('DELETE FROM user_order_stats')
+        conn.execute('''
+            INSERT INTO user_order_stats (user_id, total_orders, total_spent, max_order)
+            SELECT user_id, COUNT(*), SUM(total), MAX(total)
+            FROM orders
+            WHERE user_id IS NOT NULL
+            GROUP BY user_id
+        ''')
+
+
+def generate(conn, users=0, products=0, orders=0, messages=0, seed=1, report=None):
+    """Agregar datos sintéticos; devuelve la cantidad de filas por tabla"""
+    report = report or (lambda label, count: None)
+    rng = random.Random(seed)
+    now = int(time.time())
+    migrate(conn)
+    counts = {}
+    if products:
+        counts['products'] = generate_products(conn, products, rng, report)
+    with BulkLoad(conn, ('users', 'orders', 'order_items', 'contact_messages'),
+                  triggers=('trg_orders_stats_insert',)):
+        if users:
+            counts['users'] = generate_users(conn, users, rng, now, report)
+        if orders:
+            counts['orders'], counts['order_items'] = generate_orders(conn, orders, rng, now, report)
+        if messages:
+            counts['contact_messages'] = generate_messages(conn, messages, rng, now, report)
+    if orders:
+        rebuild_user_order_stats(conn)
+    # Estadísticas para el planificador y checkpoint del WAL
+    conn.execute('PRAGMA optimize')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generar datos sintéticos en la base de Cuerar")
+    parser.add_argument('--db', help="Ruta de la base (por defecto CUERAR_DB o cuerar.db)")
+    parser.add_argument('--users', type=int, default=0)
+    parser.add_argument('--products', type=int, default=0)
+    parser.add_argument('--orders', type=int, default=0)
+    parser.add_argument('--messages', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    if not any((args.users, args.products, args.orders, args.messages)):
+        parser.error("indicar al menos una de --users, --products, --orders o --messages")
+
+    start = time.perf_counter()
+    current = []
+
+    def report(label, count):
+        # Una línea por tabla, actualizada en el lugar
+        if current and current[0] != label:
+            print()
+        current[:] = [label]
+        elapsed = time.perf_counter() - start
+        print(f"\r  {label:<24} {count:>10,}  ({elapsed:6.1f} s)", end='', flush=True)
+
+    conn = connect(args.db)
+    try:
+        print("=" * 60)
+        print("🏭 GENERANDO DATOS SINTÉTICOS")
+        print("=" * 60)
+        counts = generate(conn, args.users, args.products, args.orders, args.messages, args.seed, report)
+        print()
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        print(f"\n✅ {total:,} filas en {elapsed:.1f} s ({total / elapsed:,.0f} filas/s)")
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
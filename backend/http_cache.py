@@ -0,0 +1,112 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from starlette.responses import Response
+
+from compression import COMPRESS_MIN_SIZE, choose_encoding, compress
+from serialization import RawJSONResponse, dumps
+
+# Cache-Control de las respuestas públicas (catálogo y categorías): se pueden guardar
+# en navegadores y CDN pero se revalidan con If-None-Match antes de usarlas
+PUBLIC_CACHE_CONTROL = os.environ.get('CUERAR_CACHE_CONTROL', 'public, max-age=0, must-revalidate')
+# Reportes: solo en el navegador, revalidando siempre
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+# Memoria máxima para respuestas ya serializadas (bytes)
+PAYLOAD_CACHE_BYTES = int(os.environ.get('CUERAR_PAYLOAD_CACHE_BYTES', str(64 * 1024 * 1024)))
+
+
+class PayloadCache:
+    """Cuerpos de respuesta ya serializados (y sus versiones comprimidas), por ETag.
+
+    LRU acotada por tamaño total.
+    Como el ETag incluye la versión de los datos, una entrada vieja nunca se vuelve a
+    usar: deja de pedirse y sale por LRU.
+    """
+
+    def __init__(self, max_bytes=PAYLOAD_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key, produce):
+        """Bytes guardados para key, o los que devuelve produce() (y se guardan)"""
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return body
+            self._stats['misses'] += 1
+        body = produce()
+        self.put(key, body)
+        return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self._stats['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'max_bytes': self.max_bytes, **self._stats}
+
+
+payload_cache = PayloadCache()
+
+
+def make_etag(*parts):
+    """ETag fuerte a partir de versiones y demás partes que definen la respuesta"""
+    return '"' + '-'.join(str(part) for part in parts) + '"'
+
+
+def query_digest(request):
+    """Resumen corto de los parámetros de la URL (la respuesta depende de ellos)"""
+    items = sorted(request.query_params.multi_items())
+    if not items:
+        return 'all'
+    return hashlib.blake2s(repr(items).encode(), digest_size=6).hexdigest()
+
+
+def not_modified(request, etag):
+    """True si el If-None-Match de la petición incluye el ETag (comparación débil, RFC 9110)"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = (tag.strip() for tag in header.split(','))
+    return etag in (tag[2:] if tag.startswith('W/') else tag for tag in candidates)
+
+
+def conditional_response(request, etag, build, cache_control=PUBLIC_CACHE_CONTROL, headers=None):
+    """304 si el cliente ya tiene esta versión; si no, 200 con el contenido de build().
+
+    El cuerpo serializado y sus variantes comprimidas se guardan por ETag y se
+    reutilizan mientras no cambien los datos.
+    """
+    encoding = choose_encoding(request.headers.get('accept-encoding'))
+    # Cada codificación es una representación distinta: su propio ETag fuerte
+    variant_etag = f'{etag[:-1]}-{encoding}"' if encoding else etag
+    headers = {'Cache-Control': cache_control, 'Vary': 'Accept-Encoding', **(headers or {})}
+    if not_modified(request, etag) or not_modified(request, variant_etag):
+        # Sin consultar ni serializar nada
+        return Response(status_code=304, headers={'ETag': variant_etag, **headers})
+
+    body = payload_cache.get(etag, lambda: dumps(build()))
+    if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+        return RawJSONResponse(body, headers={'ETag': etag, **headers})
+    compressed = payload_cache.get((etag, encoding), lambda: compress(body, encoding))
+    return RawJSONResponse(compressed, headers={'ETag': variant_etag, 'Content-Encoding': encoding, **headers})
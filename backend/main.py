@@ -1,13 +1,65 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, EmailStr, Field, ValidationError
 from typing import Optional, List
 import sqlite3
-from datetime import datetime
 import hashlib
 import secrets
+import asyncio
+import io
+import mimetypes
+import os
+import tempfile
+import anyio
+from contextlib import asynccontextmanager
 
-app = FastAPI(title="Cuerar API", version="1.0.0")
+from database import PoolTimeout, pool
+from migrations import ensure_schema
+from catalog import CATALOG_TABLES, SORTS, catalog_cache
+from catalog_io import (
+    FORMATS, IMPORT_MAX_BYTES, IMPORT_SPOOL_BYTES, MEDIA_TYPES, TABLES as CATALOG_IO_TABLES,
+    guess_format, import_records, iter_export, write_chunk
+)
+from search import MAX_QUERY_LENGTH, search_products
+import queries
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, split_page
+from streaming import ndjson_response
+from dashboard import StatsSnapshot, SnapshotRefresher
+from versions import data_versions
+from serialization import FastJSONResponse
+from compression import COMPRESS_MIN_SIZE, GZIP_LEVEL, SelectiveGZipMiddleware, choose_encoding
+from http_cache import PRIVATE_CACHE_CONTROL, conditional_response, make_etag, not_modified, payload_cache, query_digest
+from assets import (
+    COMPRESSIBLE_EXTENSIONS, IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, THUMBNAIL_WIDTHS, Image,
+    asset_manifest, resolve_page, thumbnail_cache
+)
+from passwords import password_hasher, HasherBusy, DUMMY_HASH
+from sessions import session_store
+from async_db import db, writer
+from slow_queries import slow_query_log
+from profiling import (
+    FORMATS as PROFILE_FORMATS, ProfilingMiddleware, export_collapsed, export_pstats, export_text,
+    instrument_routes, profile_store
+)
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, METRICS_ENABLED, MetricsMiddleware, registry as metrics_registry
+from orders import (
+    BULK_CHUNK_SIZE, BULK_MAX_BYTES, BULK_MAX_ORDERS, OutOfStock, insert_orders, iter_ndjson_lines, parse_json_array, parse_ndjson_line
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El esquema se prepara al arrancar la app, no al importar main.py
+    init_db()
+    writer.start()
+    stats_refresher.start()
+    yield
+    stats_refresher.stop()
+    writer.stop()
+    password_hasher.shutdown()
+
+app = FastAPI(title="Cuerar API", version="1.0.0", lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Configuración de CORS
 app.add_middleware(
@@ -18,239 +70,70 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresión gzip del resto de las respuestas (las que ya traen Content-Encoding,
+# como las cacheadas con sus variantes comprimidas, no se tocan). /assets/ queda
+# afuera: las imágenes ya vienen comprimidas y css/js se comprimen una vez por hash
+app.add_middleware(SelectiveGZipMiddleware, skip_prefixes=('/assets/',),
+                   minimum_size=COMPRESS_MIN_SIZE, compresslevel=GZIP_LEVEL)
+
+# Métricas por ruta (el último middleware agregado es el de más afuera: mide la
+# petición completa, compresión incluida)
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Inicializar base de datos
 def init_db():
-    conn = sqlite3.connect('cuerar.db')
-    cursor = conn.cursor()
-    
-    # Tabla de usuarios
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            phone TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Tabla de productos
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS products (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            description TEXT,
-            price REAL NOT NULL,
-            image_url TEXT,
-            stock INTEGER DEFAULT 0
-        )
-    ''')
-    
-    # Tabla de pedidos
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            total REAL NOT NULL,
-            status TEXT DEFAULT 'pending',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Tabla de items de pedidos
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS order_items (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            order_id INTEGER,
-            product_name TEXT NOT NULL,
-            product_price REAL NOT NULL,
-            quantity INTEGER DEFAULT 1,
-            FOREIGN KEY (order_id) REFERENCES orders (id)
-        )
-    ''')
-    
-    # Tabla de mensajes de contacto
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS contact_messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL,
-            message TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Tabla de categorías
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS categories (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE NOT NULL,
-            description TEXT
-        )
-    ''')
-    
-    # Tabla de relación productos-categorías (muchos a muchos)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS product_categories (
-            product_id INTEGER,
-            category_id INTEGER,
-            PRIMARY KEY (product_id, category_id),
-            FOREIGN KEY (product_id) REFERENCES products (id),
-            FOREIGN KEY (category_id) REFERENCES categories (id)
-        )
-    ''')
-    
-    # Insertar categorías si no existen
-    cursor.execute('SELECT COUNT(*) FROM categories')
-    if cursor.fetchone()[0] == 0:
-        categories = [
-            ('Alfombras', 'Alfombras de cuero natural para decoración'),
-            ('Carteras', 'Accesorios de cuero genuino'),
-            ('Cueros', 'Cueros naturales de diversos animales'),
-            ('Billeteras', 'Billeteras de cuero premium'),
-            ('Cinturones', 'Cinturones artesanales de cuero'),
-            ('Mochilas', 'Mochilas de cuero resistentes'),
-            ('Zapatos', 'Calzado de cuero hecho a mano'),
-            ('Chaquetas', 'Chaquetas de cuero de alta calidad'),
-            ('Decoración', 'Artículos decorativos de cuero'),
-            ('Accesorios', 'Diversos accesorios de cuero')
-        ]
-        cursor.executemany('INSERT INTO categories (name, description) VALUES (?, ?)', categories)
-    
-    # Insertar productos de ejemplo si no existen
-    cursor.execute('SELECT COUNT(*) FROM products')
-    if cursor.fetchone()[0] == 0:
-        products = [
-            ('Alfombra de vaca blanca con puntos', 'Cuero genuino de vaca con patrón natural', 45000.00, '../img/alfombra-de-vaca-blanca-con-puntos.jpg', 10),
-            ('Alfombra de vaca overa', 'Cuero genuino de vaca overa', 45000.00, '../img/alfombra-de-vaca-overa.jpg', 8),
-            ('Cuero de cabra premium', 'Cuero genuino de cabra, suave y resistente', 40000.00, '../img/cuero-de-cabra.jpg', 15),
-            ('Cartera de cuero grande', 'Cartera espaciosa de cuero genuino', 40000.00, '../img/cartera-cuero-g.jpg', 20),
-            ('Cartera de cuero clásica', 'Cartera elegante de cuero genuino', 40000.00, '../img/cartera-cuero.jpg', 12),
-            ('Billetera de cuero marrón', 'Billetera compacta con múltiples compartimentos', 15000.00, '../img/cartera-cuero.jpg', 25),
-            ('Cinturón de cuero negro', 'Cinturón resistente con hebilla metálica', 18000.00, '../img/cartera-cuero.jpg', 30),
-            ('Mochila de cuero vintage', 'Mochila espaciosa estilo vintage', 65000.00, '../img/cartera-cuero.jpg', 5),
-            ('Zapatos de cuero casual', 'Zapatos cómodos para uso diario', 55000.00, '../img/cartera-cuero.jpg', 15),
-            ('Chaqueta de cuero negra', 'Chaqueta clásica de cuero negro', 120000.00, '../img/cartera-cuero.jpg', 8),
-            ('Alfombra de oveja blanca', 'Suave alfombra de cuero de oveja', 50000.00, '../img/alfombra-de-vaca-blanca-con-puntos.jpg', 6),
-            ('Cartera crossbody', 'Cartera pequeña con correa ajustable', 35000.00, '../img/cartera-cuero-g.jpg', 18),
-            ('Cuero de cabra negro', 'Cuero premium de cabra color negro', 42000.00, '../img/cuero-de-cabra.jpg', 12),
-            ('Porta documentos de cuero', 'Elegante porta documentos profesional', 48000.00, '../img/cartera-cuero.jpg', 10),
-            ('Cojines decorativos de cuero', 'Set de 2 cojines de cuero para sofá', 28000.00, '../img/cuero-de-cabra.jpg', 20)
-        ]
-        cursor.executemany('INSERT INTO products (name, description, price, image_url, stock) VALUES (?, ?, ?, ?, ?)', products)
-        
-        # Asignar categorías a productos (relación muchos a muchos)
-        product_category_relations = [
-            (1, 1), (1, 9),  # Alfombra vaca blanca -> Alfombras, Decoración
-            (2, 1), (2, 9),  # Alfombra overa -> Alfombras, Decoración
-            (3, 3),          # Cuero cabra -> Cueros
-            (4, 2), (4, 10), # Cartera grande -> Carteras, Accesorios
-            (5, 2), (5, 10), # Cartera clásica -> Carteras, Accesorios
-            (6, 4), (6, 10), # Billetera -> Billeteras, Accesorios
-            (7, 5), (7, 10), # Cinturón -> Cinturones, Accesorios
-            (8, 6), (8, 10), # Mochila -> Mochilas, Accesorios
-            (9, 7),          # Zapatos -> Zapatos
-            (10, 8),         # Chaqueta -> Chaquetas
-            (11, 1), (11, 9),# Alfombra oveja -> Alfombras, Decoración
-            (12, 2), (12, 10),# Cartera crossbody -> Carteras, Accesorios
-            (13, 3),         # Cuero cabra negro -> Cueros
-            (14, 2), (14, 10),# Porta documentos -> Carteras, Accesorios
-            (15, 9), (15, 10) # Cojines -> Decoración, Accesorios
-        ]
-        cursor.executemany('INSERT INTO product_categories (product_id, category_id) VALUES (?, ?)', product_category_relations)
-    
-    # Insertar usuarios de ejemplo si no existen
-    cursor.execute('SELECT COUNT(*) FROM users')
-    if cursor.fetchone()[0] == 0:
-        # Contraseña: "password123" hasheada
-        default_hash = hashlib.sha256("password123".encode()).hexdigest()
-        users = [
-            ('juan_perez', 'juan.perez@email.com', default_hash, '1122334455'),
-            ('maria_garcia', 'maria.garcia@email.com', default_hash, '1133445566'),
-            ('carlos_rodriguez', 'carlos.rodriguez@email.com', default_hash, '1144556677'),
-            ('ana_martinez', 'ana.martinez@email.com', default_hash, '1155667788'),
-            ('luis_fernandez', 'luis.fernandez@email.com', default_hash, '1166778899'),
-            ('sofia_lopez', 'sofia.lopez@email.com', default_hash, '1177889900'),
-            ('diego_gomez', 'diego.gomez@email.com', default_hash, '1188990011'),
-            ('laura_diaz', 'laura.diaz@email.com', default_hash, '1199001122'),
-            ('pablo_ruiz', 'pablo.ruiz@email.com', default_hash, '1100112233'),
-            ('valentina_torres', 'valentina.torres@email.com', default_hash, '1111223344')
-        ]
-        cursor.executemany('INSERT INTO users (username, email, password_hash, phone) VALUES (?, ?, ?, ?)', users)
-    
-    # Insertar pedidos de ejemplo si no existen
-    cursor.execute('SELECT COUNT(*) FROM orders')
-    if cursor.fetchone()[0] == 0:
-        orders = [
-            (1, 45000.00, 'completed'),
-            (2, 80000.00, 'completed'),
-            (3, 40000.00, 'pending'),
-            (4, 120000.00, 'completed'),
-            (1, 15000.00, 'completed'),
-            (5, 90000.00, 'completed'),
-            (6, 35000.00, 'pending'),
-            (7, 48000.00, 'completed'),
-            (8, 73000.00, 'completed'),
-            (9, 28000.00, 'completed'),
-            (10, 105000.00, 'pending'),
-            (2, 55000.00, 'completed')
-        ]
-        cursor.executemany('INSERT INTO orders (user_id, total, status) VALUES (?, ?, ?)', orders)
-        
-        # Insertar items de pedidos
-        order_items = [
-            (1, 'Alfombra de vaca blanca con puntos', 45000.00, 1),
-            (2, 'Cartera de cuero grande', 40000.00, 1),
-            (2, 'Cartera de cuero clásica', 40000.00, 1),
-            (3, 'Cuero de cabra premium', 40000.00, 1),
-            (4, 'Chaqueta de cuero negra', 120000.00, 1),
-            (5, 'Billetera de cuero marrón', 15000.00, 1),
-            (6, 'Alfombra de vaca overa', 45000.00, 1),
-            (6, 'Alfombra de oveja blanca', 50000.00, 1),
-            (7, 'Cartera crossbody', 35000.00, 1),
-            (8, 'Porta documentos de cuero', 48000.00, 1),
-            (9, 'Cinturón de cuero negro', 18000.00, 1),
-            (9, 'Zapatos de cuero casual', 55000.00, 1),
-            (10, 'Cojines decorativos de cuero', 28000.00, 1),
-            (11, 'Mochila de cuero vintage', 65000.00, 1),
-            (11, 'Cartera de cuero grande', 40000.00, 1),
-            (12, 'Zapatos de cuero casual', 55000.00, 1)
-        ]
-        cursor.executemany('INSERT INTO order_items (order_id, product_name, product_price, quantity) VALUES (?, ?, ?, ?)', order_items)
-    
-    # Insertar mensajes de contacto de ejemplo
-    cursor.execute('SELECT COUNT(*) FROM contact_messages')
-    if cursor.fetchone()[0] == 0:
-        messages = [
-            ('Juan Pérez', 'juan@email.com', '¿Tienen envíos a todo el país?'),
-            ('María García', 'maria@email.com', 'Me gustaría saber más sobre los cueros de cabra'),
-            ('Carlos López', 'carlos@email.com', '¿Hacen trabajos personalizados?'),
-            ('Ana Rodríguez', 'ana@email.com', 'Consulta sobre garantía de productos'),
-            ('Luis Martínez', 'luis@email.com', '¿Cuánto demora el envío a Córdoba?'),
-            ('Sofía Fernández', 'sofia@email.com', 'Quiero saber si tienen stock de alfombras'),
-            ('Diego Torres', 'diego@email.com', '¿Aceptan tarjetas de crédito?'),
-            ('Laura Gómez', 'laura@email.com', 'Me interesa la chaqueta de cuero negra'),
-            ('Pablo Díaz', 'pablo@email.com', '¿Tienen local físico para ver productos?'),
-            ('Valentina Ruiz', 'valentina@email.com', 'Consulta sobre cuidado del cuero')
-        ]
-        cursor.executemany('INSERT INTO contact_messages (name, email, message) VALUES (?, ?, ?)', messages)
-    
-    conn.commit()
-    conn.close()
-
-# Inicializar DB al arrancar
-init_db()
+    """Crear o actualizar el esquema; si PRAGMA user_version está al día no hace nada más.
+
+    Los datos de ejemplo se cargan aparte, con python seed.py.
+    """
+    ensure_schema()
 
 # Funciones de utilidad
 def get_db():
-    conn = sqlite3.connect('cuerar.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Dependencia de FastAPI: presta una conexión del pool durante la petición"""
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
 
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    """Sin conexiones libres en el pool: el servidor está saturado, no es un error interno"""
+    return FastJSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+# Token de las rutas de administración (/api/admin/*); sin él quedan deshabilitadas
+ADMIN_TOKEN = os.environ.get('CUERAR_ADMIN_TOKEN')
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependencia de FastAPI: exige el encabezado X-Admin-Token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Administración deshabilitada (definir CUERAR_ADMIN_TOKEN)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Token de administración inválido")
+
+# Perfilado a pedido: X-Profile: 1 (o ?profile=1) con X-Admin-Token, o una
+# fracción del tráfico con CUERAR_PROFILE_SAMPLE_RATE (ver profiling.py)
+app.add_middleware(ProfilingMiddleware, admin_token=ADMIN_TOKEN)
+
+def get_current_user(authorization: Optional[str] = Header(None)):
+    """Dependencia de FastAPI: usuario de la sesión (Authorization: Bearer <token>), o None"""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        raise HTTPException(status_code=401, detail="Encabezado Authorization inválido")
+    # Se resuelve desde la caché de sesiones, sin consultar la base en cada petición
+    user = session_store.validate(token)
+    if not user:
+        raise HTTPException(status_code=401, detail="Sesión inválida o expirada")
+    return user
+
+def check_same_user(current_user, user_id):
+    """Con sesión iniciada, solo se puede operar sobre el propio usuario"""
+    if current_user and user_id is not None and current_user['id'] != user_id:
+        raise HTTPException(status_code=403, detail="No autorizado para este usuario")
 
 # Modelos Pydantic
 class UserRegister(BaseModel):
@@ -271,11 +154,18 @@ class ContactMessage(BaseModel):
 class CartItem(BaseModel):
     nombre: str
     precio: float
+    cantidad: int = Field(1, ge=1)
+    # Si se indica, se reserva el stock del producto al confirmar el pedido
+    product_id: Optional[int] = None
 
 class Order(BaseModel):
     items: List[CartItem]
     total: float
     user_id: Optional[int] = None
+    
+    def to_row(self, user_id):
+        """Fila para insert_orders"""
+        return (user_id, self.total, [(item.nombre, item.precio, item.cantidad, item.product_id) for item in self.items])
 
 # Rutas de la API
 
@@ -284,129 +174,151 @@ def read_root():
     return {"message": "Bienvenido a la API de Cuerar"}
 
 @app.get("/api/products")
-def get_products():
-    """Obtener todos los productos con sus categorías"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM products WHERE stock > 0')
-    products = []
-    
-    for row in cursor.fetchall():
-        product = dict(row)
-        # Obtener categorías del producto
-        cursor.execute('''
-            SELECT c.id, c.name, c.description 
-            FROM categories c
-            JOIN product_categories pc ON c.id = pc.category_id
-            WHERE pc.product_id = ?
-        ''', (product['id'],))
-        product['categories'] = [dict(cat) for cat in cursor.fetchall()]
-        products.append(product)
-    
-    conn.close()
-    return {"products": products}
+def get_products(
+    request: Request,
+    categories: Optional[str] = Query(None, description="Ids de categorías separados por coma"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: Optional[str] = Query(None, pattern=f"^({'|'.join(SORTS)})$"),
+    in_stock: bool = True
+):
+    """Obtener los productos con sus categorías, con filtros y conteos por categoría"""
+    try:
+        category_ids = [int(part) for part in categories.split(',') if part.strip()] if categories else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="categories debe ser una lista de ids separados por coma")
+    
+    def build():
+        # Se resuelve con el índice en memoria del catálogo, sin consultar SQLite
+        products, facets = catalog_cache.index().filter(category_ids, min_price, max_price, in_stock, sort)
+        return {"products": products, "total": len(products), "facets": {"categories": facets}}
+    
+    etag = make_etag('products', catalog_cache.version(), query_digest(request))
+    return conditional_response(request, etag, build)
+
+@app.get("/api/products/search")
+def search_products_route(
+    q: str = Query(..., min_length=1, max_length=MAX_QUERY_LENGTH),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    conn: sqlite3.Connection = Depends(get_db)
+):
+    """Buscar productos por nombre y descripción (sin distinguir acentos, por prefijo)"""
+    return FastJSONResponse({"query": q, "products": search_products(conn, q, limit)})
 
 @app.get("/api/categories")
-def get_categories():
+def get_categories(request: Request):
     """Obtener todas las categorías"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM categories')
-    categories = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return {"categories": categories}
+    etag = make_etag('categories', catalog_cache.version())
+    return conditional_response(request, etag, lambda: {"categories": catalog_cache.categories()})
 
 @app.get("/api/categories/{category_id}/products")
-def get_products_by_category(category_id: int):
+def get_products_by_category(category_id: int, request: Request):
     """Obtener productos de una categoría específica"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT p.* FROM products p
-        JOIN product_categories pc ON p.id = pc.product_id
-        WHERE pc.category_id = ? AND p.stock > 0
-    ''', (category_id,))
-    products = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return {"products": products}
+    etag = make_etag('category', category_id, catalog_cache.version())
+    return conditional_response(
+        request, etag, lambda: {"products": catalog_cache.products_by_category(category_id)}
+    )
 
 @app.post("/api/register")
-def register_user(user: UserRegister):
+async def register_user(user: UserRegister):
     """Registrar un nuevo usuario"""
-    conn = get_db()
-    cursor = conn.cursor()
+    # Verificar si el email o username ya existen
+    def find_existing(conn):
+        return conn.execute(queries.USER_EXISTS, (user.email, user.username)).fetchone()
+    
+    if await db.read(find_existing):
+        raise HTTPException(status_code=400, detail="El email o nombre de usuario ya están registrados")
     
+    # Hash de la contraseña (en el pool de procesos, sin retener una conexión ni un hilo)
     try:
-        # Verificar si el email o username ya existen
-        cursor.execute('SELECT id FROM users WHERE email = ? OR username = ?', (user.email, user.username))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="El email o nombre de usuario ya están registrados")
-        
-        # Hash de la contraseña
-        password_hash = hash_password(user.password)
-        
-        # Insertar usuario
-        cursor.execute(
-            'INSERT INTO users (username, email, password_hash, phone) VALUES (?, ?, ?, ?)',
-            (user.username, user.email, password_hash, user.phone)
+        password_hash = await password_hasher.hash_async(user.password)
+    except HasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    # Insertar usuario
+    def insert_user(conn):
+        cursor = conn.execute(
+            queries.INSERT_USER, (user.username, user.email, password_hash, user.phone)
         )
-        conn.commit()
-        user_id = cursor.lastrowid
-        
-        conn.close()
-        return {
-            "success": True,
-            "message": f"¡Ya estás registrado {user.username}, bienvenido a Cuerar!",
-            "user": {
-                "id": user_id,
-                "username": user.username,
-                "email": user.email
-            }
-        }
+        return cursor.lastrowid
+    
+    try:
+        user_id = await db.write(insert_user)
     except sqlite3.IntegrityError:
-        conn.close()
         raise HTTPException(status_code=400, detail="Error al registrar usuario")
+    data_versions.bump('users')
+    
+    return {
+        "success": True,
+        "message": f"¡Ya estás registrado {user.username}, bienvenido a Cuerar!",
+        "user": {
+            "id": user_id,
+            "username": user.username,
+            "email": user.email
+        }
+    }
 
 @app.post("/api/login")
-def login_user(credentials: UserLogin):
+async def login_user(credentials: UserLogin):
     """Iniciar sesión"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    password_hash = hash_password(credentials.password)
+    def find_user(conn):
+        return conn.execute(queries.USER_BY_EMAIL, (credentials.email,)).fetchone()
     
-    cursor.execute(
-        'SELECT id, username, email FROM users WHERE email = ? AND password_hash = ?',
-        (credentials.email, password_hash)
-    )
-    user = cursor.fetchone()
-    conn.close()
+    user = await db.read(find_user)
     
-    if not user:
+    try:
+        # Si el email no existe se verifica igual contra un hash ficticio,
+        # para que el tiempo de respuesta no revele qué emails están registrados
+        stored_hash = user['password_hash'] if user else DUMMY_HASH
+        valid, needs_rehash = await password_hasher.verify_async(credentials.password, stored_hash)
+        if user and valid and needs_rehash:
+            new_hash = await password_hasher.hash_async(credentials.password)
+        else:
+            new_hash = None
+    except HasherBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    if not user or not valid:
         raise HTTPException(status_code=401, detail="Usuario o contraseña incorrectos")
     
+    user_dict = {
+        "id": user['id'],
+        "username": user['username'],
+        "email": user['email']
+    }
+    
+    def open_session(conn):
+        if new_hash:
+            # Migrar hashes SHA-256 heredados (o con parámetros viejos) a scrypt
+            conn.execute(queries.REHASH_PASSWORD, (new_hash, user['id'], stored_hash))
+        return session_store.create(conn, user_dict)
+    
+    token, expires_at = await db.write(open_session)
+    
     return {
         "success": True,
         "message": f"¡Bienvenido, {user['username']}!",
-        "user": {
-            "id": user['id'],
-            "username": user['username'],
-            "email": user['email']
-        }
+        "user": user_dict,
+        "token": token,
+        "expires_at": expires_at
     }
 
+@app.post("/api/logout")
+async def logout_user(authorization: Optional[str] = Header(None), current_user: Optional[dict] = Depends(get_current_user)):
+    """Cerrar la sesión actual"""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="No hay una sesión iniciada")
+    await run_in_threadpool(session_store.revoke, authorization.partition(' ')[2])
+    return {"success": True, "message": "Sesión cerrada"}
+
 @app.post("/api/contact")
-def contact_form(message: ContactMessage):
+async def contact_form(message: ContactMessage):
     """Guardar mensaje de contacto"""
-    conn = get_db()
-    cursor = conn.cursor()
+    def insert_message(conn):
+        conn.execute(queries.INSERT_CONTACT_MESSAGE, (message.name, message.email, message.message))
     
-    cursor.execute(
-        'INSERT INTO contact_messages (name, email, message) VALUES (?, ?, ?)',
-        (message.name, message.email, message.message)
-    )
-    conn.commit()
-    conn.close()
+    await db.write(insert_message)
+    data_versions.bump('contact_messages')
     
     return {
         "success": True,
@@ -414,159 +326,275 @@ def contact_form(message: ContactMessage):
     }
 
 @app.post("/api/orders")
-def create_order(order: Order):
+async def create_order(order: Order, current_user: Optional[dict] = Depends(get_current_user)):
     """Crear un nuevo pedido"""
     if not order.items:
         raise HTTPException(status_code=400, detail="El carrito está vacío")
     
-    conn = get_db()
-    cursor = conn.cursor()
+    # Con sesión iniciada, el pedido es del usuario de la sesión
+    check_same_user(current_user, order.user_id)
+    user_id = current_user['id'] if current_user else order.user_id
+    
+    def insert_order(conn):
+        result = insert_orders(conn, [order.to_row(user_id)])[0]
+        if isinstance(result, OutOfStock):
+            raise result
+        return result
     
     try:
-        # Crear pedido
-        cursor.execute(
-            'INSERT INTO orders (user_id, total, status) VALUES (?, ?, ?)',
-            (order.user_id, order.total, 'completed')
-        )
-        order_id = cursor.lastrowid
-        
-        # Insertar items del pedido
-        for item in order.items:
-            cursor.execute(
-                'INSERT INTO order_items (order_id, product_name, product_price, quantity) VALUES (?, ?, ?, ?)',
-                (order_id, item.nombre, item.precio, 1)
-            )
-        
-        conn.commit()
-        conn.close()
-        
-        return {
-            "success": True,
-            "message": "Compra realizada con éxito. ¡Gracias!",
-            "order_id": order_id
-        }
+        # El hilo escritor confirma este pedido junto con otros concurrentes (group commit);
+        # la reserva de stock y la inserción son atómicas dentro de esa transacción
+        order_id = await db.write(insert_order)
+    except OutOfStock as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
-        conn.close()
         raise HTTPException(status_code=500, detail=f"Error al procesar el pedido: {str(e)}")
+    
+    # Los pedidos afectan el stock: el catálogo cacheado y los reportes dejan de ser válidos
+    data_versions.bump('orders', 'order_items', 'products')
+    
+    return {
+        "success": True,
+        "message": "Compra realizada con éxito. ¡Gracias!",
+        "order_id": order_id
+    }
+
+@app.post("/api/orders/bulk")
+async def create_orders_bulk(request: Request, current_user: Optional[dict] = Depends(get_current_user)):
+    """Crear muchos pedidos en una sola petición (arreglo JSON o NDJSON)"""
+    results = []
+    writes = []
+    
+    def reject(index, error):
+        results.append({"index": index, "success": False, "error": error})
+    
+    def validate(batch):
+        # Corre en el threadpool: interpretar y validar miles de pedidos en el event
+        # loop frenaría al resto de las peticiones del proceso
+        rows, errors = [], []
+        for index, data in batch:
+            if isinstance(data, bytes):
+                data = parse_ndjson_line(data)
+            if isinstance(data, ValueError):
+                errors.append((index, str(data)))
+                continue
+            if not isinstance(data, dict):
+                errors.append((index, f"pedido {index}: debe ser un objeto"))
+                continue
+            try:
+                order = Order.model_validate(data)
+            except ValidationError as e:
+                errors.append((index, "; ".join(
+                    ': '.join(filter(None, ('.'.join(str(p) for p in err['loc']), err['msg'])))
+                    for err in e.errors()
+                )))
+                continue
+            if not order.items:
+                errors.append((index, "El carrito está vacío"))
+            elif current_user and order.user_id is not None and order.user_id != current_user['id']:
+                errors.append((index, "No autorizado para este usuario"))
+            else:
+                user_id = current_user['id'] if current_user else order.user_id
+                rows.append((index, order.to_row(user_id)))
+        return rows, errors
+    
+    async def process(batch):
+        # Cada lote se inserta con executemany en una única escritura del hilo escritor;
+        # mientras tanto se sigue leyendo y validando el lote siguiente
+        rows, errors = await run_in_threadpool(validate, batch)
+        for index, error in errors:
+            reject(index, error)
+        if rows:
+            writes.append((rows, asyncio.wrap_future(writer.submit(insert_orders, [row for _, row in rows]))))
+    
+    truncated = False
+    if request.headers.get('content-type', '').split(';')[0].strip() == 'application/x-ndjson':
+        # Se valida e inserta a medida que llega el cuerpo, sin cargarlo entero en memoria
+        batch = []
+        index = 0
+        async for line in iter_ndjson_lines(request.stream()):
+            if index >= BULK_MAX_ORDERS:
+                # Lo ya insertado queda confirmado; el resto no se lee
+                truncated = True
+                break
+            batch.append((index, line))
+            index += 1
+            if len(batch) >= BULK_CHUNK_SIZE:
+                await process(batch)
+                batch = []
+        if batch:
+            await process(batch)
+    else:
+        # El arreglo se lee entero antes de interpretarlo: con un tope de bytes que corta
+        # con 413 apenas se supera, sin esperar (ni guardar) el resto del cuerpo
+        too_large = HTTPException(status_code=413, detail=f"Máximo {BULK_MAX_BYTES} bytes por petición")
+        declared = request.headers.get('content-length', '')
+        if declared.isdigit() and int(declared) > BULK_MAX_BYTES:
+            raise too_large
+        chunks = []
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > BULK_MAX_BYTES:
+                raise too_large
+            chunks.append(chunk)
+        body = b''.join(chunks)
+        del chunks
+        try:
+            payload = await run_in_threadpool(lambda: parse_json_array(body.decode('utf-8')))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="JSON inválido")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Se esperaba un arreglo de pedidos")
+        if len(payload) > BULK_MAX_ORDERS:
+            raise HTTPException(status_code=413, detail=f"Máximo {BULK_MAX_ORDERS} pedidos por petición")
+        for start in range(0, len(payload), BULK_CHUNK_SIZE):
+            await process(list(enumerate(payload[start:start + BULK_CHUNK_SIZE], start)))
+    
+    for chunk, task in writes:
+        try:
+            outcomes = await task
+        except Exception as e:
+            for index, _ in chunk:
+                reject(index, f"Error al procesar el pedido: {str(e)}")
+            continue
+        for (index, _), outcome in zip(chunk, outcomes):
+            if isinstance(outcome, OutOfStock):
+                reject(index, str(outcome))
+            else:
+                results.append({"index": index, "success": True, "order_id": outcome})
+    
+    if writes:
+        data_versions.bump('orders', 'order_items', 'products')
+    
+    results.sort(key=lambda r: r["index"])
+    accepted = sum(1 for r in results if r["success"])
+    return FastJSONResponse({
+        "success": accepted == len(results),
+        "accepted": accepted,
+        "rejected": len(results) - accepted,
+        "truncated": truncated,
+        "results": results
+    })
 
 @app.get("/api/orders/{user_id}")
-def get_user_orders(user_id: int):
-    """Obtener pedidos de un usuario con detalles"""
-    conn = get_db()
+def get_user_orders(
+    user_id: int,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, alias="cursor"),
+    conn: sqlite3.Connection = Depends(get_db),
+    current_user: Optional[dict] = Depends(get_current_user)
+):
+    """Obtener pedidos de un usuario con detalles (paginado por cursor)"""
+    check_same_user(current_user, user_id)
     cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC', (user_id,))
-    orders = []
-    
-    for order_row in cursor.fetchall():
-        order = dict(order_row)
-        # Obtener items del pedido
-        cursor.execute('SELECT * FROM order_items WHERE order_id = ?', (order['id'],))
-        order['items'] = [dict(item) for item in cursor.fetchall()]
-        orders.append(order)
-    
-    conn.close()
-    return {"orders": orders}
+
+    # Paginación por clave (created_at, id): el costo no depende de la página
+    if after:
+        created_at, order_id = decode_cursor(after, 2)
+        cursor.execute(queries.USER_ORDERS_AFTER, (user_id, created_at, order_id, limit + 1))
+    else:
+        cursor.execute(queries.USER_ORDERS, (user_id, limit + 1))
+    rows, next_cursor = split_page(cursor.fetchall(), limit, lambda row: (row['created_at'], row['id']))
+    orders = [dict(row) for row in rows]
+
+    # Items de todos los pedidos de la página en una sola consulta
+    items_by_order = {order['id']: [] for order in orders}
+    if items_by_order:
+        placeholders = ','.join('?' * len(items_by_order))
+        cursor.execute(queries.ORDER_ITEMS_FOR_ORDERS.format(placeholders=placeholders), tuple(items_by_order))
+        for item in cursor.fetchall():
+            items_by_order[item['order_id']].append(dict(item))
+    for order in orders:
+        order['items'] = items_by_order[order['id']]
+
+    return FastJSONResponse({"orders": orders, "next_cursor": next_cursor})
 
 @app.get("/api/users")
-def get_users():
+def get_users(
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, alias="cursor")
+):
     """Obtener todos los usuarios (sin contraseñas)"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, username, email, phone, created_at FROM users')
-    users = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return {"users": users}
+    # Paginación por clave (id)
+    sql = queries.USERS
+    params = []
+    if after:
+        sql = queries.USERS_AFTER
+        params += decode_cursor(after, 1)
+
+    if format == "ndjson":
+        # En bloques paginados por clave, cada uno con su conexión
+        return ndjson_response(queries.USERS, queries.USERS_AFTER, lambda row: (row['id'],), params, limit)
+
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(limit + 1)
+    with pool.connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    if not limit:
+        return FastJSONResponse({"users": [dict(row) for row in rows]})
+    rows, next_cursor = split_page(rows, limit, lambda row: (row['id'],))
+    return FastJSONResponse({"users": [dict(row) for row in rows], "next_cursor": next_cursor})
 
 @app.get("/api/users/{user_id}/orders")
-def get_user_orders_stats(user_id: int):
+def get_user_orders_stats(
+    user_id: int,
+    conn: sqlite3.Connection = Depends(get_db),
+    current_user: Optional[dict] = Depends(get_current_user)
+):
     """Obtener estadísticas de pedidos de un usuario"""
-    conn = get_db()
+    check_same_user(current_user, user_id)
     cursor = conn.cursor()
     
-    # Información del usuario
-    cursor.execute('SELECT id, username, email FROM users WHERE id = ?', (user_id,))
-    user = cursor.fetchone()
-    if not user:
+    # Información del usuario y sus contadores (mantenidos por triggers): búsqueda por PK
+    cursor.execute(queries.USER_ORDER_STATS, (user_id,))
+    row = cursor.fetchone()
+    if not row:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    user_dict = dict(user)
+    user_dict = {"id": row['id'], "username": row['username'], "email": row['email']}
     
     # Estadísticas de pedidos
-    cursor.execute('''
-        SELECT 
-            COUNT(*) as total_orders,
-            SUM(total) as total_spent,
-            AVG(total) as avg_order_value,
-            MAX(total) as max_order
-        FROM orders 
-        WHERE user_id = ?
-    ''', (user_id,))
-    stats = dict(cursor.fetchone())
+    total_orders = row['total_orders'] or 0
+    stats = {
+        "total_orders": total_orders,
+        "total_spent": row['total_spent'] if total_orders else None,
+        "avg_order_value": row['total_spent'] / total_orders if total_orders else None,
+        "max_order": row['max_order'] if total_orders else None
+    }
     
     # Pedidos recientes
-    cursor.execute('SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC LIMIT 5', (user_id,))
+    cursor.execute(queries.USER_RECENT_ORDERS, (user_id,))
     recent_orders = [dict(row) for row in cursor.fetchall()]
     
-    conn.close()
-    return {
+    return FastJSONResponse({
         "user": user_dict,
         "statistics": stats,
         "recent_orders": recent_orders
-    }
+    })
 
-@app.get("/api/statistics/sales")
-def get_sales_statistics():
-    """Obtener estadísticas generales de ventas"""
-    conn = get_db()
+def compute_sales_statistics(conn):
+    """Calcular estadísticas generales de ventas"""
     cursor = conn.cursor()
     
     # Ventas totales
-    cursor.execute('''
-        SELECT 
-            COUNT(*) as total_orders,
-            SUM(total) as total_revenue,
-            AVG(total) as avg_order_value
-        FROM orders
-    ''')
+    cursor.execute(queries.SALES_OVERVIEW)
     sales_stats = dict(cursor.fetchone())
     
     # Top 5 usuarios por compras
-    cursor.execute('''
-        SELECT 
-            u.id, u.username, u.email,
-            COUNT(o.id) as order_count,
-            SUM(o.total) as total_spent
-        FROM users u
-        JOIN orders o ON u.id = o.user_id
-        GROUP BY u.id
-        ORDER BY total_spent DESC
-        LIMIT 5
-    ''')
+    cursor.execute(queries.SALES_TOP_CUSTOMERS)
     top_customers = [dict(row) for row in cursor.fetchall()]
     
     # Productos más vendidos
-    cursor.execute('''
-        SELECT 
-            product_name,
-            COUNT(*) as times_sold,
-            SUM(product_price * quantity) as revenue
-        FROM order_items
-        GROUP BY product_name
-        ORDER BY times_sold DESC
-        LIMIT 10
-    ''')
+    cursor.execute(queries.SALES_TOP_PRODUCTS)
     top_products = [dict(row) for row in cursor.fetchall()]
     
     # Pedidos por estado
-    cursor.execute('''
-        SELECT status, COUNT(*) as count
-        FROM orders
-        GROUP BY status
-    ''')
+    cursor.execute(queries.SALES_BY_STATUS)
     orders_by_status = [dict(row) for row in cursor.fetchall()]
     
-    conn.close()
     return {
         "sales_overview": sales_stats,
         "top_customers": top_customers,
@@ -574,49 +602,288 @@ def get_sales_statistics():
         "orders_by_status": orders_by_status
     }
 
-@app.get("/api/statistics/products")
-def get_product_statistics():
-    """Obtener estadísticas de productos y categorías"""
-    conn = get_db()
+def compute_product_statistics(conn):
+    """Calcular estadísticas de productos y categorías"""
     cursor = conn.cursor()
     
     # Total de productos por categoría
-    cursor.execute('''
-        SELECT 
-            c.id, c.name, c.description,
-            COUNT(pc.product_id) as product_count
-        FROM categories c
-        LEFT JOIN product_categories pc ON c.id = pc.category_id
-        GROUP BY c.id
-        ORDER BY product_count DESC
-    ''')
+    cursor.execute(queries.PRODUCTS_PER_CATEGORY)
     categories_stats = [dict(row) for row in cursor.fetchall()]
     
     # Stock total
-    cursor.execute('SELECT SUM(stock) as total_stock, COUNT(*) as total_products FROM products')
+    cursor.execute(queries.STOCK_TOTALS)
     stock_info = dict(cursor.fetchone())
     
     # Productos con bajo stock
-    cursor.execute('SELECT * FROM products WHERE stock < 10 ORDER BY stock ASC')
+    cursor.execute(queries.LOW_STOCK_PRODUCTS)
     low_stock = [dict(row) for row in cursor.fetchall()]
     
-    conn.close()
     return {
         "categories": categories_stats,
         "stock_info": stock_info,
         "low_stock_products": low_stock
     }
 
+# Instantáneas de los reportes, refrescadas en segundo plano
+sales_snapshot = StatsSnapshot('sales', compute_sales_statistics, ('orders', 'order_items', 'users'))
+products_snapshot = StatsSnapshot('products', compute_product_statistics, ('products', 'categories', 'product_categories'))
+stats_refresher = SnapshotRefresher([sales_snapshot, products_snapshot])
+
+def snapshot_response(request, snapshot, fresh):
+    """Respuesta de una instantánea con ETag por versión y fecha de cálculo, y su antigüedad en Age"""
+    data, meta, tag = snapshot.get(fresh)
+    etag = make_etag(snapshot.name, tag)
+    return conditional_response(
+        request, etag, lambda: {**data, "snapshot": meta},
+        cache_control=PRIVATE_CACHE_CONTROL, headers={"Age": str(int(snapshot.age()))}
+    )
+
+@app.get("/api/statistics/sales")
+def get_sales_statistics(request: Request, fresh: bool = False):
+    """Obtener estadísticas generales de ventas (?fresh=1 fuerza el recálculo)"""
+    return snapshot_response(request, sales_snapshot, fresh)
+
+@app.get("/api/statistics/products")
+def get_product_statistics(request: Request, fresh: bool = False):
+    """Obtener estadísticas de productos y categorías (?fresh=1 fuerza el recálculo)"""
+    return snapshot_response(request, products_snapshot, fresh)
+
 @app.get("/api/contact-messages")
-def get_contact_messages():
+def get_contact_messages(
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = Query(None, alias="cursor")
+):
     """Obtener todos los mensajes de contacto"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM contact_messages ORDER BY created_at DESC')
-    messages = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return {"messages": messages}
+    # Paginación por clave (created_at, id), del más reciente al más antiguo
+    sql = queries.CONTACT_MESSAGES
+    params = []
+    if after:
+        sql = queries.CONTACT_MESSAGES_AFTER
+        params += decode_cursor(after, 2)
+
+    if format == "ndjson":
+        return ndjson_response(
+            queries.CONTACT_MESSAGES, queries.CONTACT_MESSAGES_AFTER,
+            lambda row: (row['created_at'], row['id']), params, limit
+        )
+
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(limit + 1)
+    with pool.connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    if not limit:
+        return FastJSONResponse({"messages": [dict(row) for row in rows]})
+    rows, next_cursor = split_page(rows, limit, lambda row: (row['created_at'], row['id']))
+    return FastJSONResponse({"messages": [dict(row) for row in rows], "next_cursor": next_cursor})
+
+@app.get("/api/db/stats")
+def get_db_stats():
+    """Estadísticas del pool de conexiones, del escritor y de las cachés.
+
+    Con varios workers son las del proceso que atiende la petición (worker).
+    """
+    return {
+        "worker": os.getpid(),
+        "pool": pool.stats(),
+        "writer": writer.stats(),
+        "sessions": session_store.stats(),
+        "payloads": payload_cache.stats(),
+        "thumbnails": thumbnail_cache.stats(),
+        "slow_queries": slow_query_log.stats(),
+        "versions": data_versions.stats()
+    }
+
+# Métricas de Prometheus: además de las de metrics.py, el estado de los hilos y
+# colas se lee en el momento de cada consulta
+
+def threadpool_stats():
+    # Hilos de anyio que usan las rutas síncronas (solo se puede leer desde el event loop)
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return limiter.borrowed_tokens, limiter.total_tokens, limiter.statistics().tasks_waiting
+
+metrics_registry.gauge(
+    'cuerar_threadpool_threads', 'Hilos del threadpool de las rutas síncronas',
+    lambda: [(('busy',), threadpool_stats()[0]), (('total',), threadpool_stats()[1])], ('state',))
+metrics_registry.gauge(
+    'cuerar_threadpool_queue_depth', 'Rutas síncronas esperando un hilo libre', lambda: threadpool_stats()[2])
+metrics_registry.gauge(
+    'cuerar_db_pool_connections', 'Conexiones del pool de SQLite',
+    lambda: [((state,), pool.stats()[state]) for state in ('in_use', 'idle')], ('state',))
+metrics_registry.gauge(
+    'cuerar_db_pool_waits_total', 'Veces que se esperó una conexión libre del pool',
+    lambda: pool.stats()['waits'], kind='counter')
+metrics_registry.gauge(
+    'cuerar_db_writer_queue_depth', 'Escrituras esperando al hilo escritor', lambda: writer.stats()['queued'])
+metrics_registry.gauge(
+    'cuerar_db_reader_queue_depth', 'Lecturas async esperando un hilo lector', lambda: db.stats()['queued'])
+
+@app.get("/metrics")
+async def get_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Métricas desactivadas (CUERAR_METRICS=0)")
+    return Response(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+# Administración: importación y exportación del catálogo
+
+def check_catalog_table(table):
+    if table not in CATALOG_IO_TABLES:
+        raise HTTPException(status_code=404, detail=f"Tabla desconocida; opciones: {', '.join(CATALOG_IO_TABLES)}")
+
+@app.post("/api/admin/catalog/{table}/import", dependencies=[Depends(require_admin)])
+async def import_catalog(
+    table: str,
+    request: Request,
+    format: Optional[str] = Query(None, pattern=f"^({'|'.join(FORMATS)})$")
+):
+    """Importar products, categories o product_categories desde CSV o NDJSON (upsert por id)"""
+    check_catalog_table(table)
+    fmt = format or guess_format(content_type=request.headers.get('content-type'))
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Indicar ?format=csv|ndjson o un Content-Type text/csv o application/x-ndjson")
+    
+    # El cuerpo se guarda a medida que llega (en disco si es grande), sin tenerlo entero en memoria
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > IMPORT_MAX_BYTES:
+            spool.close()
+            raise HTTPException(status_code=413, detail=f"Máximo {IMPORT_MAX_BYTES} bytes por importación")
+        spool.write(chunk)
+    spool.seek(0)
+    
+    def write(rows):
+        # Cada bloque es una escritura del hilo escritor (una transacción con executemany)
+        return writer.submit(write_chunk, table, rows).result()
+    
+    def run():
+        with io.TextIOWrapper(spool, encoding='utf-8-sig', newline='') as lines:
+            return import_records(lines, table, fmt, write)
+    
+    result = await run_in_threadpool(run)
+    if result['written']:
+        data_versions.bump(*CATALOG_TABLES)
+    return FastJSONResponse({"success": result['rejected'] == 0, **result})
+
+@app.get("/api/admin/catalog/{table}/export", dependencies=[Depends(require_admin)])
+def export_catalog(table: str, format: str = Query("csv", pattern=f"^({'|'.join(FORMATS)})$")):
+    """Exportar una tabla del catálogo en CSV o NDJSON, en streaming"""
+    check_catalog_table(table)
+    
+    def chunks():
+        # El generador usa su propia conexión: vive lo que dure la respuesta
+        with pool.connection() as conn:
+            yield from iter_export(conn, table, format)
+    
+    return StreamingResponse(chunks(), media_type=MEDIA_TYPES[format], headers={
+        "Content-Disposition": f'attachment; filename="{table}.{format}"'
+    })
+
+@app.get("/api/admin/slow-queries", dependencies=[Depends(require_admin)])
+def get_slow_queries(limit: int = Query(20, ge=1, le=500)):
+    """Sentencias que superaron CUERAR_SLOW_QUERY_MS, ordenadas por tiempo total"""
+    return {**slow_query_log.stats(include_path=True), "queries": slow_query_log.top(limit)}
+
+@app.get("/api/admin/profiles", dependencies=[Depends(require_admin)])
+def get_profiles():
+    """Últimos perfiles de peticiones, del más reciente al más antiguo"""
+    return {"profiles": profile_store.list()}
+
+@app.get("/api/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def get_profile(profile_id: str, format: str = Query("text", pattern=f"^({'|'.join(PROFILE_FORMATS)})$")):
+    """Descargar un perfil: tabla de texto, binario de pstats o pilas colapsadas (flamegraph)"""
+    profile = profile_store.get(profile_id)
+    stats = profile.stats() if profile else None
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    if format == "pstats":
+        return Response(export_pstats(stats), media_type="application/octet-stream", headers={
+            "Content-Disposition": f'attachment; filename="profile-{profile_id}.pstats"'
+        })
+    body = export_collapsed(stats) if format == "collapsed" else export_text(stats)
+    return Response(body, media_type="text/plain")
+
+# Frontend: archivos estáticos con hash en la URL y páginas HTML
+
+@app.get("/assets/thumbs/{width}/{name:path}")
+def get_thumbnail(width: int, name: str):
+    """Miniatura WebP de una imagen del catálogo (se genera la primera vez)"""
+    if width not in THUMBNAIL_WIDTHS or Image is None:
+        raise HTTPException(status_code=404, detail="Miniatura no encontrada")
+    source = asset_manifest.resolve_thumbnail(name)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Miniatura no encontrada")
+    path = thumbnail_cache.get(source, name[:-len('.webp')], width)
+    return FileResponse(path, media_type="image/webp", headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL})
+
+@app.get("/assets/{path:path}")
+def get_asset(path: str, request: Request):
+    """Archivo estático con el hash del contenido en el nombre: se cachea para siempre"""
+    resolved = asset_manifest.resolve(path)
+    if resolved is None:
+        # Hash viejo o archivo inexistente
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    file_path, _ = resolved
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if not path.endswith(COMPRESSIBLE_EXTENSIONS):
+        # Imágenes: tal cual (ya están comprimidas)
+        return FileResponse(file_path, headers=headers)
+    # css y js: comprimidos una sola vez por hash (las hojas de estilo, con las URL
+    # de las imágenes ya reescritas)
+    body, encoding = asset_manifest.encoded(path, choose_encoding(request.headers.get('accept-encoding')))
+    headers["Vary"] = "Accept-Encoding"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, media_type=mimetypes.guess_type(file_path)[0], headers=headers)
+
+@app.get("/site", include_in_schema=False)
+def get_site_root():
+    return RedirectResponse("/site/")
+
+@app.get("/site/{path:path}")
+def get_site_page(path: str, request: Request):
+    """Páginas del sitio con las referencias a css/, java/ e img/ cambiadas por URL con hash"""
+    file_path = resolve_page(path)
+    if file_path is None:
+        raise HTTPException(status_code=404, detail="Página no encontrada")
+    headers = {"Cache-Control": REVALIDATE_CACHE_CONTROL}
+    if not file_path.endswith('.html'):
+        return FileResponse(file_path, headers=headers)
+    with open(file_path, encoding='utf-8') as f:
+        body = asset_manifest.rewrite_html(f.read()).encode()
+    # El HTML se revalida siempre (es el que apunta a las URL con hash vigentes)
+    etag = make_etag(hashlib.blake2b(body, digest_size=8).hexdigest())
+    if not_modified(request, etag):
+        return Response(status_code=304, headers={"ETag": etag, **headers})
+    return Response(body, media_type="text/html; charset=utf-8", headers={"ETag": etag, **headers})
+
+# Con todas las rutas definidas: envolver sus funciones para el perfilado
+instrument_routes(app)
+
+# Workers de uvicorn al correr python main.py (se puede cambiar con --workers)
+WORKERS = int(os.environ.get('CUERAR_WORKERS', '1'))
 
 if __name__ == "__main__":
+    import argparse
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    parser = argparse.ArgumentParser(description="Servidor de la API de Cuerar")
+    parser.add_argument('--host', default="0.0.0.0")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="Procesos de uvicorn (por defecto CUERAR_WORKERS o 1)")
+    args = parser.parse_args()
+    if args.workers > 1:
+        # Cada worker vuelve a importar main.py: la clave de las sesiones tiene que
+        # ser la misma en todos o un token solo valdría en el worker que lo emitió
+        if not os.environ.get('CUERAR_SESSION_SECRET'):
+            os.environ['CUERAR_SESSION_SECRET'] = secrets.token_urlsafe(32)
+            print("⚠️  CUERAR_SESSION_SECRET no está definida: se generó una para este arranque "
+                  "(las sesiones no sobreviven a un reinicio)")
+        # Migrar una sola vez antes de lanzar los workers (no compiten por el lock)
+        ensure_schema()
+        uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,397 @@
+import bisect
+import contextvars
+import functools
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from slow_queries import slow_query_log
+
+# Métricas en formato de texto de Prometheus (/metrics).
+#
+# Los contadores e histogramas se guardan por hilo: cada hilo escribe solo en sus
+# propios valores, sin locks, y al leer /metrics se suman los de todos los hilos.
+# Se desactivan con CUERAR_METRICS=0.
+
+METRICS_ENABLED = os.environ.get('CUERAR_METRICS', '1') != '0'
+
+# Límites del histograma de duración de las peticiones (segundos)
+HTTP_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Largo máximo del SQL usado como etiqueta
+SQL_LABEL_LENGTH = 200
+
+
+class _ThreadShards:
+    """Valores por hilo: cada hilo escribe en su diccionario y la lectura los suma"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+
+    def mine(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            # El lock solo se toma la primera vez que escribe cada hilo
+            with self._lock:
+                self._shards.append(values)
+            return values
+
+    def shards(self):
+        with self._lock:
+            shards = list(self._shards)
+        # dict.copy() es atómico: no importa que el hilo dueño siga escribiendo
+        return [shard.copy() for shard in shards]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador por combinación de etiquetas"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = _ThreadShards()
+
+    def inc(self, labels=(), amount=1):
+        values = self._values.mine()
+        values[labels] = values.get(labels, 0) + amount
+
+    def collect(self):
+        totals = {}
+        for shard in self._values.shards():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        for labels, value in sorted(totals.items()):
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+
+
+class Histogram:
+    """Histograma por combinación de etiquetas (buckets acumulados al exponer)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=HTTP_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = _ThreadShards()
+
+    def observe(self, labels, value):
+        values = self._values.mine()
+        entry = values.get(labels)
+        if entry is None:
+            # Un contador por bucket (más +Inf), la suma y la cantidad
+            entry = values[labels] = [0] * (len(self.buckets) + 3)
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    def collect(self):
+        totals = {}
+        for shard in self._values.shards():
+            for labels, entry in shard.items():
+                entry = list(entry)
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = entry
+                else:
+                    totals[labels] = [a + b for a, b in zip(total, entry)]
+        for labels, entry in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(entry[-2])}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {entry[-1]}'
+
+
+class Gauge:
+    """Valor calculado al leer las métricas: read() devuelve un número o [(etiquetas, valor)].
+
+    Con kind='counter' sirve para exponer contadores que ya lleva otro objeto.
+    """
+
+    def __init__(self, name, help, read, labelnames=(), kind='gauge'):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.labelnames = labelnames
+        self.kind = kind
+
+    def collect(self):
+        value = self.read()
+        samples = value if isinstance(value, list) else [((), value)]
+        for labels, sample in samples:
+            yield f'{self.name}{_labels(self.labelnames, labels)} {_number(sample)}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=HTTP_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name, help, read, labelnames=(), kind='gauge'):
+        return self.register(Gauge(name, help, read, labelnames, kind))
+
+    def render(self):
+        """Todas las métricas en formato de texto de Prometheus (versión 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'cuerar_http_requests_total', 'Peticiones HTTP atendidas', ('method', 'route', 'status'))
+http_duration = registry.histogram(
+    'cuerar_http_request_duration_seconds', 'Duración de las peticiones HTTP', ('method', 'route'))
+http_errors = registry.counter(
+    'cuerar_http_errors_total', 'Respuestas con error (4xx y 5xx) por ruta', ('method', 'route', 'class'))
+sql_calls = registry.counter(
+    'cuerar_sql_statement_calls_total', 'Ejecuciones de cada sentencia SQL', ('statement',))
+sql_seconds = registry.counter(
+    'cuerar_sql_statement_seconds_total', 'Tiempo en SQLite por sentencia (ejecución y lectura de filas)',
+    ('statement',))
+sql_rows = registry.counter(
+    'cuerar_sql_statement_rows_total', 'Filas leídas por sentencia', ('statement',))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+
+# Scope ASGI de la petición en curso: permite atribuir cada sentencia SQL a su
+# ruta (los hilos del threadpool, los lectores y el escritor heredan el contexto)
+request_scope = contextvars.ContextVar('request_scope', default=None)
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: cantidad, duración y errores por ruta, y peticiones en curso.
+
+    La ruta es la plantilla (/api/orders/{user_id}), no la URL, para no crear una
+    serie por cada id. Las URL que no coinciden con ninguna ruta van a "unmatched".
+    """
+
+    # Peticiones en curso (solo se modifica desde el event loop)
+    in_flight = 0
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        status = 500
+        start = time.perf_counter()
+        MetricsMiddleware.in_flight += 1
+        token = request_scope.set(scope)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException:
+            status = 500
+            raise
+        finally:
+            request_scope.reset(token)
+            MetricsMiddleware.in_flight -= 1
+            route = scope.get('route')
+            labels = (scope['method'], route.path if route is not None else 'unmatched')
+            http_duration.observe(labels, time.perf_counter() - start)
+            http_requests.inc(labels + (str(status),))
+            if status >= 400:
+                http_errors.inc(labels + (f'{status // 100}xx',))
+
+
+registry.gauge(
+    'cuerar_http_requests_in_flight', 'Peticiones HTTP en curso', lambda: MetricsMiddleware.in_flight)
+
+
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(sql):
+    """SQL en una línea, con las listas IN (?, ?, ...) colapsadas: una etiqueta por sentencia"""
+    text = _IN_LIST.sub('(?, ...)', _SPACES.sub(' ', sql).strip())
+    return text if len(text) <= SQL_LABEL_LENGTH else text[:SQL_LABEL_LENGTH - 3] + '...'
+
+
+def current_route():
+    """Plantilla de la ruta de la petición en curso ('background' fuera de una petición)"""
+    scope = request_scope.get()
+    if scope is None:
+        return 'background'
+    route = scope.get('route')
+    return route.path if route is not None else 'unmatched'
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que mide el tiempo en SQLite y las filas leídas de cada sentencia.
+
+    SQLite calcula las filas a medida que se leen: el tiempo de una sentencia es el
+    de execute() más el de fetchone/fetchmany/fetchall, y se registra cuando
+    termina (se leyeron todas las filas, o el cursor se reutiliza, cierra o
+    descarta). Al iterar el cursor (for row in cursor) las filas se cuentan pero su
+    tiempo no se mide, para no pagar dos relojes por fila.
+    """
+
+    _statement = None
+    _sql = None
+    _parameters = None
+    _elapsed = 0.0
+    _rows = 0
+
+    def _begin(self, sql, parameters):
+        if self._statement is not None:
+            self._finish()
+        self._statement = (normalize_sql(sql),)
+        self._sql = sql
+        self._parameters = parameters
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def _finish(self):
+        labels = self._statement
+        self._statement = None
+        sql_calls.inc(labels)
+        sql_seconds.inc(labels, self._elapsed)
+        if self._rows:
+            sql_rows.inc(labels, self._rows)
+        if self._elapsed >= slow_query_log.threshold:
+            slow_query_log.record(self.connection, labels[0], self._sql, self._parameters,
+                                  self._elapsed, self._rows, current_route())
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        finally:
+            self._elapsed += time.perf_counter() - start
+            # Sin filas para leer (o con error) la sentencia ya terminó
+            if self.description is None:
+                self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._elapsed += time.perf_counter() - start
+            self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        if self._statement is not None:
+            self._elapsed += time.perf_counter() - start
+            if row is None:
+                self._finish()
+            else:
+                self._rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        if self._statement is not None:
+            self._elapsed += time.perf_counter() - start
+            self._rows += len(rows)
+            if len(rows) < size:
+                self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        if self._statement is not None:
+            self._elapsed += time.perf_counter() - start
+            self._rows += len(rows)
+            self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = super().__next__()
+        except StopIteration:
+            if self._statement is not None:
+                self._finish()
+            raise
+        self._rows += 1
+        return row
+
+    def close(self):
+        if self._statement is not None:
+            self._finish()
+        super().close()
+
+    def __del__(self):
+        if self._statement is not None:
+            try:
+                self._finish()
+            except sqlite3.Error:
+                pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexión cuyos cursores (también los de conn.execute) registran métricas"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# Fábrica de conexiones para database.connect()
+connection_factory = InstrumentedConnection if METRICS_ENABLED else sqlite3.Connection
@@ -0,0 +1,360 @@
+import sqlite3
+
+from database import DB_PATH, connect
+
+
+def _version_triggers(tables, events):
+    """Triggers que cuentan en table_versions cada fila afectada por events"""
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+        AFTER {event} ON {table}
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+        END
+        '''
+        for table in tables
+        for event in events
+    ]
+
+
+# Cada migración es (versión, descripción, sentencias). Se aplican en orden y
+# una sola vez: la versión aplicada queda guardada en PRAGMA user_version.
+# database_schema.sql debe reflejar el resultado de aplicarlas todas
+# (test_query_plans.py lo comprueba).
+MIGRATIONS = [
+    (1, 'Esquema inicial', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            phone TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            price REAL NOT NULL,
+            image_url TEXT,
+            stock INTEGER DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            total REAL NOT NULL,
+            status TEXT DEFAULT 'pending',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            product_name TEXT NOT NULL,
+            product_price REAL NOT NULL,
+            quantity INTEGER DEFAULT 1,
+            FOREIGN KEY (order_id) REFERENCES orders (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS contact_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            message TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS product_categories (
+            product_id INTEGER,
+            category_id INTEGER,
+            PRIMARY KEY (product_id, category_id),
+            FOREIGN KEY (product_id) REFERENCES products (id),
+            FOREIGN KEY (category_id) REFERENCES categories (id)
+        )
+        ''',
+    ]),
+    (2, 'Índices de producción', [
+        # Historial y estadísticas por usuario (WHERE user_id ORDER BY created_at, id)
+        'CREATE INDEX IF NOT EXISTS idx_orders_user_created ON orders(user_id, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_created_at ON orders(created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status)',
+        # Carga de items por pedido
+        'CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id)',
+        # Índice cubriente para el ranking de productos más vendidos
+        'CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items(product_name, product_price, quantity)',
+        # Productos por categoría (la PK ya cubre la búsqueda por product_id)
+        'CREATE INDEX IF NOT EXISTS idx_product_categories_category ON product_categories(category_id, product_id)',
+        # Filtros por stock del catálogo y del reporte de bajo stock
+        'CREATE INDEX IF NOT EXISTS idx_products_stock ON products(stock)',
+        # Listado de mensajes del más reciente al más antiguo
+        'CREATE INDEX IF NOT EXISTS idx_contact_messages_created ON contact_messages(created_at, id)',
+    ]),
+    (3, 'Contadores de pedidos por usuario', [
+        # Resumen exacto por usuario, mantenido por triggers sobre orders
+        '''
+        CREATE TABLE IF NOT EXISTS user_order_stats (
+            user_id INTEGER PRIMARY KEY,
+            total_orders INTEGER NOT NULL DEFAULT 0,
+            total_spent REAL NOT NULL DEFAULT 0,
+            max_order REAL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        # Permite recalcular MAX(total) de un usuario sin recorrer sus pedidos
+        'CREATE INDEX IF NOT EXISTS idx_orders_user_total ON orders(user_id, total)',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_stats_insert
+        AFTER INSERT ON orders
+        WHEN NEW.user_id IS NOT NULL
+        BEGIN
+            INSERT INTO user_order_stats (user_id, total_orders, total_spent, max_order)
+            VALUES (NEW.user_id, 1, NEW.total, NEW.total)
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_orders = total_orders + 1,
+                total_spent = total_spent + excluded.total_spent,
+                max_order = MAX(COALESCE(max_order, excluded.max_order), excluded.max_order);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_stats_delete
+        AFTER DELETE ON orders
+        WHEN OLD.user_id IS NOT NULL
+        BEGIN
+            UPDATE user_order_stats SET
+                total_orders = total_orders - 1,
+                total_spent = total_spent - OLD.total,
+                max_order = (SELECT MAX(total) FROM orders WHERE user_id = OLD.user_id)
+            WHERE user_id = OLD.user_id;
+        END
+        ''',
+        # Un cambio de usuario o de total equivale a quitar el pedido viejo y sumar el nuevo
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_orders_stats_update
+        AFTER UPDATE OF user_id, total ON orders
+        BEGIN
+            UPDATE user_order_stats SET
+                total_orders = total_orders - 1,
+                total_spent = total_spent - OLD.total,
+                max_order = (SELECT MAX(total) FROM orders WHERE user_id = OLD.user_id)
+            WHERE user_id = OLD.user_id;
+            INSERT INTO user_order_stats (user_id, total_orders, total_spent, max_order)
+            SELECT NEW.user_id, 1, NEW.total, NEW.total
+            WHERE NEW.user_id IS NOT NULL
+            ON CONFLICT (user_id) DO UPDATE SET
+                total_orders = total_orders + 1,
+                total_spent = total_spent + excluded.total_spent,
+                max_order = (SELECT MAX(total) FROM orders WHERE user_id = NEW.user_id);
+        END
+        ''',
+        # Carga inicial a partir de los pedidos existentes
+        '''
+        INSERT OR REPLACE INTO user_order_stats (user_id, total_orders, total_spent, max_order)
+        SELECT user_id, COUNT(*), SUM(total), MAX(total)
+        FROM orders
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+        ''',
+    ]),
+    (4, 'Sesiones', [
+        # Tiempos en segundos desde epoch para compararlos sin conversiones
+        '''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            expires_at INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_user_id ON sessions(user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions(expires_at)',
+    ]),
+    (5, 'Búsqueda de productos (FTS5)', [
+        # Índice de texto sobre products (sin copiar el contenido). remove_diacritics
+        # hace que "cinturon" encuentre "cinturón"; prefix acelera las búsquedas
+        # por prefijo de 2 y 3 letras mientras se escribe.
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            name, description,
+            content='products', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_products_fts_insert
+        AFTER INSERT ON products
+        BEGIN
+            INSERT INTO products_fts (rowid, name, description)
+            VALUES (NEW.id, NEW.name, NEW.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_products_fts_delete
+        AFTER DELETE ON products
+        BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, description)
+            VALUES ('delete', OLD.id, OLD.name, OLD.description);
+        END
+        ''',
+        # Solo cambios de texto: las reservas de stock no tocan el índice
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_products_fts_update
+        AFTER UPDATE OF name, description ON products
+        BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, description)
+            VALUES ('delete', OLD.id, OLD.name, OLD.description);
+            INSERT INTO products_fts (rowid, name, description)
+            VALUES (NEW.id, NEW.name, NEW.description);
+        END
+        ''',
+        # Indexar los productos existentes
+        "INSERT INTO products_fts (products_fts) VALUES ('rebuild')",
+    ]),
+    (6, 'Versiones de tablas compartidas entre procesos', [
+        # Contador de cambios por tabla (versions.py): lo leen todos los workers para
+        # saber si sus cachés siguen al día. La fila 'epoch' es un número al azar fijo
+        # desde que se creó la tabla: distingue los contadores de otra base (por
+        # ejemplo, una regenerada desde cero) aunque coincidan los números.
+        # La versión de una tabla es su contador más su secuencia de AUTOINCREMENT en
+        # sqlite_sequence, que ya cambia con cada INSERT: en las tablas a las que la
+        # API solo agrega filas (pedidos, items, usuarios, mensajes) no hace falta un
+        # trigger por fila insertada, que encarecía un 40 % la carga de pedidos.
+        '''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR IGNORE INTO table_versions (name, version) VALUES
+            ('epoch', abs(random() % 4294967296)),
+            ('users', 0), ('products', 0), ('categories', 0), ('product_categories', 0),
+            ('orders', 0), ('order_items', 0), ('contact_messages', 0)
+        ''',
+        # El catálogo también cuenta sus INSERT: una importación puede traer ids
+        # menores que la secuencia, y product_categories no tiene AUTOINCREMENT
+        *_version_triggers(('products', 'categories', 'product_categories'), ('INSERT', 'UPDATE', 'DELETE')),
+        *_version_triggers(('users', 'orders', 'order_items', 'contact_messages'), ('UPDATE', 'DELETE')),
+        # Sesiones cerradas antes de vencer, para que los demás workers las quiten de
+        # su caché (sessions.py). Su versión es la secuencia de seq. Las filas se
+        # borran pasado SESSION_CACHE_TTL.
+        '''
+        CREATE TABLE IF NOT EXISTS session_revocations (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            revoked_at INTEGER NOT NULL
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_sessions_revoked
+        AFTER DELETE ON sessions
+        WHEN OLD.expires_at > CAST(strftime('%s', 'now') AS INTEGER)
+        BEGIN
+            INSERT INTO session_revocations (session_id, revoked_at)
+            VALUES (OLD.id, CAST(strftime('%s', 'now') AS INTEGER));
+        END
+        ''',
+    ]),
+    (7, 'Productos de la tienda que faltaban en los datos de ejemplo', [
+        # pages/tienda.html vende los productos 16 a 20 (data-product-id), que seed.py
+        # agrega en las bases nuevas. Las bases ya cargadas con los 15 productos de
+        # ejemplo originales (como la cuerar.db del repositorio) los reciben acá con
+        # los mismos ids. Una base sin esos datos (vacía o generada con otros
+        # productos) no se toca: en una vacía los carga seed.py.
+        '''
+        INSERT OR IGNORE INTO products (id, name, description, price, image_url, stock)
+        SELECT column1, column2, column3, column4, column5, column6 FROM (VALUES
+            (16, 'Cuero de cabra natural', 'Cuero de cabra en su color natural', 80000.00, '../img/cuero-de-cabra-3.jpg', 10),
+            (17, 'Cuero de cabra artesanal', 'Cuero de cabra curtido artesanalmente', 80000.00, '../img/cuero-de-cabra-4.jpg', 10),
+            (18, 'Cuero de oveja suave', 'Cuero de oveja de pelo largo y suave', 80000.00, '../img/cuero-de-obeja.jpg', 10),
+            (19, 'Respaldo de madera y cuero', 'Respaldo de cama de madera tapizado en cuero', 270000.00, '../img/respaldo-de-madera-y-cuero.jpg', 4),
+            (20, 'Cartera de cabra elegante', 'Cartera de cuero de cabra con terminación fina', 130000.00, '../img/cartera-de-cabra.jpg', 8)
+        )
+        WHERE EXISTS (SELECT 1 FROM products WHERE id = 15 AND name = 'Cojines decorativos de cuero')
+        ''',
+        # Solo si el id quedó con el producto de la tienda (no si ya era otro)
+        '''
+        INSERT OR IGNORE INTO product_categories (product_id, category_id)
+        SELECT p.id, c.id
+        FROM (VALUES
+            (16, 'Cuero de cabra natural', 'Cueros'),
+            (17, 'Cuero de cabra artesanal', 'Cueros'),
+            (18, 'Cuero de oveja suave', 'Cueros'),
+            (19, 'Respaldo de madera y cuero', 'Decoración'),
+            (20, 'Cartera de cabra elegante', 'Carteras'),
+            (20, 'Cartera de cabra elegante', 'Accesorios')
+        ) v
+        JOIN products p ON p.id = v.column1 AND p.name = v.column2
+        JOIN categories c ON c.name = v.column3
+        ''',
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    """Versión del esquema guardada en la base de datos"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def ensure_schema(path=None):
+    """Migrar la base si hace falta; devuelve la lista de versiones aplicadas.
+
+    Con el esquema al día solo se lee PRAGMA user_version, sin configurar la
+    conexión ni abrir transacciones: es lo que pasa en cada arranque normal.
+    """
+    conn = sqlite3.connect(path or DB_PATH)
+    try:
+        if get_version(conn) >= SCHEMA_VERSION:
+            return []
+    finally:
+        conn.close()
+    conn = connect(path)
+    try:
+        return migrate(conn)
+    finally:
+        conn.close()
+
+
+def migrate(conn):
+    """Aplicar las migraciones pendientes; devuelve la lista de versiones aplicadas"""
+    applied = []
+    current = get_version(conn)
+    for version, _description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        # Cada migración en su propia transacción junto con el cambio de versión
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Otro proceso pudo haberla aplicado mientras esperábamos el lock
+            if get_version(conn) >= version:
+                conn.rollback()
+                continue
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
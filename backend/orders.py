@@ -0,0 +1,173 @@
+import json
+import os
+import re
+
+# Pedidos por transacción en la carga masiva
+BULK_CHUNK_SIZE = 1000
+# Máximo de pedidos aceptados en una sola petición
+BULK_MAX_ORDERS = 200000
+# Largo máximo de una línea NDJSON (un pedido) en la carga masiva
+BULK_MAX_LINE_BYTES = 1 << 20
+# Tamaño máximo de un cuerpo en arreglo JSON, que se lee entero antes de interpretarlo
+# (200000 pedidos típicos ocupan unos 30 MB; en NDJSON no hace falta porque se procesa
+# a medida que llega)
+BULK_MAX_BYTES = int(os.environ.get('CUERAR_BULK_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Consultas (test_query_plans.py revisa sus planes)
+RESERVE_STOCK = 'UPDATE products SET stock = stock - ? WHERE id = ? AND stock >= ?'
+STOCK_OF_PRODUCTS = 'SELECT id, stock FROM products WHERE id IN ({placeholders})'
+INSERT_ORDER = 'INSERT INTO orders (user_id, total, status) VALUES (?, ?, ?)'
+LAST_ORDER_ID = "SELECT seq FROM sqlite_sequence WHERE name = 'orders'"
+INSERT_ORDER_ITEM = 'INSERT INTO order_items (order_id, product_name, product_price, quantity) VALUES (?, ?, ?, ?)'
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class OutOfStock(Exception):
+    """No hay stock suficiente para uno o más productos del pedido"""
+
+    def __init__(self, shortages):
+        # [{'product_id', 'requested', 'available'}, ...]
+        self.shortages = shortages
+        detail = ', '.join(
+            f"producto {s['product_id']} (pedido {s['requested']}, disponible {s['available']})"
+            for s in shortages
+        )
+        super().__init__(f"Sin stock suficiente: {detail}")
+
+
+def reserve_stock(conn, items):
+    """Descontar el stock de los items [(nombre, precio, cantidad, product_id), ...].
+
+    Un UPDATE condicional por producto, todos en un mismo executemany. Si alguno no
+    alcanza, se deshace lo descontado y se lanza OutOfStock.
+    """
+    requested = {}
+    for _, _, quantity, product_id in items:
+        if product_id is not None:
+            requested[product_id] = requested.get(product_id, 0) + quantity
+    if not requested:
+        return
+    rows = [(quantity, product_id, quantity) for product_id, quantity in sorted(requested.items())]
+
+    conn.execute('SAVEPOINT reserve_stock')
+    try:
+        cursor = conn.executemany(RESERVE_STOCK, rows)
+        complete = cursor.rowcount == len(rows)
+        if not complete:
+            conn.execute('ROLLBACK TO reserve_stock')
+    finally:
+        conn.execute('RELEASE reserve_stock')
+    if complete:
+        return
+
+    placeholders = ','.join('?' * len(requested))
+    available = dict(conn.execute(STOCK_OF_PRODUCTS.format(placeholders=placeholders), list(requested)).fetchall())
+    raise OutOfStock([
+        {'product_id': product_id, 'requested': quantity, 'available': available.get(product_id, 0)}
+        for product_id, quantity in sorted(requested.items())
+        if available.get(product_id, 0) < quantity
+    ])
+
+
+def insert_orders(conn, orders, status='completed'):
+    """Insertar pedidos [(user_id, total, [(nombre, precio, cantidad, product_id), ...]), ...].
+
+    Reserva el stock de cada pedido y luego inserta con executemany pedidos e items.
+    Debe correr dentro de una transacción del hilo escritor: con el lock de escritura
+    tomado, los ids de AUTOINCREMENT que asigna executemany son consecutivos.
+    Devuelve, por pedido, su id o la excepción OutOfStock que lo dejó afuera.
+    """
+    results = []
+    accepted = []
+    for order in orders:
+        try:
+            reserve_stock(conn, order[2])
+        except OutOfStock as e:
+            results.append(e)
+        else:
+            results.append(None)
+            accepted.append(order)
+    if not accepted:
+        return results
+
+    conn.executemany(INSERT_ORDER, [(user_id, total, status) for user_id, total, _ in accepted])
+    last_id = conn.execute(LAST_ORDER_ID).fetchone()[0]
+    order_ids = iter(range(last_id - len(accepted) + 1, last_id + 1))
+
+    item_rows = []
+    for index, (order, result) in enumerate(zip(orders, results)):
+        if result is None:
+            order_id = results[index] = next(order_ids)
+            item_rows.extend((order_id, name, price, quantity) for name, price, quantity, _ in order[2])
+    conn.executemany(INSERT_ORDER_ITEM, item_rows)
+    return results
+
+
+async def iter_ndjson_lines(stream, max_line=BULK_MAX_LINE_BYTES):
+    """Recorrer un cuerpo NDJSON a medida que llega: una línea (bytes) por objeto.
+
+    Las líneas se entregan sin decodificar, para interpretarlas fuera del event loop
+    con parse_ndjson_line. Una línea de más de max_line bytes no se acumula: se
+    descarta hasta el siguiente salto de línea y en su lugar se entrega un ValueError.
+    """
+    too_long = ValueError(f"Línea de más de {max_line} bytes")
+    buffer = b''
+    skipping = False
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if skipping or len(line) > max_line:
+                skipping = False
+                yield too_long
+            elif line.strip():
+                yield line
+        if len(buffer) > max_line:
+            buffer = b''
+            skipping = True
+    if skipping:
+        yield too_long
+    elif buffer.strip():
+        yield buffer
+
+
+def parse_ndjson_line(line):
+    """Objeto JSON de una línea, o ValueError si no es válida"""
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"JSON inválido: {e}")
+
+
+def parse_json_array(text):
+    """Elementos de un arreglo JSON, interpretados de a uno.
+
+    Da lo mismo que json.loads, pero json.loads de un cuerpo de decenas de MB es
+    una sola llamada que retiene el GIL por más de un segundo; así los demás hilos
+    (y el event loop) corren entre elemento y elemento. Si el texto no es un
+    arreglo, devuelve lo que devuelva json.loads. ValueError si el JSON no es válido.
+    """
+    position = _WHITESPACE.match(text).end()
+    if not text.startswith('[', position):
+        return json.loads(text)
+    items = []
+    position = _WHITESPACE.match(text, position + 1).end()
+    if text.startswith(']', position):
+        position += 1
+    else:
+        while True:
+            item, position = _decoder.raw_decode(text, _WHITESPACE.match(text, position).end())
+            items.append(item)
+            position = _WHITESPACE.match(text, position).end()
+            if text.startswith(',', position):
+                position += 1
+            elif text.startswith(']', position):
+                position += 1
+                break
+            else:
+                raise ValueError(f"Se esperaba ',' o ']' en la posición {position}")
+    if _WHITESPACE.match(text, position).end() != len(text):
+        raise ValueError(f"Datos extra en la posición {position}")
+    return items
@@ -0,0 +1,37 @@
+import base64
+import json
+
+from fastapi import HTTPException
+
+# Tamaño de página por defecto y máximo permitido
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(*values):
+    """Codificar la clave de la última fila de una página como cursor opaco"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Decodificar un cursor; devuelve la lista de valores de la clave"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    # Los valores se pasan tal cual a la consulta: solo tipos que SQLite acepta como parámetro
+    if not all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return values
+
+
+def split_page(rows, limit, key):
+    """Separar la fila extra pedida con LIMIT n+1 y calcular el siguiente cursor"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(*key(rows[-1])) if has_more else None
+    return rows, next_cursor
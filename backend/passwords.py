@@ -0,0 +1,159 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Parámetros de scrypt: N=2^14, r=8 usa 16 MiB de memoria por hash
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+# Procesos del pool de hashing y máximo de hashes en curso o en espera
+HASH_WORKERS = int(os.environ.get('CUERAR_HASH_WORKERS', str(os.cpu_count() or 1)))
+HASH_MAX_PENDING = int(os.environ.get('CUERAR_HASH_MAX_PENDING', str(HASH_WORKERS * 4)))
+# Segundos que una petición espera un lugar en la cola antes de rechazarse
+HASH_QUEUE_TIMEOUT = float(os.environ.get('CUERAR_HASH_QUEUE_TIMEOUT', '5'))
+
+
+class HasherBusy(Exception):
+    """El servicio de hashing está saturado"""
+
+
+def _b64(data):
+    return base64.b64encode(data).decode().rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _scrypt(password, salt, n, r, p):
+    # Función de nivel de módulo para poder ejecutarse en otro proceso
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * n, dklen=KEY_BYTES)
+
+
+def _hash(password):
+    salt = secrets.token_bytes(SALT_BYTES)
+    key = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f'scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}'
+
+
+# Hash ficticio para verificar logins de emails inexistentes con el mismo costo
+DUMMY_HASH = f'scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(bytes(SALT_BYTES))}${_b64(bytes(KEY_BYTES))}'
+
+
+def is_legacy_hash(stored):
+    """Hash SHA-256 sin sal (64 caracteres hexadecimales) de versiones anteriores"""
+    return len(stored) == 64 and not stored.startswith('scrypt$')
+
+
+def _verify(password, stored):
+    """Devolver (válida, necesita_rehash)"""
+    if is_legacy_hash(stored):
+        # Se paga igual un scrypt: si no, el tiempo de respuesta revelaría qué
+        # cuentas tienen todavía un hash heredado
+        _scrypt(password, bytes(SALT_BYTES), SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+    try:
+        _, n, r, p, salt, key = stored.split('$')
+        n, r, p = int(n), int(r), int(p)
+    except ValueError:
+        return False, False
+    candidate = _scrypt(password, _unb64(salt), n, r, p)
+    needs_rehash = (n, r, p) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return hmac.compare_digest(candidate, _unb64(key)), needs_rehash
+
+
+class PasswordHasher:
+    """Hashing de contraseñas fuera del event loop, en un pool de procesos acotado.
+
+    Las rutas usan hash_async/verify_async: esperan un lugar y el resultado sin
+    ocupar hilos del threadpool, que siguen libres para las rutas síncronas.
+    hash/verify bloquean y son para scripts y benchmarks.
+    """
+
+    def __init__(self, workers=HASH_WORKERS, max_pending=HASH_MAX_PENDING,
+                 queue_timeout=HASH_QUEUE_TIMEOUT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = None
+        self._slots_loop = None
+
+    def _get_executor(self):
+        # El pool se crea al primer uso para no pagar su costo al importar
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def _get_slots(self):
+        # Un asyncio.Semaphore sirve a un solo event loop: se crea con el loop
+        # en uso (uno por proceso en el servidor; los tests abren varios)
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.max_pending)
+            self._slots_loop = loop
+        return self._slots
+
+    async def _run_async(self, fn, *args):
+        slots = self._get_slots()
+        try:
+            await asyncio.wait_for(slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HasherBusy("Demasiadas solicitudes de autenticación, intente nuevamente")
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # El lugar se libera cuando el proceso termina, aunque la petición se
+        # cancele antes: así max_pending cuenta lo que de verdad está en curso
+        loop = asyncio.get_running_loop()
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(slots.release)
+            except RuntimeError:
+                pass  # El loop ya cerró (apagado del servidor)
+
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    async def hash_async(self, password):
+        """Hash scrypt con sal aleatoria"""
+        return await self._run_async(_hash, password)
+
+    async def verify_async(self, password, stored):
+        """Verificar una contraseña; devuelve (válida, necesita_rehash).
+
+        Cuesta lo mismo para un hash scrypt, uno heredado o DUMMY_HASH.
+        """
+        return await self._run_async(_verify, password, stored)
+
+    def hash(self, password):
+        """Versión bloqueante de hash_async (sin límite de espera)"""
+        return self._get_executor().submit(_hash, password).result()
+
+    def verify(self, password, stored):
+        """Versión bloqueante de verify_async (sin límite de espera)"""
+        return self._get_executor().submit(_verify, password, stored).result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_hasher = PasswordHasher()
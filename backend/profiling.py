@@ -0,0 +1,283 @@
+import asyncio
+import collections
+import contextvars
+import cProfile
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import secrets
+import threading
+import time
+from urllib.parse import parse_qs
+
+# Perfilado de peticiones con cProfile, a pedido.
+#
+# Se perfila una petición cuando un administrador la marca (encabezado
+# X-Profile: 1 o parámetro ?profile=1, junto con X-Admin-Token) o al azar, en
+# una fracción CUERAR_PROFILE_SAMPLE_RATE del tráfico. Los últimos
+# CUERAR_PROFILE_RING perfiles quedan en memoria para descargarlos.
+#
+# cProfile solo ve el hilo en el que se activa, así que cada tramo de la petición
+# tiene su propio perfil y al final se combinan: la función de la ruta (en su hilo
+# del threadpool o, si es async, paso a paso en el event loop, sin mezclar otras
+# tareas) y las funciones que corre en los lectores (db.read) y en el escritor.
+
+PROFILE_SAMPLE_RATE = float(os.environ.get('CUERAR_PROFILE_SAMPLE_RATE', '0'))
+PROFILE_RING_SIZE = int(os.environ.get('CUERAR_PROFILE_RING', '20'))
+# Funciones listadas en el resumen de cada perfil
+SUMMARY_FUNCTIONS = 10
+# Profundidad máxima de las pilas colapsadas
+COLLAPSED_MAX_DEPTH = 64
+
+FORMATS = ('text', 'pstats', 'collapsed')
+
+# Perfil de la petición en curso (None si no se perfila)
+active_profile = contextvars.ContextVar('active_profile', default=None)
+
+
+class RequestProfile:
+    """Perfiles (uno por tramo) de una petición"""
+
+    def __init__(self, profile_id, method, path, trigger):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.route = None
+        self.status = None
+        self.duration_ms = None
+        self.at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self._parts = []
+        self._stats = None
+
+    def profiler(self):
+        """Perfil nuevo para un tramo de la petición"""
+        profiler = cProfile.Profile()
+        # list.append es atómico: los tramos pueden venir de varios hilos
+        self._parts.append(profiler)
+        return profiler
+
+    def stats(self):
+        """pstats.Stats con todos los tramos combinados (None si no se perfiló nada)"""
+        if self._stats is None and self._parts:
+            stats = pstats.Stats(self._parts[0])
+            for profiler in self._parts[1:]:
+                stats.add(profiler)
+            self._stats = stats
+        return self._stats
+
+    def summary(self):
+        stats = self.stats()
+        top = []
+        if stats is not None:
+            ranked = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+            top = [
+                {'function': pstats.func_std_string(func), 'calls': nc, 'tottime_ms': round(tt * 1000, 3),
+                 'cumtime_ms': round(ct * 1000, 3)}
+                for func, (_, nc, tt, ct, _) in ranked[:SUMMARY_FUNCTIONS]
+            ]
+        return {
+            'id': self.id, 'at': self.at, 'method': self.method, 'path': self.path, 'route': self.route,
+            'status': self.status, 'duration_ms': self.duration_ms, 'trigger': self.trigger,
+            'segments': len(self._parts), 'top': top,
+        }
+
+
+def call(fn, *args, **kwargs):
+    """Ejecutar fn con el perfil de la petición en curso, si se está perfilando"""
+    profile = active_profile.get()
+    if profile is None:
+        return fn(*args, **kwargs)
+    return profile.profiler().runcall(fn, *args, **kwargs)
+
+
+class _ProfiledCoroutine:
+    """Corre una corrutina con el perfil activo solo mientras ella ejecuta.
+
+    Entre un paso y otro el event loop atiende otras tareas: el perfil se apaga
+    para no mezclarlas con la petición perfilada.
+    """
+
+    def __init__(self, coro, profiler):
+        self.coro = coro
+        self.profiler = profiler
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            self.profiler.enable()
+            try:
+                if error is None:
+                    step = self.coro.send(value)
+                else:
+                    step = self.coro.throw(error)
+            except StopIteration as e:
+                return e.value
+            finally:
+                self.profiler.disable()
+            try:
+                value, error = (yield step), None
+            except BaseException as e:
+                value, error = None, e
+
+
+def _wrap_endpoint(fn):
+    if asyncio.iscoroutinefunction(fn):
+        async def endpoint(**kwargs):
+            profile = active_profile.get()
+            if profile is None:
+                return await fn(**kwargs)
+            return await _ProfiledCoroutine(fn(**kwargs), profile.profiler())
+    else:
+        def endpoint(**kwargs):
+            return call(fn, **kwargs)
+    return endpoint
+
+
+def instrument_routes(app):
+    """Envolver la función de cada ruta para poder perfilarla.
+
+    FastAPI llama a route.dependant.call con los parámetros ya resueltos; el
+    envoltorio conserva si es async o no (FastAPI lo decidió al crear la ruta).
+    """
+    for route in app.routes:
+        dependant = getattr(route, 'dependant', None)
+        if dependant is not None and not getattr(dependant.call, '_profiled', False):
+            dependant.call = _wrap_endpoint(dependant.call)
+            dependant.call._profiled = True
+
+
+class ProfileStore:
+    """Últimos perfiles, en un anillo acotado"""
+
+    def __init__(self, size=PROFILE_RING_SIZE):
+        self._lock = threading.Lock()
+        self._profiles = collections.deque(maxlen=size)
+        self._ids = itertools.count(1)
+
+    def new_id(self):
+        return f'{next(self._ids)}-{secrets.token_hex(4)}'
+
+    def add(self, profile):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def get(self, profile_id):
+        with self._lock:
+            for profile in self._profiles:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+    def list(self):
+        with self._lock:
+            profiles = list(self._profiles)
+        return [profile.summary() for profile in reversed(profiles)]
+
+
+profile_store = ProfileStore()
+
+
+def export_text(stats, limit=60):
+    """Tabla de pstats ordenada por tiempo acumulado"""
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+def export_pstats(stats):
+    """Formato binario de pstats (pstats.Stats(archivo), snakeviz, etc.)"""
+    return marshal.dumps(stats.stats)
+
+
+def _frame_name(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f'{name} ({os.path.basename(filename)}:{line})'
+
+
+def export_collapsed(stats):
+    """Pilas colapsadas ("a;b;c microsegundos") para flamegraph.pl o speedscope.
+
+    cProfile guarda quién llama a quién, no pilas completas: cada rama recibe la
+    parte del tiempo de la función que corresponde a las llamadas desde ese padre.
+    """
+    callees = collections.defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge[3]))
+    roots = [func for func, entry in stats.stats.items() if not entry[4]]
+    totals = collections.Counter()
+
+    def walk(func, stack, fraction):
+        _, _, tt, ct, _ = stats.stats[func]
+        stack = stack + (_frame_name(func),)
+        if tt * fraction > 0:
+            totals[';'.join(stack)] += tt * fraction
+        if len(stack) >= COLLAPSED_MAX_DEPTH:
+            return
+        for callee, edge_ct in callees.get(func, ()):
+            callee_ct = stats.stats[callee][3]
+            if callee_ct <= 0 or _frame_name(callee) in stack:
+                continue
+            walk(callee, stack, fraction * edge_ct / callee_ct)
+
+    for root in roots:
+        walk(root, (), 1.0)
+    lines = [f'{stack} {round(seconds * 1e6)}' for stack, seconds in totals.items() if seconds >= 1e-6]
+    return '\n'.join(sorted(lines)) + '\n'
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI: decide qué peticiones se perfilan y guarda el resultado.
+
+    El perfil se identifica en el encabezado X-Profile-Id de la respuesta.
+    """
+
+    def __init__(self, app, admin_token=None, sample_rate=PROFILE_SAMPLE_RATE, store=profile_store):
+        self.app = app
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.store = store
+
+    def _trigger(self, scope):
+        headers = dict(scope['headers'])
+        requested = headers.get(b'x-profile') == b'1' or (
+            b'profile' in scope['query_string'] and parse_qs(scope['query_string'].decode()).get('profile') == ['1']
+        )
+        if requested:
+            token = headers.get(b'x-admin-token')
+            if self.admin_token and token and secrets.compare_digest(token, self.admin_token.encode()):
+                return 'admin'
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope['type'] == 'http' else None
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        profile = RequestProfile(self.store.new_id(), scope['method'], scope['path'], trigger)
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                profile.status = message['status']
+                message = {**message, 'headers': [*message.get('headers', []), (b'x-profile-id', profile.id.encode())]}
+            await send(message)
+
+        token = active_profile.set(profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            active_profile.reset(token)
+            profile.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+            route = scope.get('route')
+            profile.route = route.path if route is not None else None
+            self.store.add(profile)
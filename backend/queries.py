@@ -0,0 +1,97 @@
+# Consultas SQL de las rutas de main.py.
+#
+# Viven aquí para que test_query_plans.py revise los planes de exactamente las
+# mismas sentencias que se ejecutan: cambiar una consulta acá cambia las dos cosas.
+# Las que admiten cursor o límite opcional se completan en la ruta agregando
+# ' LIMIT ?'; las que llevan IN (...) tienen {placeholders}.
+
+# Usuarios y login
+USER_EXISTS = 'SELECT id FROM users WHERE email = ? OR username = ?'
+INSERT_USER = 'INSERT INTO users (username, email, password_hash, phone) VALUES (?, ?, ?, ?)'
+USER_BY_EMAIL = 'SELECT id, username, email, password_hash FROM users WHERE email = ?'
+# Solo si nadie cambió el hash entretanto
+REHASH_PASSWORD = 'UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?'
+
+INSERT_CONTACT_MESSAGE = 'INSERT INTO contact_messages (name, email, message) VALUES (?, ?, ?)'
+
+# Historial de pedidos, paginado por (created_at, id)
+USER_ORDERS = '''
+    SELECT * FROM orders
+    WHERE user_id = ?
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+'''
+USER_ORDERS_AFTER = '''
+    SELECT * FROM orders
+    WHERE user_id = ? AND (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+'''
+ORDER_ITEMS_FOR_ORDERS = 'SELECT * FROM order_items WHERE order_id IN ({placeholders}) ORDER BY order_id, id'
+
+# Listados de administración, paginados por clave
+USERS = 'SELECT id, username, email, phone, created_at FROM users ORDER BY id'
+USERS_AFTER = 'SELECT id, username, email, phone, created_at FROM users WHERE id > ? ORDER BY id'
+CONTACT_MESSAGES = 'SELECT * FROM contact_messages ORDER BY created_at DESC, id DESC'
+CONTACT_MESSAGES_AFTER = '''
+    SELECT * FROM contact_messages
+    WHERE (created_at, id) < (?, ?)
+    ORDER BY created_at DESC, id DESC
+'''
+
+# Estadísticas de un usuario (contadores mantenidos por triggers)
+USER_ORDER_STATS = '''
+    SELECT u.id, u.username, u.email, s.total_orders, s.total_spent, s.max_order
+    FROM users u
+    LEFT JOIN user_order_stats s ON s.user_id = u.id
+    WHERE u.id = ?
+'''
+USER_RECENT_ORDERS = 'SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC LIMIT 5'
+
+# Reporte de ventas
+SALES_OVERVIEW = '''
+    SELECT
+        COUNT(*) as total_orders,
+        SUM(total) as total_revenue,
+        AVG(total) as avg_order_value
+    FROM orders
+'''
+SALES_TOP_CUSTOMERS = '''
+    SELECT
+        u.id, u.username, u.email,
+        COUNT(o.id) as order_count,
+        SUM(o.total) as total_spent
+    FROM users u
+    JOIN orders o ON u.id = o.user_id
+    GROUP BY u.id
+    ORDER BY total_spent DESC
+    LIMIT 5
+'''
+SALES_TOP_PRODUCTS = '''
+    SELECT
+        product_name,
+        COUNT(*) as times_sold,
+        SUM(product_price * quantity) as revenue
+    FROM order_items
+    GROUP BY product_name
+    ORDER BY times_sold DESC
+    LIMIT 10
+'''
+SALES_BY_STATUS = '''
+    SELECT status, COUNT(*) as count
+    FROM orders
+    GROUP BY status
+'''
+
+# Reporte de productos
+PRODUCTS_PER_CATEGORY = '''
+    SELECT
+        c.id, c.name, c.description,
+        COUNT(pc.product_id) as product_count
+    FROM categories c
+    LEFT JOIN product_categories pc ON c.id = pc.category_id
+    GROUP BY c.id
+    ORDER BY product_count DESC
+'''
+STOCK_TOTALS = 'SELECT SUM(stock) as total_stock, COUNT(*) as total_products FROM products'
+LOW_STOCK_PRODUCTS = 'SELECT * FROM products WHERE stock < 10 ORDER BY stock ASC'
@@ -0,0 +1,183 @@
+import argparse
+import hashlib
+
+from database import DB_PATH, connect
+from migrations import migrate
+
+# Datos de ejemplo (categorías, productos, usuarios, pedidos y mensajes).
+#
+# La API no los carga sola al arrancar: se cargan con este script, una vez, en
+# una base nueva. Solo se llenan las tablas vacías, así que se puede repetir.
+#
+# Uso (desde backend/): python seed.py [--db cuerar.db]
+
+
+def seed(conn):
+    """Cargar los datos de ejemplo en las tablas vacías (sin commit)"""
+    cursor = conn.cursor()
+    
+    # Insertar categorías si no existen
+    cursor.execute('SELECT COUNT(*) FROM categories')
+    if cursor.fetchone()[0] == 0:
+        categories = [
+            ('Alfombras', 'Alfombras de cuero natural para decoración'),
+            ('Carteras', 'Accesorios de cuero genuino'),
+            ('Cueros', 'Cueros naturales de diversos animales'),
+            ('Billeteras', 'Billeteras de cuero premium'),
+            ('Cinturones', 'Cinturones artesanales de cuero'),
+            ('Mochilas', 'Mochilas de cuero resistentes'),
+            ('Zapatos', 'Calzado de cuero hecho a mano'),
+            ('Chaquetas', 'Chaquetas de cuero de alta calidad'),
+            ('Decoración', 'Artículos decorativos de cuero'),
+            ('Accesorios', 'Diversos accesorios de cuero')
+        ]
+        cursor.executemany('INSERT INTO categories (name, description) VALUES (?, ?)', categories)
+    
+    # Insertar productos de ejemplo si no existen
+    cursor.execute('SELECT COUNT(*) FROM products')
+    if cursor.fetchone()[0] == 0:
+        products = [
+            ('Alfombra de vaca blanca con puntos', 'Cuero genuino de vaca con patrón natural', 45000.00, '../img/alfombra-de-vaca-blanca-con-puntos.jpg', 10),
+            ('Alfombra de vaca overa', 'Cuero genuino de vaca overa', 45000.00, '../img/alfombra-de-vaca-overa.jpg', 8),
+            ('Cuero de cabra premium', 'Cuero genuino de cabra, suave y resistente', 40000.00, '../img/cuero-de-cabra.jpg', 15),
+            ('Cartera de cuero grande', 'Cartera espaciosa de cuero genuino', 40000.00, '../img/cartera-cuero-g.jpg', 20),
+            ('Cartera de cuero clásica', 'Cartera elegante de cuero genuino', 40000.00, '../img/cartera-cuero.jpg', 12),
+            ('Billetera de cuero marrón', 'Billetera compacta con múltiples compartimentos', 15000.00, '../img/cartera-cuero.jpg', 25),
+            ('Cinturón de cuero negro', 'Cinturón resistente con hebilla metálica', 18000.00, '../img/cartera-cuero.jpg', 30),
+            ('Mochila de cuero vintage', 'Mochila espaciosa estilo vintage', 65000.00, '../img/cartera-cuero.jpg', 5),
+            ('Zapatos de cuero casual', 'Zapatos cómodos para uso diario', 55000.00, '../img/cartera-cuero.jpg', 15),
+            ('Chaqueta de cuero negra', 'Chaqueta clásica de cuero negro', 120000.00, '../img/cartera-cuero.jpg', 8),
+            ('Alfombra de oveja blanca', 'Suave alfombra de cuero de oveja', 50000.00, '../img/alfombra-de-vaca-blanca-con-puntos.jpg', 6),
+            ('Cartera crossbody', 'Cartera pequeña con correa ajustable', 35000.00, '../img/cartera-cuero-g.jpg', 18),
+            ('Cuero de cabra negro', 'Cuero premium de cabra color negro', 42000.00, '../img/cuero-de-cabra.jpg', 12),
+            ('Porta documentos de cuero', 'Elegante porta documentos profesional', 48000.00, '../img/cartera-cuero.jpg', 10),
+            ('Cojines decorativos de cuero', 'Set de 2 cojines de cuero para sofá', 28000.00, '../img/cuero-de-cabra.jpg', 20),
+            # Resto de los productos de la tienda (pages/tienda.html usa estos ids en
+            # data-product-id). La migración 7 los agrega a las bases ya cargadas.
+            ('Cuero de cabra natural', 'Cuero de cabra en su color natural', 80000.00, '../img/cuero-de-cabra-3.jpg', 10),
+            ('Cuero de cabra artesanal', 'Cuero de cabra curtido artesanalmente', 80000.00, '../img/cuero-de-cabra-4.jpg', 10),
+            ('Cuero de oveja suave', 'Cuero de oveja de pelo largo y suave', 80000.00, '../img/cuero-de-obeja.jpg', 10),
+            ('Respaldo de madera y cuero', 'Respaldo de cama de madera tapizado en cuero', 270000.00, '../img/respaldo-de-madera-y-cuero.jpg', 4),
+            ('Cartera de cabra elegante', 'Cartera de cuero de cabra con terminación fina', 130000.00, '../img/cartera-de-cabra.jpg', 8)
+        ]
+        cursor.executemany('INSERT INTO products (name, description, price, image_url, stock) VALUES (?, ?, ?, ?, ?)', products)
+        
+        # Asignar categorías a productos (relación muchos a muchos)
+        product_category_relations = [
+            (1, 1), (1, 9),  # Alfombra vaca blanca -> Alfombras, Decoración
+            (2, 1), (2, 9),  # Alfombra overa -> Alfombras, Decoración
+            (3, 3),          # Cuero cabra -> Cueros
+            (4, 2), (4, 10), # Cartera grande -> Carteras, Accesorios
+            (5, 2), (5, 10), # Cartera clásica -> Carteras, Accesorios
+            (6, 4), (6, 10), # Billetera -> Billeteras, Accesorios
+            (7, 5), (7, 10), # Cinturón -> Cinturones, Accesorios
+            (8, 6), (8, 10), # Mochila -> Mochilas, Accesorios
+            (9, 7),          # Zapatos -> Zapatos
+            (10, 8),         # Chaqueta -> Chaquetas
+            (11, 1), (11, 9),# Alfombra oveja -> Alfombras, Decoración
+            (12, 2), (12, 10),# Cartera crossbody -> Carteras, Accesorios
+            (13, 3),         # Cuero cabra negro -> Cueros
+            (14, 2), (14, 10),# Porta documentos -> Carteras, Accesorios
+            (15, 9), (15, 10),# Cojines -> Decoración, Accesorios
+            (16, 3),          # Cuero cabra natural -> Cueros
+            (17, 3),          # Cuero cabra artesanal -> Cueros
+            (18, 3),          # Cuero oveja -> Cueros
+            (19, 9),          # Respaldo -> Decoración
+            (20, 2), (20, 10) # Cartera de cabra -> Carteras, Accesorios
+        ]
+        cursor.executemany('INSERT INTO product_categories (product_id, category_id) VALUES (?, ?)', product_category_relations)
+    
+    # Insertar usuarios de ejemplo si no existen
+    cursor.execute('SELECT COUNT(*) FROM users')
+    if cursor.fetchone()[0] == 0:
+        # Contraseña: "password123" hasheada
+        default_hash = hashlib.sha256("password123".encode()).hexdigest()
+        users = [
+            ('juan_perez', 'juan.perez@email.com', default_hash, '1122334455'),
+            ('maria_garcia', 'maria.garcia@email.com', default_hash, '1133445566'),
+            ('carlos_rodriguez', 'carlos.rodriguez@email.com', default_hash, '1144556677'),
+            ('ana_martinez', 'ana.martinez@email.com', default_hash, '1155667788'),
+            ('luis_fernandez', 'luis.fernandez@email.com', default_hash, '1166778899'),
+            ('sofia_lopez', 'sofia.lopez@email.com', default_hash, '1177889900'),
+            ('diego_gomez', 'diego.gomez@email.com', default_hash, '1188990011'),
+            ('laura_diaz', 'laura.diaz@email.com', default_hash, '1199001122'),
+            ('pablo_ruiz', 'pablo.ruiz@email.com', default_hash, '1100112233'),
+            ('valentina_torres', 'valentina.torres@email.com', default_hash, '1111223344')
+        ]
+        cursor.executemany('INSERT INTO users (username, email, password_hash, phone) VALUES (?, ?, ?, ?)', users)
+    
+    # Insertar pedidos de ejemplo si no existen
+    cursor.execute('SELECT COUNT(*) FROM orders')
+    if cursor.fetchone()[0] == 0:
+        orders = [
+            (1, 45000.00, 'completed'),
+            (2, 80000.00, 'completed'),
+            (3, 40000.00, 'pending'),
+            (4, 120000.00, 'completed'),
+            (1, 15000.00, 'completed'),
+            (5, 90000.00, 'completed'),
+            (6, 35000.00, 'pending'),
+            (7, 48000.00, 'completed'),
+            (8, 73000.00, 'completed'),
+            (9, 28000.00, 'completed'),
+            (10, 105000.00, 'pending'),
+            (2, 55000.00, 'completed')
+        ]
+        cursor.executemany('INSERT INTO orders (user_id, total, status) VALUES (?, ?, ?)', orders)
+        
+        # Insertar items de pedidos
+        order_items = [
+            (1, 'Alfombra de vaca blanca con puntos', 45000.00, 1),
+            (2, 'Cartera de cuero grande', 40000.00, 1),
+            (2, 'Cartera de cuero clásica', 40000.00, 1),
+            (3, 'Cuero de cabra premium', 40000.00, 1),
+            (4, 'Chaqueta de cuero negra', 120000.00, 1),
+            (5, 'Billetera de cuero marrón', 15000.00, 1),
+            (6, 'Alfombra de vaca overa', 45000.00, 1),
+            (6, 'Alfombra de oveja blanca', 50000.00, 1),
+            (7, 'Cartera crossbody', 35000.00, 1),
+            (8, 'Porta documentos de cuero', 48000.00, 1),
+            (9, 'Cinturón de cuero negro', 18000.00, 1),
+            (9, 'Zapatos de cuero casual', 55000.00, 1),
+            (10, 'Cojines decorativos de cuero', 28000.00, 1),
+            (11, 'Mochila de cuero vintage', 65000.00, 1),
+            (11, 'Cartera de cuero grande', 40000.00, 1),
+            (12, 'Zapatos de cuero casual', 55000.00, 1)
+        ]
+        cursor.executemany('INSERT INTO order_items (order_id, product_name, product_price, quantity) VALUES (?, ?, ?, ?)', order_items)
+    
+    # Insertar mensajes de contacto de ejemplo
+    cursor.execute('SELECT COUNT(*) FROM contact_messages')
+    if cursor.fetchone()[0] == 0:
+        messages = [
+            ('Juan Pérez', 'juan@email.com', '¿Tienen envíos a todo el país?'),
+            ('María García', 'maria@email.com', 'Me gustaría saber más sobre los cueros de cabra'),
+            ('Carlos López', 'carlos@email.com', '¿Hacen trabajos personalizados?'),
+            ('Ana Rodríguez', 'ana@email.com', 'Consulta sobre garantía de productos'),
+            ('Luis Martínez', 'luis@email.com', '¿Cuánto demora el envío a Córdoba?'),
+            ('Sofía Fernández', 'sofia@email.com', 'Quiero saber si tienen stock de alfombras'),
+            ('Diego Torres', 'diego@email.com', '¿Aceptan tarjetas de crédito?'),
+            ('Laura Gómez', 'laura@email.com', 'Me interesa la chaqueta de cuero negra'),
+            ('Pablo Díaz', 'pablo@email.com', '¿Tienen local físico para ver productos?'),
+            ('Valentina Ruiz', 'valentina@email.com', 'Consulta sobre cuidado del cuero')
+        ]
+        cursor.executemany('INSERT INTO contact_messages (name, email, message) VALUES (?, ?, ?)', messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cargar los datos de ejemplo")
+    parser.add_argument('--db', default=DB_PATH, help="Base de datos (por defecto CUERAR_DB o cuerar.db)")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    try:
+        migrate(conn)
+        seed(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"✅ Datos de ejemplo cargados en {args.db}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import json
+
+from fastapi.responses import JSONResponse
+
+# orjson es opcional: si no está instalado se usa json de la biblioteca estándar
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content):
+    """Serializar a JSON (bytes UTF-8); fechas y otros tipos se convierten con str()"""
+    if orjson is not None:
+        return orjson.dumps(content, default=str)
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':'), default=str).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """Respuesta JSON serializada con orjson (si está disponible).
+
+    Las rutas que la devuelven directamente evitan además el jsonable_encoder de
+    FastAPI, que recorre todo el contenido antes de serializarlo.
+    """
+
+    def render(self, content):
+        return dumps(content)
+
+
+class RawJSONResponse(JSONResponse):
+    """Respuesta con un cuerpo JSON ya serializado (bytes reutilizados de una caché)"""
+
+    def render(self, content):
+        return content
@@ -0,0 +1,183 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from database import pool
+from async_db import writer
+from versions import data_versions
+
+# Clave para firmar los tokens. Si no se define, se genera una por proceso y los
+# tokens dejan de valer al reiniciar (con varios workers hay que definirla).
+SESSION_SECRET = os.environ.get('CUERAR_SESSION_SECRET', '').encode() or secrets.token_bytes(32)
+# Duración de una sesión (segundos)
+SESSION_TTL = int(os.environ.get('CUERAR_SESSION_TTL', str(7 * 24 * 3600)))
+# Sesiones guardadas en memoria y cada cuánto se vuelven a confirmar en la base.
+# Una sesión cerrada en otro worker se quita de la caché apenas se la consulta
+# (tabla session_revocations), sin esperar a este plazo.
+SESSION_CACHE_SIZE = int(os.environ.get('CUERAR_SESSION_CACHE_SIZE', '10000'))
+SESSION_CACHE_TTL = float(os.environ.get('CUERAR_SESSION_CACHE_TTL', '300'))
+# Cada cuánto se borran de la tabla las sesiones vencidas
+PURGE_INTERVAL = 3600
+
+
+def _sign(session_id):
+    digest = hmac.new(SESSION_SECRET, session_id.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+
+def _split_token(token):
+    """Devolver el id de sesión si la firma del token es válida"""
+    session_id, _, signature = token.partition('.')
+    if not session_id or not signature:
+        return None
+    if not hmac.compare_digest(_sign(session_id), signature):
+        return None
+    return session_id
+
+
+# Consultas (test_query_plans.py revisa sus planes)
+INSERT_SESSION = 'INSERT INTO sessions (id, user_id, created_at, expires_at) VALUES (?, ?, ?, ?)'
+PURGE_EXPIRED_SESSIONS = 'DELETE FROM sessions WHERE expires_at < ?'
+PURGE_REVOCATIONS = 'DELETE FROM session_revocations WHERE revoked_at < ?'
+DELETE_SESSION = 'DELETE FROM sessions WHERE id = ?'
+DELETE_USER_SESSIONS = 'DELETE FROM sessions WHERE user_id = ?'
+LAST_REVOCATION = 'SELECT COALESCE(MAX(seq), 0) FROM session_revocations'
+REVOCATIONS_AFTER = 'SELECT seq, session_id FROM session_revocations WHERE seq > ? ORDER BY seq'
+SESSION_USER = '''
+    SELECT u.id, u.username, u.email, s.expires_at
+    FROM sessions s
+    JOIN users u ON u.id = s.user_id
+    WHERE s.id = ? AND s.expires_at > ?
+'''
+
+
+def _delete_session(conn, session_id):
+    conn.execute(DELETE_SESSION, (session_id,))
+
+
+def _delete_user_sessions(conn, user_id):
+    conn.execute(DELETE_USER_SESSIONS, (user_id,))
+
+
+class SessionStore:
+    """Sesiones con token firmado, cacheadas en memoria (LRU con TTL) sobre la tabla sessions"""
+
+    def __init__(self, max_size=SESSION_CACHE_SIZE, cache_ttl=SESSION_CACHE_TTL):
+        self.max_size = max_size
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        # session_id -> (usuario, vence, confirmada_hasta)
+        self._cache = OrderedDict()
+        self._last_purge = 0.0
+        # Versión de session_revocations ya aplicada a la caché y última fila leída
+        self._revocations_version = None
+        self._revocations_seq = None
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'revoked_elsewhere': 0}
+
+    def _remember(self, session_id, user, expires_at):
+        with self._lock:
+            self._cache[session_id] = (user, expires_at, time.time() + self.cache_ttl)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _forget(self, session_id):
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+    def create(self, conn, user):
+        """Abrir una sesión; devuelve (token, vencimiento). Corre en el hilo escritor, sin commit"""
+        session_id = secrets.token_urlsafe(24)
+        now = int(time.time())
+        expires_at = now + SESSION_TTL
+        conn.execute(INSERT_SESSION, (session_id, user['id'], now, expires_at))
+        if now - self._last_purge > PURGE_INTERVAL:
+            self._last_purge = now
+            conn.execute(PURGE_EXPIRED_SESSIONS, (now,))
+            # Pasado SESSION_CACHE_TTL ninguna caché confía en una sesión sin reconfirmarla
+            conn.execute(PURGE_REVOCATIONS, (now - int(self.cache_ttl),))
+        return f'{session_id}.{_sign(session_id)}', expires_at
+
+    def _sync_revocations(self):
+        """Quitar de la caché las sesiones cerradas desde otros procesos"""
+        version = data_versions.get('session_revocations')
+        if version == self._revocations_version:
+            return
+        with self._lock:
+            if version == self._revocations_version:
+                return
+            with pool.connection() as conn:
+                if self._revocations_seq is None:
+                    # Primera vez: la caché está vacía, alcanza con saber dónde empezar
+                    rows = []
+                    seq = conn.execute(LAST_REVOCATION).fetchone()[0]
+                else:
+                    rows = conn.execute(REVOCATIONS_AFTER, (self._revocations_seq,)).fetchall()
+                    seq = rows[-1]['seq'] if rows else self._revocations_seq
+            for row in rows:
+                if self._cache.pop(row['session_id'], None) is not None:
+                    self._stats['revoked_elsewhere'] += 1
+            self._revocations_seq = seq
+            self._revocations_version = version
+
+    def validate(self, token):
+        """Usuario de la sesión, o None si el token es inválido, vencido o revocado"""
+        session_id = _split_token(token)
+        if session_id is None:
+            return None
+
+        self._sync_revocations()
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None:
+                self._cache.move_to_end(session_id)
+        if entry is not None:
+            user, expires_at, confirmed_until = entry
+            if expires_at <= now:
+                self._forget(session_id)
+                return None
+            if now < confirmed_until:
+                with self._lock:
+                    self._stats['hits'] += 1
+                return user
+
+        # No está en memoria (o hay que reconfirmarla): se busca en la tabla
+        with self._lock:
+            self._stats['misses'] += 1
+        with pool.connection() as conn:
+            row = conn.execute(SESSION_USER, (session_id, int(now))).fetchone()
+        if row is None:
+            self._forget(session_id)
+            return None
+        user = {'id': row['id'], 'username': row['username'], 'email': row['email']}
+        self._remember(session_id, user, row['expires_at'])
+        return user
+
+    def revoke(self, token):
+        """Cerrar una sesión"""
+        session_id = _split_token(token)
+        if session_id is None:
+            return
+        self._forget(session_id)
+        writer.submit(_delete_session, session_id).result()
+
+    def revoke_user(self, user_id):
+        """Cerrar todas las sesiones de un usuario"""
+        with self._lock:
+            for session_id in [sid for sid, entry in self._cache.items() if entry[0]['id'] == user_id]:
+                del self._cache[session_id]
+        writer.submit(_delete_user_sessions, user_id).result()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._cache), 'max_size': self.max_size, **self._stats}
+
+
+session_store = SessionStore()
@@ -0,0 +1,148 @@
+import json
+import logging
+import logging.handlers
+import os
+import sqlite3
+import threading
+import time
+
+# Registro de consultas lentas.
+#
+# Las sentencias que tardan más de CUERAR_SLOW_QUERY_MS (ejecución más lectura de
+# filas) se escriben en un archivo rotativo, una línea JSON por sentencia, con su
+# plan (EXPLAIN QUERY PLAN), y se acumulan por sentencia para el endpoint
+# /api/admin/slow-queries. Las mide el cursor de metrics.py.
+
+# Umbral en milisegundos (0 o negativo lo desactiva)
+SLOW_QUERY_MS = float(os.environ.get('CUERAR_SLOW_QUERY_MS', '100'))
+SLOW_QUERY_LOG = os.environ.get('CUERAR_SLOW_QUERY_LOG', 'slow_queries.log')
+SLOW_QUERY_LOG_BYTES = int(os.environ.get('CUERAR_SLOW_QUERY_LOG_BYTES', str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('CUERAR_SLOW_QUERY_LOG_BACKUPS', '5'))
+# Máximo de sentencias distintas acumuladas en memoria
+MAX_STATEMENTS = 500
+
+
+def redact(parameters):
+    """Parámetros sin datos personales: los números se conservan, los textos y blobs no"""
+    if parameters is None:
+        return None
+    if isinstance(parameters, dict):
+        return {key: redact((value,))[0] for key, value in parameters.items()}
+    redacted = []
+    for value in parameters:
+        if value is None or isinstance(value, (int, float)):
+            redacted.append(value)
+        elif isinstance(value, str):
+            redacted.append(f'<texto de {len(value)} caracteres>')
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            redacted.append(f'<blob de {len(value)} bytes>')
+        else:
+            redacted.append(f'<{type(value).__name__}>')
+    return redacted
+
+
+def explain(conn, sql, parameters):
+    """Plan de la sentencia, una línea por paso e indentado según su nivel"""
+    # Cursor sin instrumentar: el EXPLAIN no cuenta en las métricas
+    cursor = sqlite3.Cursor(conn)
+    try:
+        rows = cursor.execute('EXPLAIN QUERY PLAN ' + sql, parameters).fetchall()
+    finally:
+        cursor.close()
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node] + detail)
+    return lines
+
+
+class SlowQueryLog:
+    """Sentencias lentas: archivo rotativo y totales por sentencia"""
+
+    def __init__(self, threshold_ms=SLOW_QUERY_MS, path=SLOW_QUERY_LOG,
+                 max_bytes=SLOW_QUERY_LOG_BYTES, backups=SLOW_QUERY_LOG_BACKUPS):
+        # Segundos; infinito si está desactivado (así el cursor compara sin más)
+        self.threshold = threshold_ms / 1000 if threshold_ms > 0 else float('inf')
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+        self._logger = None
+        self._statements = {}
+
+    def _file_logger(self):
+        if self._logger is None and self.path:
+            logger = logging.getLogger('cuerar.slow_queries')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            handler = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding='utf-8')
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def record(self, conn, statement, sql, parameters, elapsed, rows, route):
+        """Registrar una sentencia que superó el umbral.
+
+        parameters es None en executemany (no hay un único juego de parámetros).
+        """
+        try:
+            plan = explain(conn, sql, parameters if parameters is not None else ())
+        except sqlite3.Error as e:
+            plan = [f'(sin plan: {e})']
+        entry = {
+            'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'statement': statement,
+            'parameters': redact(parameters),
+            'duration_ms': round(elapsed * 1000, 3),
+            'rows': rows,
+            'route': route,
+            'plan': plan,
+        }
+        with self._lock:
+            totals = self._statements.get(statement)
+            if totals is None:
+                if len(self._statements) >= MAX_STATEMENTS:
+                    # Se descarta la sentencia con menos tiempo acumulado
+                    del self._statements[min(self._statements, key=lambda s: self._statements[s]['total_ms'])]
+                totals = self._statements[statement] = {
+                    'statement': statement, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0, 'routes': {},
+                }
+            totals['count'] += 1
+            totals['total_ms'] += entry['duration_ms']
+            totals['max_ms'] = max(totals['max_ms'], entry['duration_ms'])
+            totals['rows'] += rows
+            totals['routes'][route] = totals['routes'].get(route, 0) + 1
+            totals['last'] = entry
+            logger = self._file_logger()
+        if logger is not None:
+            logger.info(json.dumps(entry, ensure_ascii=False))
+
+    def top(self, limit=20):
+        """Las sentencias lentas con más tiempo acumulado"""
+        with self._lock:
+            statements = [
+                {**totals, 'total_ms': round(totals['total_ms'], 3), 'routes': dict(totals['routes'])}
+                for totals in self._statements.values()
+            ]
+        statements.sort(key=lambda totals: totals['total_ms'], reverse=True)
+        for totals in statements[:limit]:
+            totals['avg_ms'] = round(totals['total_ms'] / totals['count'], 3)
+        return statements[:limit]
+
+    def stats(self, include_path=False):
+        """Resumen del registro; la ruta del archivo solo con include_path (rutas de administración)"""
+        with self._lock:
+            stats = {
+                'threshold_ms': self.threshold * 1000 if self.threshold != float('inf') else None,
+                'statements': len(self._statements),
+                'recorded': sum(totals['count'] for totals in self._statements.values()),
+                'log_to_file': bool(self.path),
+            }
+        if include_path:
+            stats['log_file'] = os.path.abspath(self.path) if self.path else None
+        return stats
+
+
+slow_query_log = SlowQueryLog()
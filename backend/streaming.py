@@ -0,0 +1,47 @@
+from fastapi.responses import StreamingResponse
+
+from database import pool
+from serialization import dumps
+
+# Filas leídas por bloque: acota la memoria usada por el streaming y el tiempo que
+# cada bloque retiene una conexión del pool
+STREAM_CHUNK_SIZE = 500
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def read_chunk(first_sql, after_sql, after, size):
+    """Un bloque de filas paginado por clave, con una conexión que se devuelve enseguida"""
+    sql, params = (after_sql, [*after, size]) if after else (first_sql, [size])
+    with pool.connection() as conn:
+        return conn.execute(sql + ' LIMIT ?', params).fetchall()
+
+
+def iter_ndjson(rows, first_sql, after_sql, key, limit=None, chunk_size=STREAM_CHUNK_SIZE):
+    """Emitir rows y los bloques siguientes como líneas JSON.
+
+    Cada bloque se pide con su propia conexión del pool, que se devuelve antes de
+    enviarlo: un cliente lento no retiene una conexión mientras dura la respuesta.
+    La página siguiente se pide después de la clave de la última fila enviada.
+    """
+    sent = 0
+    while rows:
+        yield b''.join(dumps(dict(row)) + b'\n' for row in rows)
+        sent += len(rows)
+        size = chunk_size if limit is None else min(chunk_size, limit - sent)
+        if len(rows) < chunk_size or size <= 0:
+            break
+        rows = read_chunk(first_sql, after_sql, key(rows[-1]), size)
+
+
+def ndjson_response(first_sql, after_sql, key, after=None, limit=None):
+    """Respuesta NDJSON en streaming, con memoria constante sin importar el tamaño.
+
+    first_sql y after_sql son la consulta paginada por clave sin y con cursor (sin
+    LIMIT), key da la clave de una fila y after es el cursor inicial. El primer
+    bloque se lee antes de responder: si el pool está agotado, la petición falla
+    con PoolTimeout (503) en vez de cortar una respuesta ya empezada.
+    """
+    size = STREAM_CHUNK_SIZE if limit is None else min(STREAM_CHUNK_SIZE, limit)
+    rows = read_chunk(first_sql, after_sql, after, size)
+    return StreamingResponse(iter_ndjson(rows, first_sql, after_sql, key, limit), media_type=NDJSON_MEDIA_TYPE)
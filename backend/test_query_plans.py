@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import unittest
+
+import orders
+import queries
+import sessions
+from catalog import CATALOG_QUERY, CATEGORIES_QUERY
+from catalog_io import FTS_DELETE, FTS_INSERT, FTS_INSERT_NEW, PRODUCTS_TEXT, TABLES as CATALOG_IO_TABLES
+from migrations import migrate
+from search import SEARCH_QUERY
+from versions import VERSIONS_QUERY
+
+# Pruebas de regresión de planes de consulta.
+#
+# Cada consulta de la API figura aquí con EXPLAIN QUERY PLAN. Todo "SCAN" del
+# plan es un recorrido completo (de la tabla o de un índice, también con
+# COVERING INDEX) y hace fallar la prueba, salvo que la consulta lo permita para
+# esa tabla con un motivo: {tabla o alias del plan: motivo}. Un permiso que ya
+# no se usa también falla, para que la lista no quede vieja.
+#
+# Las sentencias se importan de los módulos que las ejecutan (queries.py para
+# las rutas de main.py), así que cambiar una consulta cambia también lo que se
+# revisa; al agregar una nueva, hay que sumarla aquí.
+#
+# También se comprueba que database_schema.sql no se haya desviado del esquema
+# que crean las migraciones (mismas tablas, columnas e índices).
+#
+# Uso (desde backend/): python -m unittest test_query_plans  (o python -m pytest)
+
+IN_3 = '?, ?, ?'
+
+# Motivos que se repiten
+FULL_EXPORT = 'Exporta la tabla completa (en streaming)'
+SALES_SNAPSHOT = 'Agregado sobre todos los pedidos; lo calcula la instantánea en segundo plano'
+
+QUERIES = [
+    # (nombre, sql, {tabla o alias recorrido: motivo})
+    ('get_products', CATALOG_QUERY,
+     {'p': 'Carga el catálogo completo para el índice en memoria'}),
+    ('get_categories', CATEGORIES_QUERY,
+     {'categories': 'Lista completa de categorías; se cachea en memoria'}),
+    ('search_products', SEARCH_QUERY, {
+        'products_fts': 'MATCH de FTS5: recorre solo las coincidencias del índice de texto',
+        '(subquery-1)': 'Ordena solo los SEARCH_CANDIDATES candidatos de la subconsulta',
+    }),
+    ('register_user', queries.USER_EXISTS, {}),
+    ('login_user', queries.USER_BY_EMAIL, {}),
+    ('login_user (rehash)', queries.REHASH_PASSWORD, {}),
+    ('SessionStore.validate', sessions.SESSION_USER, {}),
+    ('SessionStore.create (limpieza)', sessions.PURGE_EXPIRED_SESSIONS, {}),
+    ('SessionStore.revoke', sessions.DELETE_SESSION, {}),
+    ('SessionStore.revoke_user', sessions.DELETE_USER_SESSIONS, {}),
+    ('SessionStore._sync_revocations', sessions.REVOCATIONS_AFTER, {}),
+    ('SessionStore._sync_revocations (inicio)', sessions.LAST_REVOCATION, {}),
+    ('SessionStore.create (limpieza de revocaciones)', sessions.PURGE_REVOCATIONS,
+     {'session_revocations': 'Solo guarda las revocaciones de los últimos SESSION_CACHE_TTL segundos'}),
+    ('DataVersions._poll', VERSIONS_QUERY, {
+        'table_versions': 'Una fila por tabla versionada',
+        'sqlite_sequence': 'Tabla interna con una fila por tabla AUTOINCREMENT',
+        '(subquery-2)': 'Unión de las dos tablas anteriores',
+    }),
+    ('reserve_stock', orders.RESERVE_STOCK, {}),
+    ('reserve_stock (faltantes)', orders.STOCK_OF_PRODUCTS.format(placeholders=IN_3), {}),
+    ('insert_orders (ids asignados)', orders.LAST_ORDER_ID,
+     {'sqlite_sequence': 'Tabla interna con una fila por tabla AUTOINCREMENT'}),
+    ('get_user_orders (primera página)', queries.USER_ORDERS, {}),
+    ('get_user_orders (con cursor)', queries.USER_ORDERS_AFTER, {}),
+    ('get_user_orders (items)', queries.ORDER_ITEMS_FOR_ORDERS.format(placeholders=IN_3), {}),
+    ('get_users (primera página)', queries.USERS,
+     {'users': 'Recorre por rowid y corta en LIMIT (o exporta la tabla completa)'}),
+    ('get_users (con cursor)', queries.USERS_AFTER, {}),
+    ('get_user_orders_stats (usuario y contadores)', queries.USER_ORDER_STATS, {}),
+    # Subconsulta de los triggers de user_order_stats (migración 3)
+    ('trg_orders_stats_delete (máximo)',
+     'SELECT MAX(total) FROM orders WHERE user_id = ?', {}),
+    ('get_user_orders_stats (recientes)', queries.USER_RECENT_ORDERS, {}),
+    ('compute_sales_statistics (resumen)', queries.SALES_OVERVIEW, {'orders': SALES_SNAPSHOT}),
+    ('compute_sales_statistics (top clientes)', queries.SALES_TOP_CUSTOMERS, {'u': SALES_SNAPSHOT}),
+    ('compute_sales_statistics (top productos)', queries.SALES_TOP_PRODUCTS,
+     {'order_items': 'Agregado sobre todos los items; el índice cubriente evita leer la tabla'}),
+    ('compute_sales_statistics (por estado)', queries.SALES_BY_STATUS, {'orders': SALES_SNAPSHOT}),
+    ('compute_product_statistics (por categoría)', queries.PRODUCTS_PER_CATEGORY,
+     {'c': 'Recorre todas las categorías (tabla chica)'}),
+    ('compute_product_statistics (stock)', queries.STOCK_TOTALS,
+     {'products': 'Suma el stock de todos los productos; lo calcula la instantánea en segundo plano'}),
+    ('compute_product_statistics (bajo stock)', queries.LOW_STOCK_PRODUCTS, {}),
+    ('get_contact_messages (primera página)', queries.CONTACT_MESSAGES,
+     {'contact_messages': 'Recorre el índice en orden y corta en LIMIT (o exporta todos los mensajes)'}),
+    ('get_contact_messages (con cursor)', queries.CONTACT_MESSAGES_AFTER, {}),
+    ('import_catalog (productos que cambian)', PRODUCTS_TEXT.format(placeholders=IN_3), {}),
+    ('import_catalog (quitar del índice de búsqueda)', FTS_DELETE, {}),
+    ('import_catalog (indexar productos nuevos)', FTS_INSERT_NEW, {}),
+    ('import_catalog (indexar un producto)', FTS_INSERT, {}),
+    ('import_catalog (product_categories)', CATALOG_IO_TABLES['product_categories'].upsert, {}),
+    ('export_catalog (products)', CATALOG_IO_TABLES['products'].export, {'products': FULL_EXPORT}),
+    ('export_catalog (categories)', CATALOG_IO_TABLES['categories'].export, {'categories': FULL_EXPORT}),
+    ('export_catalog (product_categories)', CATALOG_IO_TABLES['product_categories'].export,
+     {'product_categories': FULL_EXPORT}),
+]
+
+
+def table_scans(conn, sql):
+    """Recorridos completos del plan: {tabla o alias: detalle del plan}"""
+    params = [1] * sql.count('?')
+    scans = {}
+    for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params):
+        detail = row[3]
+        if detail.startswith('SCAN '):
+            scans[detail.split()[1]] = detail
+    return scans
+
+
+def schema_snapshot(conn):
+    """Tablas con sus columnas e índices con sus columnas"""
+    snapshot = {}
+    for name, kind, table in conn.execute(
+        "SELECT name, type, tbl_name FROM sqlite_master "
+        "WHERE type IN ('table', 'index') AND name NOT LIKE 'sqlite_%'"
+    ):
+        if kind == 'table':
+            columns = tuple(row[1] for row in conn.execute(f'PRAGMA table_info({name})'))
+        else:
+            columns = (table,) + tuple(row[2] for row in conn.execute(f'PRAGMA index_info({name})'))
+        snapshot[(kind, name)] = columns
+    return snapshot
+
+
+class QueryPlanTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.conn = sqlite3.connect(':memory:')
+        migrate(cls.conn)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+
+    def test_no_unexpected_scans(self):
+        for name, sql, allowed in QUERIES:
+            with self.subTest(name):
+                scans = table_scans(self.conn, sql)
+                unexpected = [detail for target, detail in scans.items() if target not in allowed]
+                self.assertEqual(unexpected, [], f"{name} recorre completo sin permiso")
+
+    def test_allowed_scans_still_happen(self):
+        for name, sql, allowed in QUERIES:
+            with self.subTest(name):
+                unused = set(allowed) - set(table_scans(self.conn, sql))
+                self.assertEqual(unused, set(), f"{name}: permiso que ya no hace falta")
+
+    def test_documented_schema_matches_migrations(self):
+        documented = sqlite3.connect(':memory:')
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database_schema.sql')
+        with open(path, encoding='utf-8') as f:
+            documented.executescript(f.read())
+        try:
+            self.assertEqual(schema_snapshot(documented), schema_snapshot(self.conn))
+        finally:
+            documented.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
@@ -0,0 +1,81 @@
+import sys
+
+from database import connect
+
+# Verifica que la tabla user_order_stats (mantenida por triggers) coincida
+# con los pedidos reales. Con --fix reconstruye las filas que no coinciden.
+#
+# Uso: python verify_user_order_stats.py [--fix]
+
+# Tolerancia para las sumas en punto flotante acumuladas por los triggers
+TOLERANCE = 1e-6
+
+
+def find_mismatches(conn):
+    """Usuarios cuyo resumen no coincide con COUNT/SUM/MAX sobre orders"""
+    expected = {
+        row['user_id']: row
+        for row in conn.execute('''
+            SELECT user_id, COUNT(*) as total_orders, SUM(total) as total_spent, MAX(total) as max_order
+            FROM orders
+            WHERE user_id IS NOT NULL
+            GROUP BY user_id
+        ''')
+    }
+    stored = {row['user_id']: row for row in conn.execute('SELECT * FROM user_order_stats')}
+
+    mismatches = []
+    for user_id in set(expected) | set(stored):
+        exp = expected.get(user_id)
+        got = stored.get(user_id)
+        exp_count = exp['total_orders'] if exp else 0
+        got_count = got['total_orders'] if got else 0
+        if exp_count != got_count:
+            mismatches.append((user_id, exp, got))
+        elif exp_count and (
+            abs(exp['total_spent'] - got['total_spent']) > TOLERANCE * max(1.0, abs(exp['total_spent']))
+            or exp['max_order'] != got['max_order']
+        ):
+            mismatches.append((user_id, exp, got))
+    return mismatches
+
+
+def rebuild(conn, user_ids):
+    """Recalcular el resumen de los usuarios indicados a partir de orders"""
+    with conn:
+        for user_id in user_ids:
+            conn.execute('DELETE FROM user_order_stats WHERE user_id = ?', (user_id,))
+            conn.execute('''
+                INSERT INTO user_order_stats (user_id, total_orders, total_spent, max_order)
+                SELECT user_id, COUNT(*), SUM(total), MAX(total)
+                FROM orders
+                WHERE user_id = ?
+                GROUP BY user_id
+            ''', (user_id,))
+
+
+def main():
+    conn = connect()
+    mismatches = find_mismatches(conn)
+
+    print("=" * 60)
+    print("🔢 VERIFICACIÓN DE user_order_stats")
+    print("=" * 60)
+    for user_id, exp, got in sorted(mismatches, key=lambda m: m[0]):
+        print(f"  ❌ Usuario {user_id}: esperado={dict(exp) if exp else None} guardado={dict(got) if got else None}")
+
+    if not mismatches:
+        print("  ✅ Todos los contadores coinciden con los pedidos")
+        return 0
+
+    if '--fix' in sys.argv:
+        rebuild(conn, [m[0] for m in mismatches])
+        print(f"\n🔧 {len(mismatches)} usuario(s) reconstruidos")
+        return 0
+
+    print(f"\n❌ {len(mismatches)} usuario(s) con contadores incorrectos (usar --fix para repararlos)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from database import DB_PATH
+
+# Cada cuánto (segundos) se pregunta a la base si otro proceso escribió
+VERSION_POLL_INTERVAL = float(os.environ.get('CUERAR_VERSION_POLL_INTERVAL', '0.05'))
+
+# Versión de cada tabla: su contador (triggers de UPDATE/DELETE, y de INSERT en el
+# catálogo) más su secuencia de AUTOINCREMENT, que cambia con cada INSERT
+VERSIONS_QUERY = '''
+    SELECT name, SUM(version) FROM (
+        SELECT name, version FROM table_versions
+        UNION ALL
+        SELECT name, seq FROM sqlite_sequence
+    )
+    GROUP BY name
+'''
+
+
+class DataVersions:
+    """Contador de cambios por tabla, compartido por todos los procesos.
+
+    Los contadores viven en la base (table_versions y sqlite_sequence, ver
+    migración 6) y los mantiene SQLite, así que cuentan también lo que escriben
+    otros workers y los scripts. Cada proceso
+    guarda una copia y la relee solo cuando PRAGMA data_version indica que otra
+    conexión confirmó cambios; esa consulta se hace como mucho cada poll_interval
+    segundos. Quien escribe llama a bump() después del COMMIT para ver su propio
+    cambio enseguida, sin esperar al siguiente sondeo.
+
+    Si la base todavía no tiene la tabla (sin migrar), los contadores son solo de
+    este proceso, como antes.
+    """
+
+    def __init__(self, path=None, poll_interval=VERSION_POLL_INTERVAL):
+        self.path = path or DB_PATH
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._conn = None
+        self._data_version = None
+        self._checked_at = float('-inf')
+        self._shared = False
+        # (epoch, {tabla: versión}); se reemplaza entero al releer: get() lo lee sin lock
+        self._state = (secrets.token_hex(4), {})
+        self._stats = {'polls': 0, 'reloads': 0}
+
+    def _connection(self):
+        if self._conn is None:
+            # Conexión propia y sin instrumentar: el sondeo no cuenta en las métricas
+            self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        return self._conn
+
+    def _poll(self):
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.poll_interval:
+                return
+            self._stats['polls'] += 1
+            try:
+                conn = self._connection()
+                data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+                if data_version != self._data_version or not self._shared:
+                    rows = conn.execute(VERSIONS_QUERY).fetchall()
+                    self._state = self._split(rows)
+                    self._data_version = data_version
+                    self._shared = True
+                    self._stats['reloads'] += 1
+            except sqlite3.Error:
+                # Sin table_versions: se sigue con los contadores locales
+                self._shared = False
+            self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _split(rows):
+        """Filas de VERSIONS_QUERY -> (epoch, {tabla: versión})"""
+        versions = {name: version for name, version in rows}
+        return f"{versions.pop('epoch', 0):08x}", versions
+
+    @staticmethod
+    def _format(epoch, versions, tables):
+        counters = '.'.join(str(versions.get(table, 0)) for table in tables)
+        return f'{epoch}.{counters}'
+
+    def bump(self, *tables):
+        """Registrar que cambiaron las tablas (después del COMMIT)"""
+        with self._lock:
+            if self._shared:
+                # Los triggers ya contaron el cambio: basta con releer en el próximo get()
+                self._checked_at = float('-inf')
+            else:
+                epoch, versions = self._state
+                versions = dict(versions)
+                for table in tables:
+                    versions[table] = versions.get(table, 0) + 1
+                self._state = (epoch, versions)
+
+    def get(self, *tables):
+        """Versión actual de las tablas, como texto (sirve para ETag y para comparar).
+
+        Es la misma en todos los workers para el mismo estado de la base.
+        """
+        if time.monotonic() - self._checked_at >= self.poll_interval:
+            self._poll()
+        return self._format(*self._state, tables)
+
+    def read(self, conn, *tables):
+        """Versión de las tablas leída con conn, dentro de su transacción.
+
+        Sirve para que un resultado calculado en esa transacción quede asociado
+        exactamente a la versión de los datos que leyó.
+        """
+        try:
+            rows = conn.execute(VERSIONS_QUERY).fetchall()
+        except sqlite3.Error:
+            return self.get(*tables)
+        return self._format(*self._split(rows), tables)
+
+    def stats(self):
+        with self._lock:
+            return {'shared': self._shared, 'poll_interval': self.poll_interval, **self._stats}
+
+
+data_versions = DataVersions()
@@ -9,8 +9,14 @@ document.addEventListener('DOMContentLoaded', function() {
 function agregarAlCarrito(boton) {
   const nombre = boton.dataset.nombre;
   const precio = parseFloat(boton.dataset.precio);
+  const item = { nombre, precio };
+  // data-product-id identifica el producto del catálogo: el backend reserva su stock al
+  // comprar (un item sin product_id se registra sin descontar stock)
+  if (boton.dataset.productId) {
+    item.product_id = parseInt(boton.dataset.productId);
+  }
 
-  carrito.push({ nombre, precio });
+  carrito.push(item);
   localStorage.setItem('carrito', JSON.stringify(carrito));
   actualizarCarrito();
   
@@ -128,14 +134,20 @@ function finalizarCompra() {
 async function completarCompra() {
   // Obtener datos del usuario si está logueado
   const userId = sessionStorage.getItem('userId');
+  const token = sessionStorage.getItem('token');
   const total = carrito.reduce((sum, item) => sum + item.precio, 0);
 
+  const headers = {
+    'Content-Type': 'application/json',
+  };
+  if (token) {
+    headers['Authorization'] = `Bearer ${token}`;
+  }
+
   try {
     const response = await fetch(`${API_URL}/api/orders`, {
       method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
+      headers: headers,
       body: JSON.stringify({
         items: carrito,
         total: total,
@@ -44,6 +44,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 sessionStorage.setItem('email', data.user.email);
                 sessionStorage.setItem('userId', data.user.id);
                 sessionStorage.setItem('user', JSON.stringify(data.user));
+                sessionStorage.setItem('token', data.token);
 
                 alert(data.message);
                 window.location.href = '../index.html';
@@ -117,6 +117,16 @@ function actualizarContadorCarrito() {
 }
 
 function cerrarSesion() {
+    // Cerrar la sesión también en el servidor
+    const token = sessionStorage.getItem('token');
+    if (token) {
+        fetch('http://localhost:8000/api/logout', {
+            method: 'POST',
+            headers: { 'Authorization': `Bearer ${token}` },
+            keepalive: true
+        }).catch(() => {});
+    }
+
     // Limpiar sesión
     sessionStorage.clear();
     